@@ -0,0 +1,331 @@
+# audit_log.py - Journal d'audit des prédictions : file bornée en mémoire, écritures groupées hors requête
+import asyncio
+import glob
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional
+
+# Supports d'écriture : fichiers JSONL en ajout seul avec rotation, ou base SQLite locale
+BACKENDS = ("jsonl", "sqlite", "off")
+# File pleine : faire attendre la requête (par défaut, l'audit sert de traçabilité des décisions)
+# ou abandonner l'enregistrement (la requête n'attend jamais, la perte est comptée)
+POLICIES = ("block", "drop")
+
+SQLITE_FILENAME = "audit.sqlite3"
+
+
+def _json_default(value: Any) -> Any:
+    # Scalaires et tableaux NumPy, énumérations du schéma
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def encode_record(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, default=_json_default)
+
+
+class AuditLog:
+    """Enregistre chaque prédiction (entrée, sortie, version du modèle, horodatage).
+
+    `submit` ne fait que déposer l'enregistrement dans une file bornée : la sérialisation
+    et les écritures sont faites par une tâche de fond, par lots, dans un thread dédié (un
+    seul, l'ordre d'arrivée est conservé). Un lot part dès que `flush_size` enregistrements
+    attendent, et au plus tard `flush_interval` secondes après le précédent.
+
+    Avec le support "jsonl", chaque processus écrit ses propres fichiers
+    (audit-<date>-<pid>.jsonl), ouverts en ajout seul ; un fichier qui dépasse
+    `max_file_bytes` est fermé et le suivant est créé. Avec "sqlite", tous les processus
+    écrivent dans la même base (mode WAL), un lot par transaction.
+
+    File pleine : la politique "block" (par défaut) fait attendre la requête jusqu'à
+    `block_timeout` secondes (contre-pression), puis abandonne l'enregistrement ; "drop"
+    l'abandonne tout de suite. Tout abandon est compté dans `dropped` (exposé par /ready
+    et /metrics).
+    """
+
+    def __init__(self, directory: str = "./audit", backend: str = "jsonl", flush_interval: float = 1.0,
+                 flush_size: int = 512, max_queue_size: int = 10000, policy: str = "block",
+                 block_timeout: float = 1.0, max_file_bytes: int = 64 << 20, fsync: bool = False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Support d'audit non supporté: {backend} (attendu: {', '.join(BACKENDS)})")
+        if policy not in POLICIES:
+            raise ValueError(f"Politique de file non supportée: {policy} (attendu: {', '.join(POLICIES)})")
+        self.directory = directory
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.flush_size = max(1, flush_size)
+        self.max_queue_size = max(1, max_queue_size)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.max_file_bytes = max_file_bytes
+        self.fsync = fsync
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._full: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # État du thread d'écriture
+        self._file = None
+        self._file_size = 0
+        self._connection: Optional[sqlite3.Connection] = None
+
+        # Statistiques simples
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.files = 0
+
+    @classmethod
+    def from_env(cls) -> "AuditLog":
+        """Construit le journal à partir des variables d'environnement AUDIT_* (AUDIT_LOG=off : désactivé)."""
+        return cls(
+            directory=os.environ.get("AUDIT_DIR", "./audit"),
+            backend=os.environ.get("AUDIT_LOG", "jsonl").lower(),
+            flush_interval=float(os.environ.get("AUDIT_FLUSH_INTERVAL", 1.0)),
+            flush_size=int(os.environ.get("AUDIT_FLUSH_SIZE", 512)),
+            max_queue_size=int(os.environ.get("AUDIT_QUEUE_SIZE", 10000)),
+            policy=os.environ.get("AUDIT_POLICY", "block").lower(),
+            block_timeout=float(os.environ.get("AUDIT_BLOCK_TIMEOUT", 1.0)),
+            max_file_bytes=int(float(os.environ.get("AUDIT_MAX_FILE_MB", 64)) * (1 << 20)),
+            fsync=os.environ.get("AUDIT_FSYNC", "0").lower() in ("1", "true", "oui", "yes"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != "off"
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    @property
+    def queue_size(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # ------------------------------------------------------------------
+    # Côté requêtes (boucle d'événements)
+    # ------------------------------------------------------------------
+    def submit_nowait(self, record: Dict[str, Any]) -> bool:
+        """Dépose un enregistrement sans attendre ; False s'il est abandonné (file pleine ou journal arrêté)."""
+        if not self.running:
+            if self.enabled:
+                self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        if self._queue.qsize() >= self.flush_size:
+            self._full.set()
+        return True
+
+    async def submit(self, record: Dict[str, Any]) -> bool:
+        """Dépose un enregistrement ; avec la politique "block", attend une place si la file est pleine."""
+        if self.policy == "block" and self.running and self._queue.full():
+            self._full.set()
+            try:
+                await asyncio.wait_for(self._queue.put(record), self.block_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return False
+            return True
+        return self.submit_nowait(record)
+
+    async def submit_many(self, records: List[Dict[str, Any]]) -> int:
+        """Dépose les enregistrements d'un lot d'un seul coup ; renvoie le nombre déposé.
+
+        Sans attente tant que la file a de la place. File pleine : "drop" abandonne le reste
+        du lot, "block" le fait attendre jusqu'à `block_timeout` secondes au total (pas par
+        enregistrement), puis abandonne ce qui n'a pas trouvé de place.
+        """
+        if not self.running:
+            if self.enabled:
+                self.dropped += len(records)
+            return 0
+        queue = self._queue
+        deposes = 0
+        for record in records:
+            try:
+                queue.put_nowait(record)
+            except asyncio.QueueFull:
+                break
+            deposes += 1
+        if deposes < len(records) and self.policy == "block":
+            self._full.set()
+            fin = self._loop.time() + self.block_timeout
+            for record in records[deposes:]:
+                try:
+                    await asyncio.wait_for(queue.put(record), max(0.0, fin - self._loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                deposes += 1
+        self.dropped += len(records) - deposes
+        if queue.qsize() >= self.flush_size:
+            self._full.set()
+        return deposes
+
+    # ------------------------------------------------------------------
+    # Tâche de fond
+    # ------------------------------------------------------------------
+    async def start(self) -> None:
+        if not self.enabled or self.running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._full = asyncio.Event()
+        self._stopping = False
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audit")
+        self._flusher = asyncio.create_task(self._flush_loop())
+        print(f"Journal d'audit démarré ({self.backend} dans {self.directory}, lots de {self.flush_size} "
+              f"ou toutes les {self.flush_interval:g} s, file {self.max_queue_size}, politique {self.policy})")
+
+    async def stop(self) -> None:
+        """Arrête la tâche de fond après avoir écrit les enregistrements encore en file."""
+        if self._flusher is not None and self._loop is asyncio.get_running_loop():
+            # Pas d'annulation : un lot déjà retiré de la file mais pas encore écrit serait perdu
+            self._stopping = True
+            self._full.set()
+            await self._flusher
+        self._flusher = None
+        if self._executor is not None:
+            self._executor.submit(self._close)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _take(self) -> List[Dict[str, Any]]:
+        lot = []
+        while len(lot) < self.flush_size and not self._queue.empty():
+            lot.append(self._queue.get_nowait())
+        return lot
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            # Vider la file par lots ; les requêtes continuent d'en déposer pendant l'écriture
+            while not self._queue.empty():
+                await self._loop.run_in_executor(self._executor, self._write, self._take())
+            if self._stopping:
+                return
+
+    # ------------------------------------------------------------------
+    # Thread d'écriture
+    # ------------------------------------------------------------------
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        try:
+            if self.backend == "sqlite":
+                self._write_sqlite(batch)
+            else:
+                self._write_jsonl(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Erreur d'écriture du journal d'audit ({len(batch)} enregistrements perdus): {e}")
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def _write_jsonl(self, batch: List[Dict[str, Any]]) -> None:
+        data = "".join(encode_record(record) + "\n" for record in batch).encode("utf-8")
+        if self._file is not None and self._file_size > 0 and self._file_size + len(data) > self.max_file_bytes:
+            self._close()
+        if self._file is None:
+            # Le pid distingue les fichiers des workers ; le compteur, deux rotations dans la même seconde
+            nom = f"audit-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.files:04d}.jsonl"
+            self._file = open(os.path.join(self.directory, nom), "ab")
+            self._file_size = self._file.tell()
+            self.files += 1
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file_size += len(data)
+
+    def _write_sqlite(self, batch: List[Dict[str, Any]]) -> None:
+        if self._connection is None:
+            self._connection = sqlite3.connect(os.path.join(self.directory, SQLITE_FILENAME), timeout=30)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, "
+                "request TEXT, endpoint TEXT, model TEXT, input TEXT, output TEXT)")
+        lignes = [(record.get("ts"), record.get("request"), record.get("endpoint"), record.get("model"),
+                   encode_record(record.get("input")), encode_record(record.get("output"))) for record in batch]
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO predictions (ts, request, endpoint, model, input, output) VALUES (?, ?, ?, ?, ?, ?)",
+                lignes)
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._file_size = 0
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "policy": self.policy,
+            "queue_size": self.queue_size,
+            "max_queue_size": self.max_queue_size,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "files": self.files,
+        }
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Relit un journal d'audit dans l'ordre d'écriture : un fichier JSONL, une base SQLite,
+    ou un dossier (ses fichiers audit-*.jsonl par ordre de nom, puis sa base SQLite).
+
+    Chaque enregistrement a les clés ts, request, endpoint, model, input (champs du donneur,
+    directement utilisables pour noter à nouveau) et output (réponse de l'API).
+    """
+    if os.path.isdir(path):
+        for chemin in sorted(glob.glob(os.path.join(path, "audit-*.jsonl"))):
+            yield from read_records(chemin)
+        base = os.path.join(path, SQLITE_FILENAME)
+        if os.path.exists(base):
+            yield from read_records(base)
+        return
+    if path.endswith((".sqlite3", ".sqlite", ".db")):
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for ts, request, endpoint, model, entree, sortie in connection.execute(
+                    "SELECT ts, request, endpoint, model, input, output FROM predictions ORDER BY id"):
+                yield {"ts": ts, "request": request, "endpoint": endpoint, "model": model,
+                       "input": json.loads(entree), "output": json.loads(sortie)}
+        finally:
+            connection.close()
+        return
+    with open(path, encoding="utf-8") as f:
+        for ligne in f:
+            if ligne.strip():
+                # Une dernière ligne tronquée (arrêt brutal pendant une écriture) est ignorée
+                try:
+                    yield json.loads(ligne)
+                except ValueError:
+                    continue
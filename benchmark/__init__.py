@@ -0,0 +1,9 @@
+# benchmark - Mesures de performance de l'API (micro-benchmarks, tests de charge, comparaison)
+#
+#   python -m benchmark run [--requests 2000] [--levels 1,8,32,128] [--output resultats.json]
+#   python -m benchmark compare reference.json candidat.json
+#   python -m benchmark replay audit/ [--models gradient_boosting,xgboost] [--processes 4]
+from benchmark.payloads import PayloadGenerator, generate_payloads, model_vocabulary
+from benchmark.report import compare, summarize, write_results
+
+__all__ = ["PayloadGenerator", "generate_payloads", "model_vocabulary", "compare", "summarize", "write_results"]
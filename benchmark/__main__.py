@@ -0,0 +1,142 @@
+# benchmark/__main__.py - Ligne de commande : python -m benchmark {run,compare,replay}
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+
+def _niveaux(valeur: str) -> List[int]:
+    return [int(niveau) for niveau in valeur.split(",") if niveau]
+
+
+def commande_run(args: argparse.Namespace) -> int:
+    # La configuration est lue par main à l'import : l'ajuster avant de l'importer
+    if args.no_cache:
+        os.environ["PREDICTION_CACHE_SIZE"] = "0"
+
+    import main
+    from benchmark.load import run_load
+    from benchmark.micro import run_micro
+    from benchmark.payloads import PayloadGenerator, model_vocabulary
+    from benchmark.report import metadata, print_table, write_results
+
+    if args.url is None or not args.skip_micro:
+        if not main.load_model():
+            print("Aucun modèle chargé : benchmark impossible")
+            return 1
+    modele = main.obtenir_modele(args.model) if main.registry.active_version else None
+
+    resultats = {"meta": metadata(modele, url=args.url, requests=args.requests, seed=args.seed,
+                                  profile=args.profile, no_cache=args.no_cache)}
+    if not args.skip_micro:
+        resultats["micro"] = run_micro(n=args.micro_rows, seed=args.seed, model=args.model)
+        print_table("Micro-benchmarks (ms par appel)",
+                    [dict(name=nom, **resume) for nom, resume in resultats["micro"].items()],
+                    ["p50_ms", "p95_ms", "p99_ms", "throughput_per_s"])
+
+    if not args.skip_load:
+        generateur = PayloadGenerator(seed=args.seed + 1, vocabulary=model_vocabulary(modele) if modele else {})
+        resultats["load"] = run_load(lambda n: generateur.payloads(n, args.profile), requests=args.requests,
+                                     levels=args.levels, url=args.url, model=args.model)
+        if args.batch_size:
+            resultats["load"] += run_load(
+                lambda n: [generateur.payloads(args.batch_size, args.profile) for _ in range(n)],
+                requests=max(1, args.requests // args.batch_size), levels=args.levels,
+                endpoint="/predict/batch", url=args.url, model=args.model, warmup=5)
+
+    write_results(resultats, args.output)
+    return 0
+
+
+def commande_replay(args: argparse.Namespace) -> int:
+    import main
+    from benchmark.replay import load_requests, run_replay
+    from benchmark.report import metadata, print_table, write_results
+
+    if not main.load_model():
+        print("Aucun modèle chargé : rejeu impossible")
+        return 1
+    versions = [main.registry.resolve(nom) for nom in args.models.split(",")] if args.models \
+        else sorted(main.registry.artifacts)
+    reference = main.registry.resolve(args.reference) if args.reference else None
+    if reference and reference not in versions:
+        versions.insert(0, reference)
+    entrees, reponses = load_requests(args.log, limit=args.limit)
+    if not entrees:
+        print(f"Aucun donneur à rejouer dans {args.log}")
+        return 1
+    print(f"Rejeu de {len(entrees)} donneurs sur {len(versions)} versions ({', '.join(versions)})")
+
+    rejeu = run_replay(entrees, versions, reference=reference, logged=reponses, processes=args.processes,
+                       chunk_rows=args.chunk_rows, latency_sample=args.latency_sample)
+    lignes = []
+    for version, resume in rejeu["models"].items():
+        ligne = {"name": version, "rows_per_s": resume["rows_per_s"], "p50_ms": resume["latency"].get("p50_ms"),
+                 "p99_ms": resume["latency"].get("p99_ms"), "eligible_rate": resume["eligible_rate"]}
+        for cle in ("vs_reference", "vs_logged"):
+            ligne[f"{cle}_agreement"] = resume.get(cle, {}).get("agreement_rate")
+            ligne[f"{cle}_drift"] = resume.get(cle, {}).get("mean_abs_confidence_drift")
+        lignes.append(ligne)
+    print_table(f"Rejeu de {rejeu['rows']} donneurs ({rejeu['rule_rows']} écartés par une règle, hors comparaison), "
+                f"référence {rejeu['reference']}, {rejeu['processes']} processus, {rejeu['wall_s']:.1f} s",
+                lignes, ["rows_per_s", "p50_ms", "p99_ms", "eligible_rate", "vs_reference_agreement",
+                         "vs_reference_drift", "vs_logged_agreement", "vs_logged_drift"])
+    write_results({"meta": metadata(log=args.log, limit=args.limit), "replay": rejeu}, args.output, prefix="replay")
+    return 0
+
+
+def commande_compare(args: argparse.Namespace) -> int:
+    from benchmark.report import compare, print_table
+    with open(args.reference, encoding="utf-8") as f:
+        reference = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidat = json.load(f)
+    lignes = compare(reference, candidat)
+    print_table(f"{args.candidate} / {args.reference} (ratio < 1 : latence en baisse)", lignes,
+                ["p50_ms_ratio", "p99_ms_ratio", "throughput_per_s_ratio"])
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Mesures de performance de l'API")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+
+    run = commandes.add_parser("run", help="micro-benchmarks et tests de charge")
+    run.add_argument("--requests", type=int, default=2000, help="requêtes par niveau de concurrence")
+    run.add_argument("--levels", type=_niveaux, default=[1, 8, 32, 128], help="niveaux de concurrence (ex. 1,8,32)")
+    run.add_argument("--micro-rows", type=int, default=2000, help="donneurs par micro-benchmark")
+    run.add_argument("--batch-size", type=int, default=0, help="tester aussi /predict/batch avec des lots de cette taille")
+    run.add_argument("--profile", default="mixte", help="profil des donneurs : mixte, regle ou modele")
+    run.add_argument("--model", default=None, help="version de modèle (paramètre ?model=)")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--url", default=None, help="serveur à tester (par défaut : application en processus)")
+    run.add_argument("--no-cache", action="store_true", help="désactiver le cache de prédictions")
+    run.add_argument("--skip-micro", action="store_true")
+    run.add_argument("--skip-load", action="store_true")
+    run.add_argument("--output", default=None, help="fichier de résultats JSON (benchmark/results/ par défaut)")
+    run.set_defaults(fonction=commande_run)
+
+    comparer = commandes.add_parser("compare", help="comparer deux fichiers de résultats")
+    comparer.add_argument("reference")
+    comparer.add_argument("candidate")
+    comparer.set_defaults(fonction=commande_compare)
+
+    rejouer = commandes.add_parser("replay", help="rejouer un journal de requêtes sur plusieurs versions de modèle")
+    rejouer.add_argument("log", help="journal d'audit (dossier, .jsonl, .sqlite3) ou fichier NDJSON/CSV de donneurs")
+    rejouer.add_argument("--models", default=None, help="versions à comparer (ex. gradient_boosting,xgboost ; "
+                                                        "par défaut : toutes)")
+    rejouer.add_argument("--reference", default=None, help="version de référence (par défaut : la première)")
+    rejouer.add_argument("--processes", type=int, default=None, help="processus de notation (par défaut : nombre de CPU)")
+    rejouer.add_argument("--chunk-rows", type=int, default=1000, help="donneurs par tâche")
+    rejouer.add_argument("--latency-sample", type=int, default=500, help="donneurs notés un par un pour la latence")
+    rejouer.add_argument("--limit", type=int, default=None, help="nombre maximal de donneurs rejoués")
+    rejouer.add_argument("--output", default=None, help="fichier de résultats JSON (benchmark/results/ par défaut)")
+    rejouer.set_defaults(fonction=commande_replay)
+
+    args = parser.parse_args(argv)
+    return args.fonction(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
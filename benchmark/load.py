@@ -0,0 +1,76 @@
+# benchmark/load.py - Tests de charge ASGI en processus (ou contre un serveur HTTP) sur /predict
+import asyncio
+import contextlib
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from benchmark.report import summarize
+
+
+async def run_level(client: Any, payloads: Sequence[Any], concurrency: int, endpoint: str = "/predict",
+                    params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Envoie tous les `payloads` avec `concurrency` clients simultanés ; latence de chaque requête."""
+    latencies: List[float] = []
+    statuts: Counter = Counter()
+    suivant = iter(payloads)
+
+    async def client_virtuel() -> None:
+        for payload in suivant:
+            debut = time.perf_counter()
+            try:
+                reponse = await client.post(endpoint, json=payload, params=params)
+                statuts[str(reponse.status_code)] += 1
+            except Exception as e:
+                statuts[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - debut)
+
+    debut = time.perf_counter()
+    await asyncio.gather(*(client_virtuel() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - debut
+
+    rows = sum(len(payload) for payload in payloads) if endpoint.endswith("/batch") else None
+    resultat = summarize(latencies, elapsed=elapsed, rows=rows)
+    resultat.update(endpoint=endpoint, concurrency=concurrency, status=dict(statuts),
+                    errors=sum(nombre for statut, nombre in statuts.items() if statut != "200"))
+    return resultat
+
+
+@contextlib.asynccontextmanager
+async def _client(url: Optional[str]):
+    import httpx
+    if url:
+        # Serveur déjà lancé (uvicorn, plusieurs workers...)
+        async with httpx.AsyncClient(base_url=url, timeout=30.0) as client:
+            yield client
+        return
+
+    # Application en processus : démarrage (chargement, préchauffage) puis transport ASGI direct
+    import main
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=30.0) as client:
+            yield client
+
+
+async def run_load_async(make_payloads: Callable[[int], Sequence[Any]], requests: int = 2000,
+                         levels: Sequence[int] = (1, 8, 32, 128), endpoint: str = "/predict",
+                         url: Optional[str] = None, model: Optional[str] = None,
+                         warmup: int = 50) -> List[Dict[str, Any]]:
+    """Un passage par niveau de concurrence, chacun avec de nouveaux donneurs (`make_payloads(n)`) :
+    un niveau ne profite pas du cache rempli par le précédent."""
+    params = {"model": model} if model else None
+    resultats = []
+    async with _client(url) as client:
+        await run_level(client, make_payloads(warmup), min(8, max(levels)), endpoint, params)
+        for concurrency in levels:
+            resultat = await run_level(client, make_payloads(requests), concurrency, endpoint, params)
+            print(f"{endpoint} concurrence {concurrency:>4}: {resultat['throughput_per_s']:.0f} req/s, "
+                  f"p50 {resultat['p50_ms']:.2f} ms, p95 {resultat['p95_ms']:.2f} ms, "
+                  f"p99 {resultat['p99_ms']:.2f} ms, erreurs {resultat['errors']}")
+            resultats.append(resultat)
+    return resultats
+
+
+def run_load(make_payloads: Callable[[int], Sequence[Any]], **options: Any) -> List[Dict[str, Any]]:
+    return asyncio.run(run_load_async(make_payloads, **options))
@@ -0,0 +1,128 @@
+# benchmark/micro.py - Micro-benchmarks de predict_eligibility (cœur synchrone) et du chemin servi (asynchrone)
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from benchmark.payloads import PayloadGenerator, model_vocabulary
+from benchmark.report import summarize
+
+
+def time_calls(fn: Callable[[Any], Any], arguments: Sequence[Any], warmup: int = 20) -> List[float]:
+    """Latence (secondes) de `fn(argument)` pour chaque argument, après quelques appels de chauffe."""
+    for argument in arguments[:warmup]:
+        fn(argument)
+    latencies = []
+    for argument in arguments:
+        debut = time.perf_counter()
+        fn(argument)
+        latencies.append(time.perf_counter() - debut)
+    return latencies
+
+
+async def time_calls_async(fn: Callable[[Any], Any], arguments: Sequence[Any], warmup: int = 20) -> List[float]:
+    """Comme `time_calls`, pour une coroutine attendue appel après appel (latence vue par une requête)."""
+    for argument in arguments[:warmup]:
+        await fn(argument)
+    latencies = []
+    for argument in arguments:
+        debut = time.perf_counter()
+        await fn(argument)
+        latencies.append(time.perf_counter() - debut)
+    return latencies
+
+
+class _CacheDesactive:
+    # Désactive le cache de prédictions le temps d'une mesure (le chemin du modèle est toujours exécuté)
+    def __init__(self, cache: Any):
+        self.cache = cache
+
+    def __enter__(self) -> None:
+        self.max_size = self.cache.max_size
+        self.cache.max_size = 0
+
+    def __exit__(self, *exc: Any) -> None:
+        self.cache.max_size = self.max_size
+
+
+def run_micro(n: int = 2000, seed: int = 0, batch_sizes: Sequence[int] = (16, 256),
+              model: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Mesure chaque chemin de prédiction séparément, ainsi que ses étapes.
+
+    Cœur synchrone (predict_eligibility appelé directement, sans planificateur ni table de
+    décision : ce n'est pas le chemin des requêtes) :
+
+    - `rules` : donneurs écartés par une règle d'exclusion (le modèle n'est jamais appelé) ;
+    - `model` : donneurs sans critère d'exclusion, cache désactivé ;
+    - `model_cached` : les mêmes donneurs, servis par le cache ;
+    - `encode`, `engine` : encodage seul et moteur d'inférence seul sur une ligne ;
+    - `explain` : contributions des caractéristiques pour une ligne encodée (?explain=true) ;
+    - `batch_<taille>` : predict_eligibility_batch (débit en donneurs par seconde).
+
+    Chemin servi (celui de /predict et /predict/batch, sans HTTP) : `served_rules`,
+    `served_model`, `served_model_cached` (predict_eligibility_async : table de décision
+    si DECISION_TABLE=1, cache, micro-batching du planificateur d'inférence) et
+    `served_batch_<taille>` (lot exécuté dans le pool du planificateur).
+    """
+    import main
+    modele = main.obtenir_modele(model)
+    generateur = PayloadGenerator(seed=seed, vocabulary=model_vocabulary(modele))
+    regles = generateur.payloads(n, "regle")
+    modeles = generateur.payloads(n, "modele")
+
+    def predire(donneur: Dict[str, Any]) -> Any:
+        return main.predict_eligibility(donneur, model)
+
+    resultats: Dict[str, Dict[str, Any]] = {}
+    resultats["rules"] = summarize(time_calls(predire, regles))
+    with _CacheDesactive(main.prediction_cache):
+        resultats["model"] = summarize(time_calls(predire, modeles))
+    main.prediction_cache.invalidate()
+    for donneur in modeles:
+        predire(donneur)
+    resultats["model_cached"] = summarize(time_calls(predire, modeles, warmup=0))
+
+    if modele.feature_encoder is not None:
+        resultats["encode"] = summarize(time_calls(modele.feature_encoder.encode, modeles))
+        lignes = [modele.feature_encoder.encode(donneur) for donneur in modeles]
+        resultats["engine"] = summarize(time_calls(lambda ligne: main.predict_proba_lignes([ligne], modele), lignes))
+        if modele.compiled_model is not None and modele.feature_encoder.spans is not None:
+            resultats["explain"] = summarize(time_calls(lambda ligne: main.expliquer_lignes(ligne[None, :], modele),
+                                                        lignes))
+
+    melanges = generateur.payloads(n, "mixte")
+    with _CacheDesactive(main.prediction_cache):
+        for taille in batch_sizes:
+            lots = [melanges[i:i + taille] for i in range(0, len(melanges) - taille + 1, taille)] or [melanges]
+            latences = time_calls(lambda lot: main.predict_eligibility_batch(lot, model), lots, warmup=2)
+            resultats[f"batch_{taille}"] = summarize(latences, rows=sum(len(lot) for lot in lots))
+
+    async def predire_servi(donneur: Dict[str, Any]) -> Any:
+        return await main.predict_eligibility_async(donneur, model)
+
+    async def chemin_servi() -> Dict[str, Dict[str, Any]]:
+        servis: Dict[str, Dict[str, Any]] = {}
+        await main.inference_scheduler.start()
+        try:
+            servis["served_rules"] = summarize(await time_calls_async(predire_servi, regles))
+            with _CacheDesactive(main.prediction_cache):
+                servis["served_model"] = summarize(await time_calls_async(predire_servi, modeles))
+            main.prediction_cache.invalidate()
+            for donneur in modeles:
+                await predire_servi(donneur)
+            servis["served_model_cached"] = summarize(await time_calls_async(predire_servi, modeles, warmup=0))
+
+            with _CacheDesactive(main.prediction_cache):
+                for taille in batch_sizes:
+                    lots = [melanges[i:i + taille] for i in range(0, len(melanges) - taille + 1, taille)] or [melanges]
+
+                    async def lot_servi(lot: List[Dict[str, Any]]) -> Any:
+                        return await main.inference_scheduler.run(main.predict_eligibility_batch, lot, model)
+
+                    latences = await time_calls_async(lot_servi, lots, warmup=2)
+                    servis[f"served_batch_{taille}"] = summarize(latences, rows=sum(len(lot) for lot in lots))
+        finally:
+            await main.inference_scheduler.stop()
+        return servis
+
+    resultats.update(asyncio.run(chemin_servi()))
+    return resultats
@@ -0,0 +1,117 @@
+# benchmark/payloads.py - Générateur de donneurs réalistes à partir des exemples du schéma
+import copy
+import random
+from typing import Any, Dict, List, Optional, Sequence
+
+# Profils générés : "mixte" (proportions réalistes), "regle" (au moins un critère d'exclusion),
+# "modele" (aucun critère d'exclusion : le donneur passe toujours par le modèle)
+PROFILS = ("mixte", "regle", "modele")
+
+# Critères d'exclusion absolus et conditions médicales simples (champs booléens de DonneurInput)
+EXCLUSIONS = ("porteur_vih_hbs_hcv", "drepanocytaire", "cardiaque")
+CONDITIONS = ("diabetique", "hypertendu", "asthmatique", "transfusion", "tatoue", "scarifie")
+
+# Seuils d'hémoglobine de la règle « hemoglobine » (REGLES_EXCLUSION de main.py)
+SEUILS_HEMOGLOBINE = {"Homme": 13.0, "Femme": 12.0}
+
+
+def example_payloads() -> List[Dict[str, Any]]:
+    """Donneurs d'exemple de `DonneurInput.Config.schema_extra`."""
+    from main import exemples_donneurs
+    return exemples_donneurs()
+
+
+def model_vocabulary(modele: Any = None) -> Dict[str, List[Any]]:
+    """Valeurs connues du modèle pour chaque champ catégoriel libre de l'API (profession, quartier...).
+
+    Lues dans l'encodeur précompilé de la version active ; vide si le modèle n'est pas chargé.
+    """
+    import main
+    try:
+        modele = modele or main.registry.get()
+    except Exception:
+        return {}
+    if modele.feature_encoder is None:
+        return {}
+    champs = {colonne: champ for champ, colonne in main.FEATURE_MAPPING.items()}
+    vocabulaire: Dict[str, List[Any]] = {}
+    for colonne, _, categories, *_ in modele.feature_encoder.get_state()["categorical"]:
+        champ = champs.get(colonne)
+        if champ is not None:
+            vocabulaire[champ] = [c for c in categories if isinstance(c, str) and c]
+    return vocabulaire
+
+
+class PayloadGenerator:
+    """Produit des variations des donneurs d'exemple, reproductibles à graine égale.
+
+    Les champs énumérés sont tirés dans leurs valeurs autorisées, les champs libres dans le
+    vocabulaire du modèle (avec une part de valeurs inconnues), l'âge et l'hémoglobine dans
+    leurs bornes de validation. Les proportions de conditions médicales sont configurables.
+    """
+
+    def __init__(self, seed: int = 0, vocabulary: Optional[Dict[str, Sequence[Any]]] = None,
+                 examples: Optional[List[Dict[str, Any]]] = None, exclusion_rate: float = 0.05,
+                 condition_rate: float = 0.08, unknown_rate: float = 0.05):
+        from main import DejaFaitDon, Genre, NiveauEtude, Religion, SituationMatrimoniale
+        self.random = random.Random(seed)
+        self.examples = examples or example_payloads()
+        self.vocabulary = {champ: list(valeurs) for champ, valeurs in (vocabulary or {}).items() if valeurs}
+        self.enums = {
+            "genre": [e.value for e in Genre],
+            "niveau_etude": [e.value for e in NiveauEtude],
+            "situation_matrimoniale": [e.value for e in SituationMatrimoniale],
+            "religion": [e.value for e in Religion],
+            "deja_donne": [e.value for e in DejaFaitDon],
+        }
+        self.exclusion_rate = exclusion_rate
+        self.condition_rate = condition_rate
+        self.unknown_rate = unknown_rate
+
+    def _libre(self, champ: str, valeur: Any) -> Any:
+        r = self.random
+        valeurs = self.vocabulary.get(champ)
+        if r.random() < self.unknown_rate:
+            return f"{valeur} {r.randint(1, 999)}"
+        return r.choice(valeurs) if valeurs else valeur
+
+    def payload(self, profil: str = "mixte") -> Dict[str, Any]:
+        if profil not in PROFILS:
+            raise ValueError(f"Profil inconnu: {profil} (attendu: {', '.join(PROFILS)})")
+        r = self.random
+        donneur = copy.deepcopy(r.choice(self.examples))
+
+        donneur["age"] = r.randint(18, 70)
+        for champ, valeurs in self.enums.items():
+            donneur[champ] = r.choice(valeurs)
+        for champ in ("profession", "nationalite", "arrondissement", "quartier"):
+            donneur[champ] = self._libre(champ, donneur.get(champ))
+        for condition in CONDITIONS:
+            donneur[condition] = r.random() < self.condition_rate
+
+        seuil = SEUILS_HEMOGLOBINE[donneur["genre"]]
+        for exclusion in EXCLUSIONS:
+            donneur[exclusion] = profil == "mixte" and r.random() < self.exclusion_rate
+        if profil == "modele":
+            donneur["taux_hemoglobine"] = round(r.uniform(seuil, 20.0), 1)
+        else:
+            donneur["taux_hemoglobine"] = round(r.gauss(seuil + 1.5, 1.6), 1)
+            donneur["taux_hemoglobine"] = min(20.0, max(7.0, donneur["taux_hemoglobine"]))
+        if profil == "regle" and donneur["taux_hemoglobine"] >= seuil:
+            # Au moins un critère d'exclusion : hémoglobine basse ou contre-indication absolue
+            if r.random() < 0.5:
+                donneur["taux_hemoglobine"] = round(r.uniform(7.0, seuil - 0.1), 1)
+            else:
+                donneur[r.choice(EXCLUSIONS)] = True
+        return donneur
+
+    def payloads(self, n: int, profil: str = "mixte") -> List[Dict[str, Any]]:
+        return [self.payload(profil) for _ in range(n)]
+
+
+def generate_payloads(n: int, profil: str = "mixte", seed: int = 0,
+                      vocabulary: Optional[Dict[str, Sequence[Any]]] = None) -> List[Dict[str, Any]]:
+    """Raccourci : `n` donneurs du profil demandé, vocabulaire du modèle actif par défaut."""
+    if vocabulary is None:
+        vocabulary = model_vocabulary()
+    return PayloadGenerator(seed=seed, vocabulary=vocabulary).payloads(n, profil)
@@ -0,0 +1,184 @@
+# benchmark/replay.py - Rejeu d'un journal de requêtes sur plusieurs versions de modèle, en processus parallèles
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from benchmark.report import summarize
+from shadow import Comparison, eligibility_score
+
+# Donneurs rejoués : hérités par les processus au fork plutôt que transmis avec chaque tâche
+_ENTREES: List[Dict[str, Any]] = []
+
+
+def _audit_log(path: str) -> bool:
+    # Journal d'audit (dossier, base SQLite ou JSONL d'enregistrements input/output) ou fichier de donneurs
+    if os.path.isdir(path) or path.endswith((".sqlite3", ".sqlite", ".db")):
+        return True
+    with open(path, encoding="utf-8") as f:
+        for ligne in f:
+            if ligne.strip():
+                try:
+                    premier = json.loads(ligne)
+                except ValueError:
+                    return False
+                return isinstance(premier, dict) and "input" in premier and "output" in premier
+    return False
+
+
+def load_requests(path: str, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """Donneurs à rejouer, et réponses journalisées lorsqu'il s'agit d'un journal d'audit.
+
+    Un journal d'audit (voir audit_log.read_records) fournit les entrées déjà validées de
+    /predict et /predict/batch ; un fichier NDJSON ou CSV de donneurs est validé comme par
+    `python main.py score` (les lignes invalides sont ignorées).
+    """
+    import main
+    entrees: List[Dict[str, Any]] = []
+    if _audit_log(path):
+        from audit_log import read_records
+        reponses: Optional[List[Dict[str, Any]]] = []
+        for enregistrement in read_records(path):
+            if enregistrement.get("endpoint") not in ("predict", "batch"):
+                continue
+            entrees.append(enregistrement["input"])
+            reponses.append(enregistrement["output"])
+            if limit and len(entrees) >= limit:
+                break
+        return entrees, reponses
+
+    from stream_scoring import RecordParser, detect_format
+    parser = RecordParser(detect_format(filename=path))
+    invalides = 0
+
+    def ajouter(enregistrements: List[Any]) -> None:
+        nonlocal invalides
+        for enregistrement in enregistrements:
+            entree = main.valider_enregistrement(enregistrement)
+            if "donneur" in entree:
+                entrees.append(entree["donneur"])
+            else:
+                invalides += 1
+
+    with open(path, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 16), b""):
+            ajouter(parser.feed(bloc))
+            if limit and len(entrees) >= limit:
+                break
+        else:
+            ajouter(parser.close())
+    if invalides:
+        print(f"{invalides} lignes invalides ignorées")
+    return entrees[:limit] if limit else entrees, None
+
+
+def _initialiser() -> None:
+    import main
+    # Chaque ligne passe par le modèle : le débit mesuré est celui du modèle, pas du cache
+    main.prediction_cache.max_size = 0
+
+
+def _noter(version: str, debut: int, fin: int) -> Tuple[str, int, List[Tuple[str, float]], float]:
+    import main
+    t = time.perf_counter()
+    resultats = main.predict_eligibility_batch(_ENTREES[debut:fin], version)
+    duree = time.perf_counter() - t
+    return version, debut, [(r["prediction"], float(r["confidence"])) for r in resultats], duree
+
+
+def _latences(version: str, indices: List[int]) -> Tuple[str, List[float]]:
+    import main
+    latences = []
+    for i in indices:
+        t = time.perf_counter()
+        main.predict_eligibility(_ENTREES[i], version)
+        latences.append(time.perf_counter() - t)
+    return version, latences
+
+
+def run_replay(entrees: List[Dict[str, Any]], versions: Sequence[str], reference: Optional[str] = None,
+               logged: Optional[List[Dict[str, Any]]] = None, processes: Optional[int] = None,
+               chunk_rows: int = 1000, latency_sample: int = 500) -> Dict[str, Any]:
+    """Note `entrees` avec chaque version et compare les réponses.
+
+    Les tranches (version, lignes) sont réparties entre `processes` processus forkés
+    après le chargement des modèles. Pour chaque version : débit par processus (notation
+    par lot), latence d'un appel unitaire sur `latency_sample` donneurs notés par le
+    modèle, part d'éligibles, puis accord et dérive de confiance par rapport à la version
+    `reference` (la première par défaut) et aux réponses journalisées. Seuls les donneurs sans critère d'exclusion
+    entrent dans les comparaisons : les autres reçoivent la même réponse de tous les modèles.
+    """
+    global _ENTREES
+    import main
+    for version in versions:
+        main.registry.load(version)
+    reference = reference or versions[0]
+    _ENTREES = entrees
+    n = len(entrees)
+    premieres_regles = main.moteur_regles.evaluate_batch(entrees)[0] if n else []
+    lignes_modele = [i for i in range(n) if premieres_regles[i] < 0]
+    echantillon = lignes_modele[:latency_sample]
+
+    processes = processes or os.cpu_count() or 1
+    taches = [(version, debut, min(debut + chunk_rows, n)) for version in versions for debut in range(0, n, chunk_rows)]
+    reponses: Dict[str, List[Optional[Dict[str, Any]]]] = {version: [None] * n for version in versions}
+    durees: Dict[str, float] = dict.fromkeys(versions, 0.0)
+    latences: Dict[str, List[float]] = {}
+
+    debut_rejeu = time.perf_counter()
+    if processes > 1 and hasattr(os, "fork"):
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("fork"),
+                                 initializer=_initialiser) as pool:
+            notes = [pool.submit(_noter, *tache) for tache in taches]
+            mesures = [pool.submit(_latences, version, echantillon) for version in versions]
+            resultats = [future.result() for future in notes]
+            latences = dict(future.result() for future in mesures)
+    else:
+        cache = main.prediction_cache.max_size
+        _initialiser()
+        try:
+            resultats = [_noter(*tache) for tache in taches]
+            latences = dict(_latences(version, echantillon) for version in versions)
+        finally:
+            main.prediction_cache.max_size = cache
+    mur = time.perf_counter() - debut_rejeu
+
+    for version, debut, notes_tranche, duree in resultats:
+        durees[version] += duree
+        for i, (prediction, confidence) in enumerate(notes_tranche, start=debut):
+            reponses[version][i] = {"prediction": prediction, "confidence": confidence}
+
+    modeles: Dict[str, Any] = {}
+    for version in versions:
+        par_version = reponses[version]
+        resume: Dict[str, Any] = {
+            "rows": n,
+            "rows_per_s": n / durees[version] if durees[version] > 0 else None,
+            "eligible_rate": sum(r["prediction"] == "Éligible" for r in par_version) / n if n else None,
+            "mean_eligibility": sum(eligibility_score(r) for r in par_version) / n if n else None,
+            "latency": summarize(latences.get(version, [])),
+        }
+        if version != reference:
+            comparaison = Comparison()
+            for i in lignes_modele:
+                comparaison.add(reponses[reference][i], par_version[i])
+            resume["vs_reference"] = comparaison.summary()
+        if logged is not None:
+            comparaison = Comparison()
+            for i in lignes_modele:
+                comparaison.add(logged[i], par_version[i])
+            resume["vs_logged"] = comparaison.summary()
+        modeles[version] = resume
+
+    return {
+        "rows": n,
+        "rule_rows": n - len(lignes_modele),
+        "reference": reference,
+        "processes": processes,
+        "chunk_rows": chunk_rows,
+        "wall_s": mur,
+        "rows_per_s": n * len(versions) / mur if mur > 0 else None,
+        "models": modeles,
+    }
@@ -0,0 +1,120 @@
+# benchmark/report.py - Statistiques de latence, fichier de résultats JSON et comparaison
+import datetime
+import json
+import os
+import platform
+import subprocess
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Variables d'environnement recopiées dans les métadonnées (configuration mesurée)
+VARIABLES_CONFIGURATION = ("MODEL_DIR", "DEFAULT_MODEL", "MODEL_ENGINE", "MODEL_FORMAT", "MODEL_MMAP",
+                           "INFERENCE_WORKERS", "INFERENCE_MAX_BATCH", "INFERENCE_MAX_WAIT_MS",
+                           "INFERENCE_QUEUE_SIZE", "INFERENCE_EXECUTOR",
+                           "PREDICTION_CACHE_SIZE", "PREDICTION_CACHE_TTL")
+
+
+def summarize(latencies: Sequence[float], elapsed: Optional[float] = None, rows: Optional[int] = None) -> Dict[str, Any]:
+    """Résumé d'une série de latences (secondes) : moyenne, p50/p95/p99, max et débit.
+
+    `elapsed` est la durée totale de la mesure (somme des latences par défaut) ;
+    `rows` le nombre de donneurs évalués lorsqu'un appel en traite plusieurs.
+    """
+    values = np.asarray(latencies, dtype=np.float64)
+    if values.size == 0:
+        return {"count": 0}
+    elapsed = float(values.sum()) if elapsed is None else elapsed
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    resume = {
+        "count": int(values.size),
+        "mean_ms": float(values.mean() * 1000),
+        "p50_ms": float(p50 * 1000),
+        "p95_ms": float(p95 * 1000),
+        "p99_ms": float(p99 * 1000),
+        "max_ms": float(values.max() * 1000),
+        "elapsed_s": elapsed,
+        "throughput_per_s": values.size / elapsed if elapsed > 0 else None,
+    }
+    if rows is not None:
+        resume["rows"] = rows
+        resume["rows_per_s"] = rows / elapsed if elapsed > 0 else None
+    return resume
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                              ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadata(modele: Any = None, **extra: Any) -> Dict[str, Any]:
+    """Contexte de la mesure : version du code et du modèle, configuration, machine."""
+    meta = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "environment": {cle: os.environ[cle] for cle in VARIABLES_CONFIGURATION if cle in os.environ},
+    }
+    if modele is not None:
+        meta["model"] = {"version": modele.version, "engine": modele.engine,
+                         "format": getattr(modele, "format", None)}
+    meta.update(extra)
+    return meta
+
+
+def default_output(prefix: str = "bench") -> str:
+    horodatage = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"{prefix}_{horodatage}.json")
+
+
+def write_results(results: Dict[str, Any], path: Optional[str] = None, prefix: str = "bench") -> str:
+    path = path or default_output(prefix)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Résultats écrits dans: {path}")
+    return path
+
+
+def _mesures(results: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    # Aplatit les résultats : "micro.<nom>" et "load.<endpoint>.c<concurrence>"
+    mesures = {f"micro.{nom}": resume for nom, resume in results.get("micro", {}).items()}
+    for niveau in results.get("load", []):
+        mesures[f"load.{niveau['endpoint']}.c{niveau['concurrency']}"] = niveau
+    return mesures
+
+
+def compare(reference: Dict[str, Any], candidate: Dict[str, Any],
+            keys: Sequence[str] = ("p50_ms", "p99_ms", "throughput_per_s")) -> List[Dict[str, Any]]:
+    """Compare deux fichiers de résultats mesure par mesure.
+
+    Pour chaque clé : `<clé>_ref`, `<clé>_new` et `<clé>_ratio` (candidat / référence).
+    """
+    avant, apres = _mesures(reference), _mesures(candidate)
+    lignes = []
+    for nom in sorted(set(avant) & set(apres)):
+        ligne: Dict[str, Any] = {"name": nom}
+        for cle in keys:
+            a, b = avant[nom].get(cle), apres[nom].get(cle)
+            ligne[f"{cle}_ref"], ligne[f"{cle}_new"] = a, b
+            ligne[f"{cle}_ratio"] = b / a if a and b is not None else None
+        lignes.append(ligne)
+    return lignes
+
+
+def print_table(titre: str, lignes: List[Dict[str, Any]], colonnes: Sequence[str]) -> None:
+    print(f"\n{titre}")
+    print(f"  {'mesure':<32}" + " ".join(f"{colonne:>16}" for colonne in colonnes))
+    for ligne in lignes:
+        valeurs = []
+        for colonne in colonnes:
+            valeur = ligne.get(colonne)
+            valeurs.append(f"{valeur:>16.3f}" if isinstance(valeur, float) else f"{str(valeur):>16}")
+        print(f"  {ligne['name']:<32}" + " ".join(valeurs))
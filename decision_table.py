@@ -0,0 +1,130 @@
+# decision_table.py - Table dense des probabilités du modèle sur un petit espace d'entrées discret
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Incrémenté à chaque changement de disposition du fichier de cache
+TABLE_FORMAT = 1
+
+# Dimension de la table : (champ de l'API, valeurs énumérées)
+Dimension = Tuple[str, Sequence[Any]]
+
+
+def _texte(value: Any) -> Any:
+    # Valeurs des énumérations du schéma -> chaînes (description stable de la table)
+    return getattr(value, "value", value)
+
+
+class DecisionTable:
+    """Probabilités du modèle pour chaque combinaison de valeurs des `dimensions`,
+    les autres champs lus par le modèle étant égaux à leur valeur dans `fixed`.
+
+    `lookup(donneur)` renvoie la ligne de probabilités d'un donneur couvert par la table
+    (toutes ses dimensions ont une valeur énumérée, tous les champs fixes ont exactement
+    la valeur attendue), None sinon : le donneur passe alors par le modèle. Le résultat
+    est celui que le modèle donnerait pour ce donneur, l'inférence en moins.
+    """
+
+    def __init__(self, dimensions: Sequence[Dimension], fixed: Dict[str, Any], probabilities: np.ndarray):
+        self.dimensions = [(field, list(values)) for field, values in dimensions]
+        self.fixed = dict(fixed)
+        self.shape = tuple(len(values) for _, values in self.dimensions)
+        self.probabilities = probabilities.reshape(-1, probabilities.shape[-1])
+        if self.probabilities.shape[0] != int(np.prod(self.shape)):
+            raise ValueError("La table ne correspond pas aux dimensions")
+
+        # Position de chaque valeur et pas de chaque dimension dans la table aplatie. Un membre
+        # d'énumération n'a pas le hachage de sa chaîne : les deux formes sont indexées.
+        strides = np.cumprod((1,) + self.shape[:0:-1])[::-1]
+        self._dims = []
+        for (field, values), stride in zip(self.dimensions, strides):
+            codes = {}
+            for k, value in enumerate(values):
+                codes[value] = codes[_texte(value)] = k
+            self._dims.append((field, codes, int(stride)))
+        self._fixed = list(self.fixed.items())
+
+    def __len__(self) -> int:
+        return self.probabilities.shape[0]
+
+    @staticmethod
+    def describe(dimensions: Sequence[Dimension], fixed: Dict[str, Any]) -> Dict[str, Any]:
+        return {"format": TABLE_FORMAT,
+                "dimensions": [[field, [_texte(v) for v in values]] for field, values in dimensions],
+                "fixed": {field: _texte(value) for field, value in fixed.items()}}
+
+    @classmethod
+    def key(cls, model_hash: str, dimensions: Sequence[Dimension], fixed: Dict[str, Any],
+            options: Optional[Dict[str, Any]] = None) -> str:
+        """Clé du fichier de cache : condensé du modèle, de l'espace énuméré et des options d'encodage."""
+        description = {"model": model_hash, "options": options or {}, **cls.describe(dimensions, fixed)}
+        texte = json.dumps(description, sort_keys=True, ensure_ascii=False)
+        return hashlib.blake2b(texte.encode("utf-8"), digest_size=12).hexdigest()
+
+    @classmethod
+    def build(cls, dimensions: Sequence[Dimension], fixed: Dict[str, Any],
+              predict_proba: Callable[[List[Dict[str, Any]]], np.ndarray], chunk_rows: int = 2048) -> "DecisionTable":
+        """Énumère l'espace (ordre C : la dernière dimension varie le plus vite) et note chaque
+        combinaison par tranches de `chunk_rows` donneurs avec `predict_proba(donneurs)`."""
+        champs = [field for field, _ in dimensions]
+        combinaisons = itertools.product(*(values for _, values in dimensions))
+        tranches: List[np.ndarray] = []
+        while True:
+            donneurs = [{**fixed, **dict(zip(champs, valeurs))}
+                        for valeurs in itertools.islice(combinaisons, chunk_rows)]
+            if not donneurs:
+                break
+            tranches.append(np.asarray(predict_proba(donneurs), dtype=np.float64))
+        return cls(dimensions, fixed, np.concatenate(tranches))
+
+    def index(self, champs: Dict[str, Any]) -> int:
+        """Position d'un donneur dans la table aplatie, ou -1 s'il n'est pas couvert."""
+        get = champs.get
+        for field, value in self._fixed:
+            if get(field) != value:
+                return -1
+        position = 0
+        for field, codes, stride in self._dims:
+            try:
+                code = codes.get(get(field))
+            except TypeError:
+                return -1
+            if code is None:
+                return -1
+            position += code * stride
+        return position
+
+    def lookup(self, champs: Dict[str, Any]) -> Optional[np.ndarray]:
+        position = self.index(champs)
+        return self.probabilities[position] if position >= 0 else None
+
+    # ------------------------------------------------------------------
+    # Fichier de cache
+    # ------------------------------------------------------------------
+    def save(self, path: str) -> str:
+        """Écrit les probabilités dans `path` (.npy), de façon atomique."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(suffix=".npy", dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(descripteur, "wb") as f:
+                np.save(f, self.probabilities)
+            os.replace(temporaire, path)
+        except BaseException:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            raise
+        return path
+
+    @classmethod
+    def load(cls, path: str, dimensions: Sequence[Dimension], fixed: Dict[str, Any]) -> Optional["DecisionTable"]:
+        """Table enregistrée par `save` (projetée en mémoire), ou None si le fichier est absent ou illisible."""
+        try:
+            probabilities = np.asarray(np.load(path, mmap_mode="r"))
+            return cls(dimensions, fixed, probabilities)
+        except (OSError, ValueError):
+            return None
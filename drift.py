@@ -0,0 +1,654 @@
+# drift.py - Suivi de la dérive des entrées : esquisses en flux (histogrammes, count-min), comparées à une référence
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shadow import eligibility_score
+
+BASELINE_FORMAT = 1
+
+# Issue d'une prédiction faite par le modèle (les autres issues sont les identifiants des règles d'exclusion)
+MODEL_OUTCOME = "model"
+
+# Histogramme de la probabilité d'éligibilité (en %), par pas de 1 point
+CONFIDENCE_BINS = (0.0, 101.0, 1.0)
+
+# Intervalle minimal entre deux calculs des PSI exposés dans les métriques (secondes)
+PSI_REFRESH_S = 15.0
+
+# Plancher des proportions dans le PSI (une classe vide ne donne pas un indice infini)
+PSI_EPSILON = 1e-4
+
+
+def _texte(value: Any) -> str:
+    if isinstance(value, Enum):
+        value = value.value
+    return "" if value is None else str(value).strip()
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Indice de stabilité de population entre deux distributions (effectifs par classe).
+
+    Usage courant : < 0,1 stable, 0,1 à 0,25 dérive modérée, > 0,25 dérive importante.
+    """
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if expected.sum() <= 0 or actual.sum() <= 0:
+        return 0.0
+    p = np.maximum(expected / expected.sum(), PSI_EPSILON)
+    q = np.maximum(actual / actual.sum(), PSI_EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+class Histogram:
+    """Histogramme à pas fixe sur [low, high), plus une classe pour chaque débordement.
+
+    Mémoire constante ; deux histogrammes de mêmes bornes se fusionnent par addition.
+    Les quantiles sont interpolés dans la classe qui les contient.
+    """
+
+    def __init__(self, low: float, high: float, width: float):
+        self.low = float(low)
+        self.high = float(high)
+        self.width = float(width)
+        self.bins = int(round((self.high - self.low) / self.width))
+        # [sous le minimum, classes..., au-delà du maximum]
+        self.counts = np.zeros(self.bins + 2, dtype=np.int64)
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def add(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        if not values.shape[0]:
+            return
+        # Le petit décalage range 13.0 dans la classe [13.0, 13.1) malgré l'arrondi de (13.0 - 7.0) / 0.1
+        index = np.floor((values - self.low) / self.width + 1e-9).astype(np.intp) + 1
+        self.counts += np.bincount(np.clip(index, 0, self.bins + 1), minlength=self.bins + 2)
+        self.sum += float(values.sum())
+        self.sum_sq += float(np.square(values).sum())
+
+    def compatible(self, other: "Histogram") -> bool:
+        return (self.low, self.high, self.bins) == (other.low, other.high, other.bins)
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        if not self.compatible(other):
+            raise ValueError("Histogrammes de bornes différentes")
+        self.counts += other.counts
+        self.sum += other.sum
+        self.sum_sq += other.sum_sq
+        return self
+
+    def copy(self) -> "Histogram":
+        histogram = Histogram(self.low, self.high, self.width)
+        histogram.merge(self)
+        return histogram
+
+    def quantile(self, q: float) -> Optional[float]:
+        count = self.count
+        if not count:
+            return None
+        cumulative = np.cumsum(self.counts)
+        position = q * count
+        index = int(np.searchsorted(cumulative, position, side="left"))
+        if index == 0:
+            return self.low
+        if index > self.bins:
+            return self.high
+        before = cumulative[index - 1]
+        fraction = (position - before) / self.counts[index] if self.counts[index] else 0.0
+        return float(self.low + (index - 1 + fraction) * self.width)
+
+    def cdf(self) -> np.ndarray:
+        return np.cumsum(self.counts) / max(1, self.count)
+
+    def summary(self) -> Dict[str, Any]:
+        count = self.count
+        if not count:
+            return {"count": 0}
+        mean = self.sum / count
+        return {
+            "count": count,
+            "mean": mean,
+            "std": math.sqrt(max(0.0, self.sum_sq / count - mean * mean)),
+            "p05": self.quantile(0.05),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "below_range": int(self.counts[0]),
+            "above_range": int(self.counts[-1]),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"low": self.low, "high": self.high, "width": self.width, "counts": self.counts.tolist(),
+                "sum": self.sum, "sum_sq": self.sum_sq}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "Histogram":
+        histogram = cls(state["low"], state["high"], state["width"])
+        counts = np.asarray(state["counts"], dtype=np.int64)
+        if counts.shape != histogram.counts.shape:
+            raise ValueError("Histogramme incohérent avec ses bornes")
+        histogram.counts = counts
+        histogram.sum = float(state["sum"])
+        histogram.sum_sq = float(state["sum_sq"])
+        return histogram
+
+
+class CountMinSketch:
+    """Esquisse count-min des valeurs d'un champ catégoriel, avec ses `top` valeurs les plus fréquentes.
+
+    Mémoire constante (`depth` x `width` compteurs) quel que soit le nombre de valeurs
+    distinctes. `estimate` ne sous-estime jamais : une estimation nulle signifie que la
+    valeur n'a jamais été vue. Les valeurs fréquentes sont les candidates dont
+    l'estimation est la plus élevée. Le hachage (blake2b) est stable d'un processus à
+    l'autre : une esquisse enregistrée se compare aux esquisses en cours.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4, top: int = 32):
+        self.width = int(width)
+        self.depth = int(depth)
+        self.top_size = int(top)
+        self.table = np.zeros(self.depth * self.width, dtype=np.int64)
+        self.total = 0
+        self.top: Dict[str, int] = {}
+        # Positions déjà calculées (les vocabulaires sont petits) ; vidé s'il devient trop grand
+        self._positions: Dict[str, np.ndarray] = {}
+
+    def _index(self, value: str) -> np.ndarray:
+        try:
+            return self._positions[value]
+        except KeyError:
+            pass
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=4 * self.depth).digest()
+        index = (np.frombuffer(digest, dtype="<u4") % self.width).astype(np.intp)
+        index += np.arange(self.depth, dtype=np.intp) * self.width
+        if len(self._positions) >= 4096:
+            self._positions.clear()
+        self._positions[value] = index
+        return index
+
+    def add(self, values: Iterable[str]) -> None:
+        counts = Counter(values)
+        if not counts:
+            return
+        index = np.concatenate([self._index(value) for value in counts])
+        weights = np.repeat(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)), self.depth)
+        self.table += np.bincount(index, weights=weights, minlength=self.table.shape[0]).astype(np.int64)
+        self.total += sum(counts.values())
+        self._update_top(counts)
+
+    def estimate(self, value: str) -> int:
+        return int(self.table[self._index(value)].min())
+
+    def _update_top(self, values: Iterable[str]) -> None:
+        for value in values:
+            self.top[value] = self.estimate(value)
+        if len(self.top) > self.top_size:
+            self.top = dict(sorted(self.top.items(), key=lambda item: -item[1])[:self.top_size])
+
+    def compatible(self, other: "CountMinSketch") -> bool:
+        return (self.width, self.depth) == (other.width, other.depth)
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        if not self.compatible(other):
+            raise ValueError("Esquisses count-min de dimensions différentes")
+        self.table += other.table
+        self.total += other.total
+        self._update_top(list(self.top) + list(other.top))
+        return self
+
+    def copy(self) -> "CountMinSketch":
+        sketch = CountMinSketch(self.width, self.depth, self.top_size)
+        sketch.table = self.table.copy()
+        sketch.total = self.total
+        sketch.top = dict(self.top)
+        return sketch
+
+    def summary(self) -> Dict[str, Any]:
+        return {"count": self.total,
+                "top": dict(sorted(self.top.items(), key=lambda item: -item[1]))}
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Compteurs non nuls seulement : la plupart des cases restent vides
+        nonzero = np.flatnonzero(self.table)
+        return {"width": self.width, "depth": self.depth, "top_size": self.top_size, "total": self.total,
+                "index": nonzero.tolist(), "counts": self.table[nonzero].tolist(), "top": self.top}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "CountMinSketch":
+        sketch = cls(state["width"], state["depth"], state["top_size"])
+        sketch.table[np.asarray(state["index"], dtype=np.intp)] = np.asarray(state["counts"], dtype=np.int64)
+        sketch.total = int(state["total"])
+        sketch.top = {value: int(count) for value, count in state["top"].items()}
+        return sketch
+
+
+class Profile:
+    """Distribution résumée d'un ensemble de prédictions : champs numériques et catégoriels,
+    issues (modèle ou règle d'exclusion) et probabilité d'éligibilité donnée par le modèle."""
+
+    def __init__(self, numeric: Dict[str, Tuple[float, float, float]], categorical: Sequence[str],
+                 width: int = 2048, depth: int = 4, top: int = 32):
+        self.numeric = {field: Histogram(*bounds) for field, bounds in numeric.items()}
+        self.categorical = {field: CountMinSketch(width, depth, top) for field in categorical}
+        self.outcomes: Counter = Counter()
+        self.confidence = Histogram(*CONFIDENCE_BINS)
+        self.eligible = 0
+
+    @property
+    def rows(self) -> int:
+        return sum(self.outcomes.values())
+
+    def add(self, rows: Sequence[Tuple[Dict[str, Any], str, Optional[float]]]) -> None:
+        """Ajoute des lignes (champs du donneur, issue, probabilité d'éligibilité du modèle ou None)."""
+        if not rows:
+            return
+        for field, histogram in self.numeric.items():
+            histogram.add(np.array([champs[field] for champs, _, _ in rows
+                                    if isinstance(champs.get(field), (int, float))], dtype=np.float64))
+        for field, sketch in self.categorical.items():
+            sketch.add(_texte(champs.get(field)) for champs, _, _ in rows)
+        scores = np.array([score for _, _, score in rows if score is not None], dtype=np.float64)
+        self.confidence.add(scores)
+        self.eligible += int((scores > 50.0).sum())
+        self.outcomes.update(issue for _, issue, _ in rows)
+
+    def merge(self, other: "Profile") -> "Profile":
+        for field, histogram in self.numeric.items():
+            histogram.merge(other.numeric[field])
+        for field, sketch in self.categorical.items():
+            sketch.merge(other.categorical[field])
+        self.outcomes.update(other.outcomes)
+        self.confidence.merge(other.confidence)
+        self.eligible += other.eligible
+        return self
+
+    def copy(self) -> "Profile":
+        profile = Profile.__new__(Profile)
+        profile.numeric = {field: histogram.copy() for field, histogram in self.numeric.items()}
+        profile.categorical = {field: sketch.copy() for field, sketch in self.categorical.items()}
+        profile.outcomes = Counter(self.outcomes)
+        profile.confidence = self.confidence.copy()
+        profile.eligible = self.eligible
+        return profile
+
+    def summary(self) -> Dict[str, Any]:
+        rows = self.rows
+        return {
+            "rows": rows,
+            "features": {**{field: histogram.summary() for field, histogram in self.numeric.items()},
+                         **{field: sketch.summary() for field, sketch in self.categorical.items()}},
+            "outcomes": dict(self.outcomes),
+            "rule_rejection_rate": 1.0 - self.outcomes[MODEL_OUTCOME] / rows if rows else None,
+            "confidence": self.confidence.summary(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "numeric": {field: histogram.to_dict() for field, histogram in self.numeric.items()},
+            "categorical": {field: sketch.to_dict() for field, sketch in self.categorical.items()},
+            "outcomes": dict(self.outcomes),
+            "confidence": self.confidence.to_dict(),
+            "eligible": self.eligible,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "Profile":
+        profile = cls.__new__(cls)
+        profile.numeric = {field: Histogram.from_dict(histogram) for field, histogram in state["numeric"].items()}
+        profile.categorical = {field: CountMinSketch.from_dict(sketch)
+                               for field, sketch in state["categorical"].items()}
+        profile.outcomes = Counter(state["outcomes"])
+        profile.confidence = Histogram.from_dict(state["confidence"])
+        profile.eligible = int(state["eligible"])
+        return profile
+
+    def compatible(self, other: "Profile") -> bool:
+        return (self.numeric.keys() == other.numeric.keys()
+                and self.categorical.keys() == other.categorical.keys()
+                and all(h.compatible(other.numeric[f]) for f, h in self.numeric.items())
+                and all(s.compatible(other.categorical[f]) for f, s in self.categorical.items())
+                and self.confidence.compatible(other.confidence))
+
+
+def _compare_histograms(baseline: Histogram, live: Histogram, groups: int = 10) -> Dict[str, Any]:
+    # PSI sur les déciles de la référence (les classes fines donneraient un indice trop bruité),
+    # et écart maximal entre fonctions de répartition (Kolmogorov-Smirnov) sur les classes fines
+    before = (np.cumsum(baseline.counts) - baseline.counts) / max(1, baseline.count)
+    group = np.minimum((before * groups).astype(np.intp), groups - 1)
+    expected = np.bincount(group, weights=baseline.counts, minlength=groups)
+    actual = np.bincount(group, weights=live.counts, minlength=groups)
+    return {"psi": psi(expected, actual), "ks": float(np.abs(baseline.cdf() - live.cdf()).max()),
+            "baseline": baseline.summary(), "live": live.summary()}
+
+
+def _compare_sketches(baseline: CountMinSketch, live: CountMinSketch) -> Dict[str, Any]:
+    # Valeurs fréquentes de l'une ou l'autre esquisse, plus une classe « autres »
+    values = list(dict.fromkeys(list(baseline.top) + list(live.top)))
+    expected = np.array([baseline.estimate(value) for value in values] + [0], dtype=np.float64)
+    actual = np.array([live.estimate(value) for value in values] + [0], dtype=np.float64)
+    # Les estimations count-min peuvent dépasser le total : « autres » ne descend pas sous zéro
+    expected[-1] = max(0.0, baseline.total - expected[:-1].sum())
+    actual[-1] = max(0.0, live.total - actual[:-1].sum())
+    new_values = {value: count for value, count in live.summary()["top"].items() if baseline.estimate(value) == 0}
+    return {"psi": psi(expected, actual), "new_values": new_values,
+            "new_values_rate": sum(new_values.values()) / live.total if live.total else 0.0,
+            "baseline": baseline.summary(), "live": live.summary()}
+
+
+def compare(baseline: Profile, live: Profile, threshold: float = 0.2) -> Dict[str, Any]:
+    """Compare un profil récent à la référence ; `drift` : PSI supérieur ou égal à `threshold`."""
+    features: Dict[str, Dict[str, Any]] = {}
+    for field, histogram in live.numeric.items():
+        features[field] = _compare_histograms(baseline.numeric[field], histogram)
+    for field, sketch in live.categorical.items():
+        features[field] = _compare_sketches(baseline.categorical[field], sketch)
+    for comparison in features.values():
+        comparison["drift"] = comparison["psi"] >= threshold
+
+    issues = sorted(set(baseline.outcomes) | set(live.outcomes))
+    base_rows, live_rows = baseline.rows, live.rows
+    rules = {
+        "psi": psi([baseline.outcomes[issue] for issue in issues], [live.outcomes[issue] for issue in issues]),
+        "baseline_rate": 1.0 - baseline.outcomes[MODEL_OUTCOME] / base_rows if base_rows else None,
+        "live_rate": 1.0 - live.outcomes[MODEL_OUTCOME] / live_rows if live_rows else None,
+        "by_rule": {issue: {"baseline": baseline.outcomes[issue] / base_rows if base_rows else None,
+                            "live": live.outcomes[issue] / live_rows if live_rows else None}
+                    for issue in issues if issue != MODEL_OUTCOME},
+    }
+    rules["drift"] = rules["psi"] >= threshold
+
+    confidence = _compare_histograms(baseline.confidence, live.confidence)
+    confidence["drift"] = confidence["psi"] >= threshold
+    confidence["baseline"]["eligible_rate"] = baseline.eligible / baseline.confidence.count \
+        if baseline.confidence.count else None
+    confidence["live"]["eligible_rate"] = live.eligible / live.confidence.count if live.confidence.count else None
+
+    drifted = [field for field, comparison in features.items() if comparison["drift"]]
+    if rules["drift"]:
+        drifted.append("rule_rejection")
+    if confidence["drift"]:
+        drifted.append("confidence")
+    return {"drifted": drifted, "features": features, "rule_rejection": rules, "confidence": confidence}
+
+
+class DriftMonitor:
+    """Résume en continu les entrées et les réponses de l'API et les compare à une référence.
+
+    `submit` (appelable depuis la boucle d'événements comme depuis le pool d'inférence)
+    ne fait que déposer la paire (donneur, réponse) dans une file bornée : les esquisses
+    sont mises à jour par lots, toutes les `flush_interval` secondes, dans un thread dédié
+    (un seul : les esquisses n'ont pas besoin de verrou). File pleine : la paire est
+    abandonnée et comptée dans `dropped` (compteurs de `submit` sous verrou : ils sont
+    incrémentés depuis plusieurs threads).
+
+    Les données récentes sont la fenêtre en cours et la précédente (`window` secondes
+    chacune, 0 : depuis le démarrage) : la mémoire reste constante et une dérive récente
+    n'est pas diluée dans tout l'historique. La référence est un profil enregistré
+    (`baseline_path`), construit hors ligne à partir d'un registre ou figé à partir des
+    données récentes. Chaque processus suit ses propres requêtes.
+    """
+
+    def __init__(self, numeric: Dict[str, Tuple[float, float, float]], categorical: Sequence[str],
+                 outcome: Callable[[Dict[str, Any]], str] = lambda result: MODEL_OUTCOME,
+                 enabled: bool = True, sample_rate: float = 1.0, window: float = 3600.0,
+                 baseline_path: Optional[str] = None, psi_threshold: float = 0.2, min_rows: int = 100,
+                 flush_interval: float = 1.0, max_queue_size: int = 10000,
+                 width: int = 2048, depth: int = 4, top: int = 32):
+        self.numeric = dict(numeric)
+        self.categorical = list(categorical)
+        self.outcome = outcome
+        self.enabled = enabled
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.window = window
+        self.baseline_path = baseline_path
+        self.psi_threshold = psi_threshold
+        self.min_rows = max(1, min_rows)
+        self.flush_interval = flush_interval
+        self.max_queue_size = max(1, max_queue_size)
+        self._sketch = {"width": width, "depth": depth, "top": top}
+
+        self._pending: deque = deque()
+        self._current = self.new_profile()
+        self._previous = self.new_profile()
+        self._window_start = time.monotonic()
+        self.baseline: Optional[Profile] = None
+        # PSI de chaque élément suivi, recalculé au plus toutes les PSI_REFRESH_S secondes (lu par les métriques)
+        self.last_psi: Dict[str, float] = {}
+        self._psi_at = -math.inf
+
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopping = False
+
+        self.recorded = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self._counts_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, numeric: Dict[str, Tuple[float, float, float]], categorical: Sequence[str],
+                 outcome: Callable[[Dict[str, Any]], str], default_baseline: Optional[str] = None) -> "DriftMonitor":
+        """Construit le moniteur à partir de DRIFT_MONITOR (0 : désactivé), DRIFT_SAMPLE_RATE,
+        DRIFT_WINDOW (secondes), DRIFT_BASELINE, DRIFT_PSI_THRESHOLD, DRIFT_MIN_ROWS,
+        DRIFT_FLUSH_INTERVAL, DRIFT_QUEUE_SIZE et DRIFT_SKETCH_WIDTH / DEPTH / TOP."""
+        return cls(
+            numeric, categorical, outcome,
+            enabled=os.environ.get("DRIFT_MONITOR", "1").lower() in ("1", "true", "oui", "yes"),
+            sample_rate=float(os.environ.get("DRIFT_SAMPLE_RATE", 1.0)),
+            window=float(os.environ.get("DRIFT_WINDOW", 3600)),
+            baseline_path=os.environ.get("DRIFT_BASELINE", default_baseline),
+            psi_threshold=float(os.environ.get("DRIFT_PSI_THRESHOLD", 0.2)),
+            min_rows=int(os.environ.get("DRIFT_MIN_ROWS", 100)),
+            flush_interval=float(os.environ.get("DRIFT_FLUSH_INTERVAL", 1.0)),
+            max_queue_size=int(os.environ.get("DRIFT_QUEUE_SIZE", 10000)),
+            width=int(os.environ.get("DRIFT_SKETCH_WIDTH", 2048)),
+            depth=int(os.environ.get("DRIFT_SKETCH_DEPTH", 4)),
+            top=int(os.environ.get("DRIFT_SKETCH_TOP", 32)),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._pending)
+
+    def new_profile(self) -> Profile:
+        return Profile(self.numeric, self.categorical, **self._sketch)
+
+    # ------------------------------------------------------------------
+    # Côté requêtes
+    # ------------------------------------------------------------------
+    def submit(self, input_data: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        """Dépose une prédiction à résumer ; False si elle n'est pas retenue (échantillon, file pleine, arrêt)."""
+        if not self.running:
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            with self._counts_lock:
+                self.sampled_out += 1
+            return False
+        # deque.append est atomique : pas de verrou pour la file, même depuis le pool d'inférence
+        if len(self._pending) >= self.max_queue_size:
+            with self._counts_lock:
+                self.dropped += 1
+            return False
+        self._pending.append((input_data, result))
+        return True
+
+    # ------------------------------------------------------------------
+    # Mise à jour des esquisses (thread dédié)
+    # ------------------------------------------------------------------
+    def profile_rows(self, pairs: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]]
+                     ) -> List[Tuple[Dict[str, Any], str, Optional[float]]]:
+        """Lignes d'un profil : champs du donneur, issue, probabilité d'éligibilité si le modèle a répondu."""
+        lignes = []
+        for input_data, result in pairs:
+            issue = self.outcome(result)
+            lignes.append((input_data, issue, eligibility_score(result) if issue == MODEL_OUTCOME else None))
+        return lignes
+
+    def _update(self, pairs: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+        if self.window and time.monotonic() - self._window_start >= self.window:
+            self._previous, self._current = self._current, self.new_profile()
+            self._window_start = time.monotonic()
+        self._current.add(self.profile_rows(pairs))
+        self.recorded += len(pairs)
+        if self.baseline is None or time.monotonic() - self._psi_at < PSI_REFRESH_S:
+            return
+        # Même condition que `report` : pas de PSI exposé sur trop peu de lignes
+        live = self.live()
+        if live.rows >= self.min_rows and self.baseline.rows >= self.min_rows:
+            self._refresh_psi(compare(self.baseline, live, self.psi_threshold))
+
+    def _refresh_psi(self, comparison: Dict[str, Any]) -> None:
+        last_psi = {field: entry["psi"] for field, entry in comparison["features"].items()}
+        last_psi["rule_rejection"] = comparison["rule_rejection"]["psi"]
+        last_psi["confidence"] = comparison["confidence"]["psi"]
+        self.last_psi = last_psi
+        self._psi_at = time.monotonic()
+
+    def live(self) -> Profile:
+        """Profil des données récentes (fenêtre précédente et fenêtre en cours)."""
+        return self._previous.copy().merge(self._current)
+
+    def _take(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        lot = []
+        for _ in range(len(self._pending)):
+            lot.append(self._pending.popleft())
+        return lot
+
+    # ------------------------------------------------------------------
+    # Référence
+    # ------------------------------------------------------------------
+    def load_baseline(self) -> bool:
+        if not self.baseline_path or not os.path.exists(self.baseline_path):
+            return False
+        try:
+            with open(self.baseline_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("format") != BASELINE_FORMAT:
+                raise ValueError(f"format {state.get('format')} (attendu: {BASELINE_FORMAT})")
+            baseline = Profile.from_dict(state["profile"])
+            if not baseline.compatible(self.new_profile()):
+                raise ValueError("champs ou dimensions des esquisses différents de la configuration")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Référence de dérive ignorée ({self.baseline_path}): {e}")
+            return False
+        self.baseline = baseline
+        print(f"Référence de dérive chargée: {self.baseline_path} ({baseline.rows} lignes)")
+        return True
+
+    def save_baseline(self, profile: Profile, source: str) -> str:
+        """Enregistre `profile` comme référence (écriture atomique) et l'utilise désormais."""
+        if not self.baseline_path:
+            raise ValueError("Aucun fichier de référence configuré (DRIFT_BASELINE)")
+        dossier = os.path.dirname(os.path.abspath(self.baseline_path))
+        os.makedirs(dossier, exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(suffix=".json", dir=dossier)
+        try:
+            with os.fdopen(descripteur, "w", encoding="utf-8") as f:
+                json.dump({"format": BASELINE_FORMAT, "created": time.time(), "source": source,
+                           "profile": profile.to_dict()}, f, ensure_ascii=False)
+            os.replace(temporaire, self.baseline_path)
+        except BaseException:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            raise
+        self.baseline = profile
+        return self.baseline_path
+
+    def freeze_baseline(self) -> Dict[str, Any]:
+        """Fige les données récentes comme référence (à exécuter dans le thread du moniteur)."""
+        live = self.live()
+        if live.rows < self.min_rows:
+            raise ValueError(f"Pas assez de données récentes pour une référence "
+                             f"({live.rows} lignes, minimum {self.min_rows})")
+        self.save_baseline(live, "live")
+        return {"baseline": self.baseline_path, "rows": live.rows}
+
+    # ------------------------------------------------------------------
+    # Rapport
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "running": self.running, "sample_rate": self.sample_rate,
+                "window_s": self.window, "recorded": self.recorded, "dropped": self.dropped,
+                "sampled_out": self.sampled_out, "pending": self.queue_size}
+
+    def report(self) -> Dict[str, Any]:
+        """Données récentes comparées à la référence (à exécuter dans le thread du moniteur)."""
+        rapport: Dict[str, Any] = {"monitor": self.stats(), "psi_threshold": self.psi_threshold,
+                                   "baseline": self.baseline_path if self.baseline is not None else None}
+        if not self.enabled:
+            rapport["status"] = "disabled"
+            return rapport
+        live = self.live()
+        if self.baseline is None:
+            rapport.update(status="no_baseline", live=live.summary())
+        elif live.rows < self.min_rows or self.baseline.rows < self.min_rows:
+            rapport.update(status="insufficient_data", live_rows=live.rows, baseline_rows=self.baseline.rows,
+                           min_rows=self.min_rows)
+        else:
+            comparison = compare(self.baseline, live, self.psi_threshold)
+            self._refresh_psi(comparison)
+            rapport.update(status="ok", live_rows=live.rows, baseline_rows=self.baseline.rows, **comparison)
+        return rapport
+
+    async def call(self, function: Callable[[], Any]) -> Any:
+        """Exécute `function` dans le thread du moniteur, à la suite des mises à jour en cours."""
+        if self._executor is None:
+            return function()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function)
+
+    # ------------------------------------------------------------------
+    # Tâche de fond
+    # ------------------------------------------------------------------
+    async def start(self) -> None:
+        if not self.enabled or self.running:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drift")
+        await self.call(self.load_baseline)
+        self._stopping = False
+        self._task = asyncio.create_task(self._flush_loop())
+        print(f"Suivi de la dérive démarré ({self.sample_rate:.0%} des prédictions, fenêtres de {self.window:g} s, "
+              f"seuil PSI {self.psi_threshold:g})")
+
+    async def stop(self) -> None:
+        """Arrête la tâche de fond après avoir résumé les prédictions encore en file."""
+        if self._task is not None:
+            self._stopping = True
+            await self._task
+        self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._stopping:
+                await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                try:
+                    await loop.run_in_executor(self._executor, self._update, self._take())
+                except Exception as e:
+                    print(f"Mise à jour des esquisses de dérive en échec: {e}")
+            if self._stopping:
+                return
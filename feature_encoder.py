@@ -0,0 +1,294 @@
+# feature_encoder.py - Encodeur de caractéristiques précompilé (champs de l'API -> matrice du modèle)
+import math
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vocabulary import UNKNOWN, VocabularyIndex
+
+# Source d'une colonne du modèle : (champ de l'API, transformation optionnelle)
+Source = Tuple[str, Optional[Callable[[Any], Any]]]
+
+
+def _champs(donneur: Any) -> Mapping:
+    # Accepte un DonneurInput validé ou son dictionnaire
+    return donneur if isinstance(donneur, Mapping) else vars(donneur)
+
+
+def _manquant(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _json_scalar(value: Any) -> Any:
+    # Catégories et valeurs d'imputation NumPy -> types Python natifs
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class FeatureEncoder:
+    """Encode des donneurs directement dans la matrice attendue par le classifieur.
+
+    La disposition des colonnes, les vocabulaires du OneHotEncoder, les statistiques
+    d'imputation et de normalisation, ainsi que l'encodage des colonnes non alimentées
+    par l'API sont calculés une seule fois au chargement du modèle. Pour les valeurs
+    reconnues telles quelles, le résultat est identique à `preprocessor.transform` appliqué
+    au DataFrame construit à la main ; les autres passent par l'index de vocabulaire de la
+    colonne (variantes d'écriture, voir vocabulary.py) avant d'être déclarées inconnues.
+    """
+
+    def __init__(self, numeric: Sequence[tuple], categorical: Sequence[tuple], template: np.ndarray,
+                 columns: Sequence[str], sources: Dict[str, Source],
+                 spans: Optional[Sequence[Tuple[int, int]]] = None,
+                 vocabulary_options: Optional[Dict[str, Any]] = None):
+        # numeric : (colonne, position, médiane, moyenne, écart-type)
+        # categorical : (colonne, valeur d'imputation, catégories, position de la première catégorie
+        # [, codes des seules catégories dont l'indicatrice est gardée, dans l'ordre (voir `select`)])
+        # spans : positions [début, fin) de chaque colonne d'origine dans la matrice encodée
+        # vocabulary_options : options des index de vocabulaire (voir vocabulary.VocabularyIndex)
+        self._specs = {"numeric": [tuple(spec) for spec in numeric],
+                       "categorical": [tuple(spec) for spec in categorical]}
+        self.columns = list(columns)
+        self.spans = [tuple(span) for span in spans] if spans is not None else None
+        self.template = template
+        self.n_features = int(template.shape[0])
+        self._column_index: Optional[np.ndarray] = None
+        self.vocabulary_options = dict(vocabulary_options or {})
+
+        # Colonnes numériques alimentées : (champ, transformation, position, médiane, moyenne, écart-type)
+        self._numeric: List[tuple] = []
+        for column, position, median, mean, scale in self._specs["numeric"]:
+            field, transform = sources[column]
+            self._numeric.append((field, transform, int(position), float(median), float(mean), float(scale)))
+        # Colonnes catégorielles alimentées : (champ, transformation, index du vocabulaire,
+        # position de chaque catégorie ou None, valeur d'imputation)
+        self._categorical: List[tuple] = []
+        self.vocabularies: Dict[str, VocabularyIndex] = {}
+        for column, fill, categories, offset, *kept in self._specs["categorical"]:
+            field, transform = sources[column]
+            index = VocabularyIndex(categories, **self.vocabulary_options)
+            self.vocabularies[column] = index
+            positions: List[Optional[int]] = list(range(int(offset), int(offset) + len(categories)))
+            if kept:
+                positions = [None] * len(categories)
+                for rank, code in enumerate(kept[0]):
+                    positions[code] = int(offset) + rank
+            self._categorical.append((field, transform, index, positions, fill))
+
+        # Mémo des positions pour les colonnes transformées (domaines bornés : âge, oui/non)
+        self._memo: List[Dict[Any, Optional[int]]] = [{} for _ in self._categorical]
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor: Any, sources: Dict[str, Source],
+                          defaults: Optional[Dict[str, Any]] = None,
+                          model_info: Optional[Dict[str, Any]] = None,
+                          vocabulary_options: Optional[Dict[str, Any]] = None) -> "FeatureEncoder":
+        defaults = defaults or {}
+        numeric_columns: List[str] = []
+        categorical_columns: List[str] = []
+        numeric: List[tuple] = []
+        categorical: List[tuple] = []
+        # Encodage constant des colonnes sans source (valeurs par défaut)
+        template_positions: List[Tuple[int, float]] = []
+        spans: Dict[str, Tuple[int, int]] = {}
+
+        offset = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if name == "remainder" and transformer == "drop":
+                continue
+            steps = dict(transformer.steps) if hasattr(transformer, "steps") else {}
+            imputer = steps.get("imputer")
+            scaler = steps.get("scaler")
+            onehot = steps.get("onehot")
+
+            if onehot is not None:
+                if onehot.handle_unknown != "ignore" or onehot.drop is not None:
+                    raise ValueError("Configuration du OneHotEncoder non supportée")
+                for i, column in enumerate(columns):
+                    categorical_columns.append(column)
+                    fill = imputer.statistics_[i] if imputer is not None else None
+                    categories = onehot.categories_[i].tolist()
+                    if column in sources:
+                        categorical.append((column, fill, categories, offset))
+                    else:
+                        value = defaults.get(column)
+                        mapping = {category: offset + j for j, category in enumerate(categories)}
+                        position = mapping.get(fill if _manquant(value) else value)
+                        if position is not None:
+                            template_positions.append((position, 1.0))
+                    spans[column] = (offset, offset + len(categories))
+                    offset += len(categories)
+            elif scaler is not None or imputer is not None:
+                for i, column in enumerate(columns):
+                    numeric_columns.append(column)
+                    median = float(imputer.statistics_[i]) if imputer is not None else math.nan
+                    mean = float(scaler.mean_[i]) if scaler is not None and scaler.with_mean else 0.0
+                    scale = float(scaler.scale_[i]) if scaler is not None and scaler.with_std else 1.0
+                    if column in sources:
+                        numeric.append((column, offset, median, mean, scale))
+                    else:
+                        value = defaults.get(column, math.nan)
+                        value = median if _manquant(value) else float(value)
+                        template_positions.append((offset, (value - mean) / scale))
+                    spans[column] = (offset, offset + 1)
+                    offset += 1
+            else:
+                raise ValueError(f"Transformateur non supporté: {name}")
+
+        # La disposition doit correspondre à celle décrite par model_info
+        if model_info:
+            if (list(model_info.get("numeric_features", numeric_columns)) != numeric_columns or
+                    list(model_info.get("categorical_features", categorical_columns)) != categorical_columns):
+                raise ValueError("Les colonnes de model_info ne correspondent pas au prétraitement")
+
+        template = np.zeros(offset, dtype=np.float32)
+        for position, value in template_positions:
+            template[position] = value
+        columns = numeric_columns + categorical_columns
+        return cls(numeric, categorical, template, columns, sources, [spans[column] for column in columns],
+                   vocabulary_options)
+
+    @classmethod
+    def from_pipeline(cls, pipeline: Any, sources: Dict[str, Source],
+                      defaults: Optional[Dict[str, Any]] = None,
+                      model_info: Optional[Dict[str, Any]] = None,
+                      vocabulary_options: Optional[Dict[str, Any]] = None) -> "FeatureEncoder":
+        preprocessor = dict(pipeline.steps).get("preprocessor") if hasattr(pipeline, "steps") else None
+        if preprocessor is None:
+            raise ValueError("Le pipeline doit contenir une étape 'preprocessor'")
+        return cls.from_preprocessor(preprocessor, sources, defaults=defaults, model_info=model_info,
+                                     vocabulary_options=vocabulary_options)
+
+    # ------------------------------------------------------------------
+    # Export (voir model_export.py)
+    # ------------------------------------------------------------------
+    def get_state(self) -> Dict[str, Any]:
+        """État sérialisable en JSON (le gabarit est exporté à part, en tableau NumPy)."""
+        return {
+            "columns": self.columns,
+            "spans": [list(span) for span in self.spans] if self.spans is not None else None,
+            "numeric": [list(spec) for spec in self._specs["numeric"]],
+            "categorical": [[column, _json_scalar(fill), [_json_scalar(c) for c in categories], offset,
+                             *[[int(code) for code in kept] for kept in rest]]
+                            for column, fill, categories, offset, *rest in self._specs["categorical"]],
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], template: np.ndarray, sources: Dict[str, Source],
+                   vocabulary_options: Optional[Dict[str, Any]] = None) -> "FeatureEncoder":
+        """Reconstruit un encodeur exporté, en reliant ses colonnes aux champs de l'API."""
+        return cls(state["numeric"], state["categorical"], template, state["columns"], sources, state.get("spans"),
+                   vocabulary_options)
+
+    def column_index(self) -> np.ndarray:
+        """Indice de la colonne d'origine (dans `columns`) de chaque position encodée :
+        les indicatrices d'une colonne catégorielle partagent le même indice."""
+        if self.spans is None:
+            raise ValueError("Disposition des colonnes inconnue pour cet encodeur")
+        if self._column_index is None:
+            index = np.zeros(self.n_features, dtype=np.intp)
+            for k, (start, stop) in enumerate(self.spans):
+                index[start:stop] = k
+            self._column_index = index
+        return self._column_index
+
+    def fields(self) -> List[str]:
+        """Champs de l'API lus par l'encodeur (les autres n'influencent pas la prédiction)."""
+        champs = [spec[0] for spec in self._numeric] + [spec[0] for spec in self._categorical]
+        return list(dict.fromkeys(champs))
+
+    def vocabulary_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Valeurs hors vocabulaire exact par colonne catégorielle (normalisées, approchées, inconnues)."""
+        return {column: index.stats() for column, index in self.vocabularies.items()}
+
+    def select(self, keep: Sequence[int]) -> "FeatureEncoder":
+        """Encodeur réduit aux positions `keep` (croissantes) de la matrice encodée.
+
+        Les indicatrices retirées ne sont plus écrites ; leurs catégories restent dans le
+        vocabulaire, de sorte qu'une variante d'écriture se résout comme avant (vers une
+        catégorie sans colonne, et non vers sa voisine la plus proche qui en a une). Une
+        colonne dont aucune position n'est gardée n'est plus lue du tout. Les positions
+        gardées restent dans le même ordre : chaque colonne d'origine occupe toujours une
+        plage contiguë, les explications regroupent les contributions de la même façon.
+        """
+        keep = np.asarray(keep, dtype=np.intp)
+        new = np.full(self.n_features, -1, dtype=np.intp)
+        new[keep] = np.arange(len(keep))
+        numeric = [(column, int(new[position]), median, mean, scale)
+                   for column, position, median, mean, scale in self._specs["numeric"] if new[position] >= 0]
+        categorical = []
+        for (column, fill, categories, _, *_), (_, _, _, positions, _) in zip(self._specs["categorical"],
+                                                                             self._categorical):
+            kept = [(code, int(new[position])) for code, position in enumerate(positions)
+                    if position is not None and new[position] >= 0]
+            if kept:
+                categorical.append((column, fill, categories, kept[0][1], [code for code, _ in kept]))
+        spans = None
+        if self.spans is not None:
+            spans = [(int(np.searchsorted(keep, start)), int(np.searchsorted(keep, stop))) for start, stop in self.spans]
+        sources = {spec[0]: (field, transform)
+                   for spec, (field, transform, *_) in zip(self._specs["numeric"] + self._specs["categorical"],
+                                                           self._numeric + self._categorical)}
+        return FeatureEncoder(numeric, categorical, np.ascontiguousarray(self.template[keep]), self.columns,
+                              sources, spans, self.vocabulary_options)
+
+    def _position(self, k: int, value: Any) -> Optional[int]:
+        field, transform, index, positions, fill = self._categorical[k]
+        if transform is not None:
+            memo = self._memo[k]
+            try:
+                return memo[value]
+            except KeyError:
+                result = transform(value)
+                code = index.lookup(fill if _manquant(result) else result)
+                position = None if code == UNKNOWN else positions[code]
+                memo[value] = position
+                return position
+        if value is None:
+            value = fill
+        # Chemin rapide : catégorie exacte, sans appel de méthode
+        code = index.codes.get(value)
+        if code is None:
+            code = index.lookup(fill if _manquant(value) else value)
+        return None if code == UNKNOWN else positions[code]
+
+    def encode_into(self, donneur: Any, out: np.ndarray) -> np.ndarray:
+        """Encode un donneur dans une ligne préallouée de taille n_features."""
+        champs = _champs(donneur)
+        out[:] = self.template
+        for field, transform, position, median, mean, scale in self._numeric:
+            value = champs.get(field)
+            if transform is not None:
+                value = transform(value)
+            out[position] = ((median if _manquant(value) else float(value)) - mean) / scale
+        for k, (field, _, _, _, _) in enumerate(self._categorical):
+            position = self._position(k, champs.get(field))
+            if position is not None:
+                out[position] = 1.0
+        return out
+
+    def encode(self, donneur: Any) -> np.ndarray:
+        """Encode un donneur en une nouvelle ligne float32."""
+        return self.encode_into(donneur, np.empty(self.n_features, dtype=np.float32))
+
+    def encode_batch(self, donneurs: Sequence[Any]) -> np.ndarray:
+        """Encode une liste de donneurs en une matrice (une ligne par donneur)."""
+        n = len(donneurs)
+        X = np.tile(self.template, (n, 1))
+        if n == 0:
+            return X
+        champs = [_champs(donneur) for donneur in donneurs]
+        rows = np.arange(n)
+
+        for field, transform, position, median, mean, scale in self._numeric:
+            values = [c.get(field) for c in champs]
+            if transform is not None:
+                values = [transform(v) for v in values]
+            column = np.array([median if _manquant(v) else float(v) for v in values], dtype=np.float64)
+            X[:, position] = (column - mean) / scale
+
+        for k, (field, _, _, _, _) in enumerate(self._categorical):
+            positions = np.fromiter((-1 if (p := self._position(k, c.get(field))) is None else p
+                                     for c in champs), dtype=np.intp, count=n)
+            known = positions >= 0
+            X[rows[known], positions[known]] = 1.0
+        return X
@@ -0,0 +1,243 @@
+# inference_scheduler.py - Planificateur d'inférence avec micro-batching
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class FileAttentePleine(Exception):
+    """Levée lorsque la file d'attente d'inférence a atteint sa capacité maximale."""
+
+
+class InferenceScheduler:
+    """Regroupe les requêtes arrivant dans une courte fenêtre en un seul appel au modèle.
+
+    `predict_fn` reçoit une liste de lignes et doit renvoyer une séquence de résultats
+    de même longueur (une ligne de probabilités par entrée). Les appels sont exécutés
+    dans un pool de threads ou de processus de taille bornée, hors de la boucle d'événements.
+
+    Les appels directs (`run`, ex. un lot complet) ont leur propre admission : au plus
+    `max_workers - 1` s'exécutent à la fois, pour qu'un worker reste toujours disponible
+    pour les lots du micro-batching, et au plus `max_run_queue` attendent leur tour.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[List[Any]], Any],
+        max_workers: int = 4,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_queue_size: int = 1024,
+        max_run_queue: int = 16,
+        executor_type: str = "thread",
+        initializer: Optional[Callable[[], Any]] = None,
+        on_batch: Optional[Callable[[int, List[float], float], None]] = None,
+    ):
+        self.predict_fn = predict_fn
+        self.max_workers = max(1, max_workers)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.max_run_queue = max(0, max_run_queue)
+        self.executor_type = executor_type
+        self.initializer = initializer
+        # Appelé après chaque lot : (taille, attente de chaque ligne dans la file, durée de l'appel)
+        self.on_batch = on_batch
+
+        self._executor: Optional[Executor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._run_slots: Optional[asyncio.Semaphore] = None
+        self._runs_waiting = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: set = set()
+
+        # Statistiques simples
+        self.batches_executed = 0
+        self.rows_executed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, predict_fn: Callable[[List[Any]], Any], **kwargs) -> "InferenceScheduler":
+        """Construit un planificateur à partir des variables d'environnement INFERENCE_*."""
+        return cls(
+            predict_fn,
+            max_workers=int(os.environ.get("INFERENCE_WORKERS", os.cpu_count() or 1)),
+            max_batch_size=int(os.environ.get("INFERENCE_MAX_BATCH", 64)),
+            max_wait_ms=float(os.environ.get("INFERENCE_MAX_WAIT_MS", 2.0)),
+            max_queue_size=int(os.environ.get("INFERENCE_QUEUE_SIZE", 1024)),
+            max_run_queue=int(os.environ.get("INFERENCE_RUN_QUEUE_SIZE", 16)),
+            executor_type=os.environ.get("INFERENCE_EXECUTOR", "thread"),
+            **kwargs,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._collector is not None and not self._collector.done()
+
+    def _bound_to_current_loop(self) -> bool:
+        # La file et la tâche de collecte appartiennent à la boucle qui les a créées
+        try:
+            return self.running and self._loop is asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+    @property
+    def queue_size(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def run_queue_full(self) -> bool:
+        """Vrai si un nouvel appel direct serait refusé (tous les créneaux pris, file d'attente pleine)."""
+        return (self._run_slots is not None and self._run_slots.locked()
+                and self._runs_waiting >= self.max_run_queue)
+
+    def admit(self) -> None:
+        """Vérifie qu'un appel direct serait admis ; sinon le compte dans `rejected` et lève FileAttentePleine."""
+        if self.run_queue_full:
+            self.rejected += 1
+            raise FileAttentePleine("File d'attente d'inférence pleine")
+
+    def _create_executor(self) -> Executor:
+        if self.executor_type == "process":
+            return ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer)
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference",
+                                  initializer=self.initializer)
+
+    async def start(self) -> None:
+        if self._bound_to_current_loop():
+            return
+        if self._executor is None:
+            self._executor = self._create_executor()
+        self._loop = asyncio.get_running_loop()
+        self._pending = set()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slots = asyncio.Semaphore(self.max_workers)
+        # Avec un seul worker, rien ne peut être réservé : appels directs et lots se partagent le worker
+        self._run_slots = asyncio.Semaphore(max(1, self.max_workers - 1))
+        self._runs_waiting = 0
+        self._collector = asyncio.create_task(self._collect())
+        print(f"Planificateur d'inférence démarré ({self.executor_type}, {self.max_workers} workers, "
+              f"lot max {self.max_batch_size}, fenêtre {self.max_wait * 1000:.1f} ms)")
+
+    async def stop(self) -> None:
+        if self._collector is not None and self._loop is asyncio.get_running_loop():
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            if self._pending:
+                await asyncio.gather(*self._pending, return_exceptions=True)
+            # Ne laisser aucun appelant en attente indéfinie
+            while not self._queue.empty():
+                _, future, _ = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(FileAttentePleine("Planificateur arrêté"))
+        self._collector = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def submit(self, row: Any) -> Any:
+        """Soumet une ligne et attend son résultat. Lève FileAttentePleine si la file est pleine."""
+        if not self._bound_to_current_loop():
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((row, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise FileAttentePleine("File d'attente d'inférence pleine")
+        return await future
+
+    async def run(self, fn: Callable[..., Any], *args: Any, block: bool = False) -> Any:
+        """Exécute un appel quelconque (ex. un lot complet) dans le pool d'inférence.
+
+        Lève FileAttentePleine si `max_run_queue` appels attendent déjà leur tour, sauf avec
+        `block` (suite d'un flux déjà admis : il attend sa place, ce qui ralentit sa lecture).
+        """
+        if not self._bound_to_current_loop():
+            await self.start()
+        if not block:
+            self.admit()
+        self._runs_waiting += 1
+        try:
+            await self._run_slots.acquire()
+        finally:
+            self._runs_waiting -= 1
+        try:
+            async with self._slots:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._run_slots.release()
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[Any, asyncio.Future, float]] = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_wait
+
+                # Coalescer les requêtes arrivées pendant la fenêtre
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Borner le nombre de lots en cours d'exécution au nombre de workers
+                await self._slots.acquire()
+            except asyncio.CancelledError:
+                # Lot déjà retiré de la file : `stop` ne le verra pas, ses appelants sont prévenus ici
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(FileAttentePleine("Planificateur arrêté"))
+                raise
+            task = asyncio.create_task(self._execute(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _execute(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        rows = [row for row, _, _ in batch]
+        start = time.perf_counter()
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, self.predict_fn, rows)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            self.batches_executed += 1
+            self.rows_executed += len(rows)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            if self.on_batch is not None:
+                self.on_batch(len(rows), [start - queued_at for _, _, queued_at in batch],
+                              time.perf_counter() - start)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "executor": self.executor_type,
+            "workers": self.max_workers,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_size": self.queue_size,
+            "max_queue_size": self.max_queue_size,
+            "runs_waiting": self._runs_waiting,
+            "max_run_queue": self.max_run_queue,
+            "batches_executed": self.batches_executed,
+            "rows_executed": self.rows_executed,
+            "average_batch_size": self.rows_executed / self.batches_executed if self.batches_executed else 0.0,
+            "rejected": self.rejected,
+        }
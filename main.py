@@ -1,18 +1,49 @@
 # main.py - Fichier principal de l'API
-from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
-from fastapi.staticfiles import StaticFiles
-from fastapi.openapi.utils import get_openapi
-from fastapi import FastAPI, HTTPException
+import time
+_DEBUT_IMPORT = time.perf_counter()
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, List, Any, Union
-import joblib
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from starlette.requests import ClientDisconnect
+from typing import TYPE_CHECKING, Optional, Dict, List, Any, Union
+import json
 import os
-import pandas as pd
+import random
+import secrets
+import threading
+import uuid
 import numpy as np
 from enum import Enum
+from inference_scheduler import InferenceScheduler, FileAttentePleine
+from tree_engine import CompiledModel, compile_pipeline
+from feature_encoder import FeatureEncoder
+from prediction_cache import PredictionCache
+from model_registry import ModelArtifact, ModelRegistry, ModeleIndisponible, ModeleInconnu
+from model_export import export_model, load_export
+from metrics import MetricsMiddleware, MetricsRegistry, SIZE_BUCKETS, elapsed_since
+from rule_engine import RuleEngine
+from vocabulary import VocabularyIndex, options_from_env as vocabulary_options_from_env
+from stream_scoring import Record, RecordParser, detect_format, encode_line
+from audit_log import AuditLog
+from shadow import ShadowScorer
+from decision_table import DecisionTable
+from rate_limit import RateLimiter, RateLimitMiddleware
+from static_responses import StaticResponse
+from drift import DriftMonitor, MODEL_OUTCOME
 from pydantic import BaseModel
 
+# orjson (optionnel) sérialise les réponses de prédiction ; à défaut, le module json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pandas, joblib et scikit-learn ne sont importés que pour charger un pickle (voir MODEL_FORMAT)
+if TYPE_CHECKING:
+    import pandas as pd
+
 # Initialisation de l'API
 app = FastAPI(
     title="API de prédiction d'éligibilité au don de sang",
@@ -24,6 +55,9 @@ app = FastAPI(
     * **Prédiction d'éligibilité** - Évalue si un donneur est éligible au don de sang
     * **Détection des facteurs d'exclusion** - Identifie les raisons d'inéligibilité
     * **Niveau de confiance** - Fournit un pourcentage de confiance pour chaque prédiction
+    * **Prédiction par lot** - Évalue une liste de donneurs en un seul appel (`/predict/batch`)
+    * **Notation en flux** - Note un registre NDJSON ou CSV ligne à ligne, erreurs par ligne (`/predict/stream`)
+    * **Suivi de la dérive** - Compare les donneurs récents à une distribution de référence (`/monitoring/drift`)
     
     ## Comment utiliser l'API
     
@@ -51,11 +85,29 @@ app = FastAPI(
             "description": "Informations sur le modèle et ses caractéristiques",
         },
     ],
-    docs_url=None,  # On désactive les routes par défaut
+    # On désactive les routes par défaut : schéma et pages pré-encodés (voir preparer_documentation)
+    openapi_url=None,
+    docs_url=None,
     redoc_url=None,
     version="1.0.0",
 )
 
+# Limitation de débit par client (clé d'API ou IP, RATE_LIMIT=1) et plafond de requêtes d'inférence
+# simultanées (MAX_IN_FLIGHT). Ajoutée avant CORS : les réponses 429 portent aussi les en-têtes CORS.
+limiteur = RateLimiter.from_env()
+app.add_middleware(RateLimitMiddleware, limiter=limiteur)
+
+# Jeton des routes d'administration (bascule et rechargement des modèles, notation en ombre, référence
+# de dérive), à envoyer dans l'en-tête X-Admin-Token. Sans ADMIN_TOKEN, ces routes sont désactivées.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# Vérifier le jeton d'administration (dépendance des routes qui modifient le service)
+async def verifier_admin(x_admin_token: Optional[str] = Header(None, description="Jeton d'administration")):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Routes d'administration désactivées (ADMIN_TOKEN)")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Jeton d'administration invalide")
+
 # Configuration CORS pour permettre les requêtes depuis d'autres domaines
 app.add_middleware(
     CORSMiddleware,
@@ -65,9 +117,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Chemins vers les fichiers de modèle et statistiques
-MODEL_PATH = "./model/eligibility_model_gradient_boosting_20250323_104955.pkl"
-MODEL_INFO_PATH = "./model/model_info_20250323_104955.json"
+# Dossier des artefacts (eligibility_model_*.pkl, model_info_*.json, model_comparison_*.csv)
+MODEL_DIR = os.environ.get("MODEL_DIR", "./model")
+
+# Version servie par défaut : nom exact, préfixe ou nom de modèle (la plus récente l'emporte)
+DEFAULT_MODEL = os.environ.get("DEFAULT_MODEL", "gradient_boosting")
+
+# Moteur d'inférence : "compiled" (arbres NumPy, sans DataFrame) ou "sklearn" (pipeline d'origine)
+MODEL_ENGINE = os.environ.get("MODEL_ENGINE", "compiled")
+
+# Format de chargement : "auto" (export compact s'il est à jour, sinon pickle puis export),
+# "compact" (export obligatoire, démarrage sans pandas ni scikit-learn) ou "pickle"
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "auto")
+
+# Dossier des exports compacts (un sous-dossier de tableaux .npy par version)
+MODEL_EXPORT_DIR = os.environ.get("MODEL_EXPORT_DIR", os.path.join(MODEL_DIR, "compiled"))
+
+# Charger les pickles avec joblib.load(mmap_mode='r') (tableaux NumPy projetés en mémoire)
+MODEL_MMAP = os.environ.get("MODEL_MMAP", "0").lower() in ("1", "true", "oui", "yes")
+
+# Index des vocabulaires catégoriels : correspondances au-delà de l'égalité exacte (VOCABULARY_MATCH :
+# exact par défaut, comme le pipeline et MODEL_ENGINE=sklearn ; normalized ; fuzzy avec le seuil
+# VOCABULARY_FUZZY_CUTOFF) et nombre de valeurs non exactes mémorisées par colonne (VOCABULARY_CACHE_SIZE)
+OPTIONS_VOCABULAIRE = vocabulary_options_from_env()
+
+# Table de décision précalculée (DECISION_TABLE=1) : probabilités de tous les profils de DIMENSIONS_TABLE,
+# conservées dans DECISION_TABLE_DIR (un fichier par version et par espace énuméré)
+DECISION_TABLE = os.environ.get("DECISION_TABLE", "0").lower() in ("1", "true", "oui", "yes")
+DECISION_TABLE_DIR = os.environ.get("DECISION_TABLE_DIR", os.path.join(MODEL_EXPORT_DIR, "tables"))
+
+# En-têtes Cache-Control des réponses statiques pré-encodées : informations du modèle (revalidées à
+# chaque appel, elles changent avec la version active) et documentation (schéma OpenAPI, Swagger, ReDoc)
+STATIC_CACHE_CONTROL = os.environ.get("STATIC_CACHE_CONTROL", "no-cache")
+DOCS_CACHE_CONTROL = os.environ.get("DOCS_CACHE_CONTROL", "public, max-age=300")
 
 # Classes pour les entrées et sorties
 class Genre(str, Enum):
@@ -213,333 +295,1474 @@ class DonneurInput(BaseModel):
         }
         
 
+class Explication(BaseModel):
+    valeur_de_base: float = Field(..., description="Score brut du modèle (log-odds de « Éligible ») sans aucune information du donneur, y compris la part des colonnes du modèle qui ne dépendent d'aucun champ de l'API")
+    contributions: Dict[str, float] = Field(..., description="Contribution de chaque caractéristique du modèle au score "
+                                                             "brut (positive : vers « Éligible »), par importance décroissante")
+
 class PredictionOutput(BaseModel):
     prediction: str = Field(..., description="Prédiction d'éligibilité (Éligible ou Non éligible)")
     confidence: float = Field(..., ge=0.0, le=100.0, description="Niveau de confiance en pourcentage")
     facteurs_importants: List[str] = Field([], description="Facteurs importants qui ont influencé la prédiction")
     raison_ineligibilite: Optional[str] = Field(None, description="Raison principale d'inéligibilité si applicable")
+    explication: Optional[Explication] = Field(None, description="Contributions des caractéristiques à la décision du "
+                                                                 "modèle (avec ?explain=true, hors règles d'exclusion)")
+
+# Réponse JSON des routes de prédiction, construite directement à partir des dictionnaires de résultats.
+# Une route qui renvoie une Response n'est pas revalidée par FastAPI : `response_model` ne sert plus
+# qu'au schéma OpenAPI, les résultats ayant déjà la forme de PredictionOutput (mêmes clés, `explication`
+# seulement si elle a été demandée).
+class ReponseJSON(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
 
-# Variables globales pour stocker le modèle et les caractéristiques attendues
-model = None
-required_columns = None
-feature_stats = {}
+# Valeurs par défaut des champs facultatifs (les champs obligatoires n'y figurent pas)
+DEFAUTS_DONNEUR = vars((getattr(DonneurInput, "model_construct", None) or DonneurInput.construct)())
 
-# Fonction pour charger le modèle au démarrage
-def load_model():
-    global model, required_columns, feature_stats
+# Espace énuméré par la table de décision : âge x genre x niveau d'études x situation matrimoniale
+# x religion x don antérieur (16 960 profils). Les autres champs lus par le modèle doivent avoir
+# leur valeur par défaut ; un donneur hors de cet espace passe par le modèle.
+DIMENSIONS_TABLE = [
+    ("age", range(18, 71)),
+    ("genre", list(Genre)),
+    ("niveau_etude", list(NiveauEtude)),
+    ("situation_matrimoniale", list(SituationMatrimoniale)),
+    ("religion", list(Religion)),
+    ("deja_donne", list(DejaFaitDon)),
+]
+
+# Caractéristiques attendues lorsque le fichier d'info du modèle n'existe pas
+COLONNES_PAR_DEFAUT = [
+    "age",
+    "experience_don",
+    "Niveau d'etude",
+    "Genre",
+    "Situation Matrimoniale (SM)",
+    "Profession",
+    "Arrondissement de résidence",
+    "Quartier de Résidence",
+    "Nationalité",
+    "Religion",
+    "A-t-il (elle) déjà donné le sang",
+    "Taux d'hémoglobine",
+    "groupe_age",
+    "arrondissement_clean",
+    "quartier_clean"
+]
+
+class ModeleCharge:
+    """Version de modèle prête à servir : pipeline, caractéristiques, encodeur et moteur compilé.
+
+    Sans pipeline (export compact), l'encodeur et le moteur compilé sont fournis tels quels.
+    """
     
+    def __init__(self, artifact: ModelArtifact, pipeline: Any, model_info: Optional[Dict[str, Any]],
+                 required_columns: List[str], engine: str,
+                 feature_encoder: Optional[FeatureEncoder] = None,
+                 compiled_model: Optional[CompiledModel] = None,
+                 verification: Optional[Dict[str, Any]] = None):
+        self.artifact = artifact
+        self.version = artifact.version
+        self.signature = artifact.signature()
+        self.pipeline = pipeline
+        self.model_info = model_info
+        self.required_columns = required_columns
+        self.format = "pickle" if pipeline is not None else "compact"
+        
+        # Précompiler l'encodeur de caractéristiques et, si demandé, le moteur NumPy
+        if pipeline is not None:
+            self.classes_ = pipeline.classes_
+            feature_encoder = construire_encodeur(pipeline, model_info, required_columns)
+            if engine == "compiled" and feature_encoder is not None:
+                compiled_model = compiler_modele(pipeline, required_columns)
+            if compiled_model is not None:
+                feature_encoder, compiled_model, verification = compacter_modele(
+                    pipeline, feature_encoder, compiled_model, model_info, required_columns)
+        else:
+            self.classes_ = compiled_model.classes_
+        self.feature_encoder = feature_encoder
+        self.compiled_model = compiled_model
+        self.engine = "compiled" if self.compiled_model is not None else "sklearn"
+        # Vérification du moteur compacté contre le pipeline (écrite dans l'export compact)
+        self.verification = verification
+        
+        # Table de décision (DECISION_TABLE=1), éventuellement calculée en arrière-plan
+        self.decision_table: Optional[DecisionTable] = None
+        self.decision_table_thread: Optional[threading.Thread] = None
+        
+        # Durées de chargement et de préchauffage (secondes)
+        self.timings: Dict[str, float] = {}
+        
+        # /features et /model-info sérialisés une fois : un rechargement crée un nouveau ModeleCharge
+        self.static_responses = reponses_statiques_modele(self)
+
+# Corps pré-encodés des routes d'information d'une version (ETag propre à son contenu)
+def reponses_statiques_modele(modele: ModeleCharge) -> Dict[str, StaticResponse]:
+    model_info = modele.model_info
+    if model_info is None:
+        model_info = {
+            "model_name": modele.artifact.name,
+            "version": modele.version,
+            "features": modele.required_columns
+        }
+    return {
+        "features": StaticResponse.json({"features": modele.required_columns}, STATIC_CACHE_CONTROL),
+        "model-info": StaticResponse.json(model_info, STATIC_CACHE_CONTROL),
+    }
+
+# Charger une version depuis son export compact (None si l'export est absent ou périmé)
+def charger_export(artifact: ModelArtifact) -> Optional[ModeleCharge]:
+    export = load_export(MODEL_EXPORT_DIR, artifact.version, SOURCES_ENCODEUR,
+                         source_hash=artifact.content_hash(), vocabulary_options=OPTIONS_VOCABULAIRE)
+    if export is None:
+        return None
+    print(f"Modèle chargé depuis l'export compact: {MODEL_EXPORT_DIR}/{artifact.version}")
+    return ModeleCharge(artifact, None, export["model_info"], export["required_columns"], "compiled",
+                        feature_encoder=export["encoder"], compiled_model=export["compiled"],
+                        verification=export["verification"])
+
+# Écrire l'export compact d'une version compilée (démarrages suivants sans unpickling)
+def exporter_version(modele: ModeleCharge) -> Optional[str]:
+    if modele.compiled_model is None or modele.feature_encoder is None:
+        print(f"Export compact impossible pour {modele.version} (moteur compilé indisponible)")
+        return None
     try:
-        # Charger le modèle
-        if os.path.exists(MODEL_PATH):
-            model = joblib.load(MODEL_PATH)
-            print(f"Modèle chargé depuis: {MODEL_PATH}")
-            
-            # Charger les informations du modèle si disponibles
-            if os.path.exists(MODEL_INFO_PATH):
-                import json
-                with open(MODEL_INFO_PATH, 'r') as f:
-                    model_info = json.load(f)
-                
-                # Extraire les caractéristiques attendues
-                if 'features' in model_info:
-                    required_columns = model_info['features']
-                    print(f"Caractéristiques requises: {required_columns}")
-            else:
-                # Définir manuellement les caractéristiques si le fichier d'info n'existe pas
-                required_columns = [
-                    "age",
-                    "experience_don",
-                    "Niveau d'etude",
-                    "Genre",
-                    "Situation Matrimoniale (SM)",
-                    "Profession",
-                    "Arrondissement de résidence",
-                    "Quartier de Résidence",
-                    "Nationalité",
-                    "Religion",
-                    "A-t-il (elle) déjà donné le sang",
-                    "Taux d'hémoglobine",
-                    "groupe_age",
-                    "arrondissement_clean",
-                    "quartier_clean"
-                ]
-            
-            # Initialiser les statistiques vides pour l'instant
-            # Dans une version plus complète, on pourrait charger des statistiques précalculées
+        chemin = export_model(MODEL_EXPORT_DIR, modele.version, modele.artifact.content_hash(),
+                              modele.feature_encoder, modele.compiled_model,
+                              modele.model_info, modele.required_columns, modele.verification)
+    except OSError as e:
+        print(f"Export compact impossible pour {modele.version}: {e}")
+        return None
+    print(f"Export compact écrit: {chemin}")
+    return chemin
+
+# Charger une version de modèle (appelé par le registre, éventuellement en arrière-plan)
+def charger_version(artifact: ModelArtifact, engine: Optional[str] = None,
+                    model_format: Optional[str] = None) -> ModeleCharge:
+    engine = engine or MODEL_ENGINE
+    model_format = model_format or MODEL_FORMAT
+    debut = time.perf_counter()
+    
+    # L'export compact ne contient que le moteur compilé
+    modele = None
+    if engine == "compiled" and model_format != "pickle":
+        modele = charger_export(artifact)
+        if modele is None and model_format == "compact":
+            raise ValueError(f"Export compact absent ou périmé pour {artifact.version} "
+                             f"(le créer avec: python main.py export)")
+    
+    if modele is None:
+        import joblib
+        pipeline = joblib.load(artifact.model_path, mmap_mode="r" if MODEL_MMAP else None)
+        print(f"Modèle chargé depuis: {artifact.model_path}")
+        
+        # Charger les informations du modèle si disponibles
+        model_info = None
+        required_columns = COLONNES_PAR_DEFAUT
+        if artifact.info_path:
+            with open(artifact.info_path, 'r') as f:
+                model_info = json.load(f)
             
-            return True
-        else:
-            print(f"Modèle non trouvé à: {MODEL_PATH}")
+            # Extraire les caractéristiques attendues
+            if 'features' in model_info:
+                required_columns = model_info['features']
+                print(f"Caractéristiques requises: {required_columns}")
+        
+        modele = ModeleCharge(artifact, pipeline, model_info, required_columns, engine)
+        if model_format == "auto" and modele.compiled_model is not None:
+            exporter_version(modele)
+    modele.timings["load_s"] = time.perf_counter() - debut
+    if modele.feature_encoder is not None:
+        sans_source = [colonne for colonne in modele.feature_encoder.columns if colonne not in SOURCES_ENCODEUR]
+        if sans_source:
+            # Ex. « Taux d’hémoglobine » (apostrophe typographique) : le champ taux_hemoglobine de
+            # l'API ne sert qu'aux règles d'exclusion, le modèle voit toujours la valeur par défaut
+            print(f"Colonnes du modèle sans champ de l'API (valeur par défaut): {', '.join(sans_source)}")
+    
+    # Préchauffer avant de pouvoir être activée : la première requête ne paie pas les défauts de page
+    modele.timings["warmup_s"] = rechauffer_modele(modele)
+    if DECISION_TABLE:
+        preparer_table_decision(modele)
+    return modele
+
+# Registre des versions de modèle et cache des probabilités (taille et durée de vie configurables).
+# Le cache est vidé à chaque bascule ou rechargement : les lignes de l'ancien artefact ne restent
+# pas dans la LRU jusqu'à expiration.
+prediction_cache = PredictionCache.from_env()
+registry = ModelRegistry(MODEL_DIR, charger_version, default=DEFAULT_MODEL,
+                         on_change=lambda version: prediction_cache.invalidate())
+
+# Journal d'audit des prédictions (AUDIT_LOG=jsonl, sqlite ou off ; écritures groupées en arrière-plan)
+journal_audit = AuditLog.from_env()
+
+# Métriques exposées sur /metrics (format texte Prometheus)
+metriques = MetricsRegistry()
+DUREE_REQUETES = metriques.histogram("http_request_duration_seconds", "Durée des requêtes HTTP",
+                                     ["method", "route"])
+REQUETES = metriques.counter("http_requests_total", "Requêtes HTTP traitées", ["method", "route", "status"])
+DUREE_ETAPES = metriques.histogram(
+    "prediction_stage_duration_seconds",
+    "Durée de chaque étape de prédiction (validation, rules, table, cache, encoding, inference, explanation)",
+    ["endpoint", "stage"])
+PREDICTIONS = metriques.counter("predictions_total",
+                                "Donneurs évalués, par chemin de décision (rule, table, cache, model)",
+                                ["endpoint", "path"])
+REGLES_DECLENCHEES = metriques.counter("exclusion_rule_fired_total",
+                                       "Donneurs écartés par une règle d'exclusion avant le modèle", ["rule"])
+REGLES_CONCERNEES = metriques.counter("exclusion_rule_matched_total",
+                                      "Donneurs vérifiant une règle d'exclusion (retenue ou non)", ["rule"])
+COMPARAISONS_OMBRE = metriques.counter("shadow_predictions_total",
+                                      "Requêtes notées en ombre, par accord avec le modèle servi (agree, disagree)",
+                                      ["version", "outcome"])
+DUREE_OMBRE = metriques.histogram("shadow_duration_seconds", "Durée de la notation en ombre (attente comprise)",
+                                  ["version"])
+TAILLE_LOTS_REQUETE = metriques.histogram("predict_batch_request_size", "Nombre de donneurs par appel à /predict/batch",
+                                          buckets=SIZE_BUCKETS)
+TAILLE_LOTS_INFERENCE = metriques.histogram("inference_batch_size", "Lignes par lot du planificateur d'inférence",
+                                            buckets=SIZE_BUCKETS)
+ATTENTE_FILE = metriques.histogram("inference_queue_wait_seconds", "Attente d'une ligne dans la file d'inférence")
+DUREE_LOTS_INFERENCE = metriques.histogram("inference_batch_duration_seconds",
+                                           "Durée d'un appel au modèle par le planificateur")
+
+# Durée et nombre des requêtes HTTP (middleware le plus externe)
+app.add_middleware(MetricsMiddleware, duration=DUREE_REQUETES, requests=REQUETES)
+
+# Étapes pré-résolues (évite la recherche des étiquettes sur le chemin des requêtes)
+ETAPES = {(endpoint, etape): DUREE_ETAPES.labels(endpoint, etape)
+          for endpoint in ("predict", "batch")
+          for etape in ("validation", "rules", "table", "cache", "encoding", "inference", "explanation")}
+
+# Suivi des lots exécutés par le planificateur d'inférence
+def observer_lot_inference(taille: int, attentes: List[float], duree: float) -> None:
+    TAILLE_LOTS_INFERENCE.labels().observe(taille)
+    DUREE_LOTS_INFERENCE.labels().observe(duree)
+    attente = ATTENTE_FILE.labels()
+    for valeur in attentes:
+        attente.observe(valeur)
+
+# Fonction pour charger le modèle par défaut (synchrone) et l'activer
+def load_model(engine: Optional[str] = None):
+    try:
+        registry.scan()
+        version = registry.default_version()
+        if version is None:
+            print(f"Modèle non trouvé dans: {MODEL_DIR}")
             return False
+        
+        if engine:
+            registry.load(version, engine=engine)
+        else:
+            registry.load(version)
+        registry.activate(version)
+        return True
     except Exception as e:
         print(f"Erreur lors du chargement du modèle: {e}")
         return False
 
-# Fonction de prédiction avec règles de sécurité strictes
-def predict_eligibility(input_data: Dict[str, Any]) -> Dict[str, Any]:
-    global model, required_columns
+# Obtenir la version de modèle demandée (la version active par défaut)
+# Aucun chargement sur le chemin des requêtes : tant que rien n'est actif, le service répond 503
+def obtenir_modele(nom: Optional[str] = None) -> ModeleCharge:
+    try:
+        return registry.get(nom)
+    except ModeleInconnu:
+        raise HTTPException(status_code=404, detail=f"Modèle inconnu: {nom}")
+    except ModeleIndisponible:
+        raise HTTPException(status_code=503, detail="Modèle non disponible", headers={"Retry-After": "5"})
+
+# Mapping entre les champs de l'API et les colonnes attendues par le modèle
+FEATURE_MAPPING = {
+    "age": "age",
+    "genre": "Genre",
+    "niveau_etude": "Niveau d'etude",
+    "situation_matrimoniale": "Situation Matrimoniale (SM)",
+    "profession": "Profession",
+    "nationalite": "Nationalité",
+    "religion": "Religion",
+    "deja_donne": "A-t-il (elle) déjà donné le sang",
+    "arrondissement": "Arrondissement de résidence",
+    "quartier": "Quartier de Résidence",
+    "taux_hemoglobine": "Taux d'hémoglobine"
+}
+
+# Colonnes catégorielles complétées par une chaîne vide lorsqu'elles manquent
+COLONNES_CATEGORIELLES = ["Niveau d'etude", "Genre", "Situation Matrimoniale (SM)",
+                          "Profession", "Arrondissement de résidence", "Quartier de Résidence",
+                          "Nationalité", "Religion", "A-t-il (elle) déjà donné le sang",
+                          "groupe_age", "arrondissement_clean", "quartier_clean"]
+
+CONDITIONS_MEDICALES = ['porteur_vih_hbs_hcv', 'diabetique', 'hypertendu', 'asthmatique',
+                        'drepanocytaire', 'cardiaque', 'transfusion', 'tatoue', 'scarifie']
+
+# Calculer le groupe d'âge
+def calculer_groupe_age(age: int) -> str:
+    if age < 18:
+        return "<18"
+    elif age <= 25:
+        return "18-25"
+    elif age <= 35:
+        return "26-35"
+    elif age <= 45:
+        return "36-45"
+    elif age <= 55:
+        return "46-55"
+    elif age <= 65:
+        return "56-65"
+    else:
+        return ">65"
+
+# Colonnes du modèle calculées à partir d'un champ de l'API : colonne -> (champ, transformation)
+COLONNES_DERIVEES = {
+    "experience_don": ("deja_donne", lambda valeur: 1 if valeur == "Oui" else 0),
+    "arrondissement_clean": ("arrondissement", None),
+    "quartier_clean": ("quartier", None),
+    "groupe_age": ("age", calculer_groupe_age),
+}
+
+# Sources de toutes les colonnes alimentées par l'API (encodeur précompilé)
+SOURCES_ENCODEUR = {colonne: (champ, None) for champ, colonne in FEATURE_MAPPING.items()}
+SOURCES_ENCODEUR.update(COLONNES_DERIVEES)
+
+# Préparer une ligne de données pour le modèle à partir des champs de l'API
+def preparer_donnees_modele(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    # Créer un dictionnaire de données normalisées
+    normalized_data = {}
     
-    # Si le modèle n'est pas chargé, essayer de le charger
-    if model is None:
-        if not load_model():
-            raise HTTPException(status_code=500, detail="Modèle non disponible")
+    # Mapper les champs d'entrée aux colonnes attendues par le modèle
+    for api_field, model_column in FEATURE_MAPPING.items():
+        if api_field in input_data:
+            normalized_data[model_column] = input_data[api_field]
     
-    # Vérifier les critères d'exclusion absolus AVANT d'utiliser le modèle
+    # Ajouter les colonnes supplémentaires nécessaires
+    normalized_data["experience_don"] = 1 if input_data.get('deja_donne') == "Oui" else 0
+    normalized_data["arrondissement_clean"] = input_data.get('arrondissement', "Non précisé")
+    normalized_data["quartier_clean"] = input_data.get('quartier', "Non précisé")
+    
+    # Calculer le groupe d'âge
+    normalized_data["groupe_age"] = calculer_groupe_age(input_data.get('age', 35))
+    
+    # Conditions médicales (déjà vérifiées plus haut pour les critères d'exclusion)
+    for condition in CONDITIONS_MEDICALES:
+        normalized_data[condition] = 1 if input_data.get(condition, False) else 0
+    
+    return normalized_data
+
+# Construire un DataFrame (une ligne par donneur) avec toutes les colonnes requises
+def construire_dataframe(lignes: List[Dict[str, Any]], required_columns: Optional[List[str]] = None) -> "pd.DataFrame":
+    import pandas as pd
+    prediction_df = pd.DataFrame(lignes)
+    
+    # Si nous avons une liste de colonnes requises, s'assurer que toutes sont présentes
+    if required_columns:
+        missing_columns = set(required_columns) - set(prediction_df.columns)
+        for col in missing_columns:
+            prediction_df[col] = "" if col in COLONNES_CATEGORIELLES else 0
+    
+    return prediction_df
+
+# Interpréter les probabilités du modèle pour un donneur
+def interpreter_probabilites(input_data: Dict[str, Any], prediction: Any, probabilities: np.ndarray) -> Dict[str, Any]:
     facteurs_importants = []
     raison_ineligibilite = None
     
-    # Critères d'exclusion absolus
-    if input_data.get('porteur_vih_hbs_hcv', False):
-        facteurs_importants.append("Porteur de VIH, hépatite B ou C")
-        raison_ineligibilite = "Porteur de VIH, hépatite B ou C"
-        return {
-            "prediction": "Non éligible",
-            "confidence": 100.0,
-            "facteurs_importants": facteurs_importants,
-            "raison_ineligibilite": raison_ineligibilite
-        }
-    
-    # Autres critères d'exclusion absolus
-    if input_data.get('drepanocytaire', False):
-        facteurs_importants.append("Drépanocytaire")
-        raison_ineligibilite = "Drépanocytaire"
-        return {
-            "prediction": "Non éligible",
-            "confidence": 100.0,
-            "facteurs_importants": facteurs_importants,
-            "raison_ineligibilite": raison_ineligibilite
-        }
+    if prediction == 1:
+        result = "Éligible"
+        confidence = probabilities[1] * 100
+    else:
+        result = "Non éligible"
+        confidence = probabilities[0] * 100
+        
+        # Collecter les facteurs importants
+        if input_data.get('diabetique', False):
+            facteurs_importants.append("Diabète")
+        if input_data.get('hypertendu', False):
+            facteurs_importants.append("Hypertension")
+        if input_data.get('asthmatique', False):
+            facteurs_importants.append("Asthme")
+        
+        # Déterminer la raison principale d'inéligibilité
+        if facteurs_importants:
+            raison_ineligibilite = facteurs_importants[0]
     
-    if input_data.get('cardiaque', False):
-        facteurs_importants.append("Problèmes cardiaques")
-        raison_ineligibilite = "Problèmes cardiaques"
-        return {
-            "prediction": "Non éligible",
-            "confidence": 100.0,
-            "facteurs_importants": facteurs_importants,
-            "raison_ineligibilite": raison_ineligibilite
-        }
+    return {
+        "prediction": result,
+        "confidence": confidence,
+        "facteurs_importants": facteurs_importants,
+        "raison_ineligibilite": raison_ineligibilite
+    }
+
+# Critères d'exclusion absolus, par ordre de priorité : la première règle déclenchée fixe la réponse.
+# Une règle se déclenche si l'une de ses clauses est vraie (toutes les conditions de la clause).
+REGLES_EXCLUSION = [
+    {"id": "vih", "reason": "Porteur de VIH, hépatite B ou C", "confidence": 100.0,
+     "when": [["porteur_vih_hbs_hcv"]]},
+    {"id": "drepanocytaire", "reason": "Drépanocytaire", "confidence": 100.0,
+     "when": [["drepanocytaire"]]},
+    {"id": "cardiaque", "reason": "Problèmes cardiaques", "confidence": 100.0,
+     "when": [["cardiaque"]]},
+    {"id": "hemoglobine", "reason": "Taux d'hémoglobine insuffisant", "confidence": 95.0,
+     "when": [[("genre", "==", "Homme"), ("taux_hemoglobine", "<", 13.0)],
+              [("genre", "==", "Femme"), ("taux_hemoglobine", "<", 12.0)]]},
+]
+moteur_regles = RuleEngine(REGLES_EXCLUSION, defaults={
+    "porteur_vih_hbs_hcv": False, "drepanocytaire": False, "cardiaque": False,
+    "genre": "", "taux_hemoglobine": 0,
+})
+# Compteurs pré-résolus de chaque règle : (retenue, vérifiée)
+COMPTEURS_REGLES = {regle.id: (REGLES_DECLENCHEES.labels(regle.id), REGLES_CONCERNEES.labels(regle.id))
+                    for regle in moteur_regles.rules}
+
+# Vérifier les critères d'exclusion absolus (renvoie le résultat si le donneur est exclu).
+# Les règles étant appliquées avant le modèle, une prédiction du modèle ne concerne jamais
+# un donneur qu'elles excluent : aucune seconde vérification n'est nécessaire après coup.
+def verifier_criteres_exclusion(input_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    regle, declenchees = moteur_regles.evaluate(input_data)
+    for identifiant in declenchees:
+        COMPTEURS_REGLES[identifiant][1].inc()
+    if regle is None:
+        return None
+    COMPTEURS_REGLES[regle.id][0].inc()
+    return regle.result()
+
+# Encoder un donneur pour le modèle (ligne NumPy via l'encodeur précompilé, sinon dictionnaire)
+def encoder_donneur(input_data: Any, modele: ModeleCharge) -> Any:
+    if modele.feature_encoder is not None:
+        return modele.feature_encoder.encode(input_data)
+    return preparer_donnees_modele(input_data)
+
+# Calculer les probabilités d'un modèle pour une liste de lignes encodées
+def predict_proba_lignes(lignes: Any, modele: ModeleCharge) -> np.ndarray:
+    if modele.feature_encoder is None:
+        return modele.pipeline.predict_proba(construire_dataframe(lignes, modele.required_columns))
     
-    # Vérifier le taux d'hémoglobine
-    genre = input_data.get('genre', '')
-    taux_hemoglobine = input_data.get('taux_hemoglobine', 0)
-    
-    if (genre == "Homme" and taux_hemoglobine < 13.0) or (genre == "Femme" and taux_hemoglobine < 12.0):
-        facteurs_importants.append("Taux d'hémoglobine insuffisant")
-        raison_ineligibilite = "Taux d'hémoglobine insuffisant"
-        return {
-            "prediction": "Non éligible",
-            "confidence": 95.0,
-            "facteurs_importants": facteurs_importants,
-            "raison_ineligibilite": raison_ineligibilite
-        }
+    X = lignes if isinstance(lignes, np.ndarray) else np.vstack(lignes)
+    if modele.compiled_model is not None:
+        return modele.compiled_model.predict_proba_matrix(X)
+    return modele.pipeline.named_steps["classifier"].predict_proba(X)
+
+# Calculer les probabilités pour des lignes (version, ligne) regroupées par le planificateur
+# (fonction de module pour pouvoir être exécutée dans un pool de threads ou de processus)
+def predict_proba_lots(elements: List[Any]) -> List[np.ndarray]:
+    resultats: List[Any] = [None] * len(elements)
+    par_version: Dict[str, List[int]] = {}
+    for i, (version, _) in enumerate(elements):
+        par_version.setdefault(version, []).append(i)
     
+    for version, indices in par_version.items():
+        # Dans un processus worker, le registre charge la version si nécessaire
+        try:
+            modele = registry.get(version)
+        except ModeleIndisponible:
+            registry.scan()
+            modele = registry.load(version)
+        probabilities = predict_proba_lignes([elements[i][1] for i in indices], modele)
+        for j, i in enumerate(indices):
+            resultats[i] = probabilities[j]
+    return resultats
+
+# Donneurs d'exemple du schéma OpenAPI (vérifications et préchauffage)
+def exemples_donneurs() -> List[Dict[str, Any]]:
+    return [exemple["value"] for exemple in DonneurInput.Config.schema_extra["examples"].values()]
+
+# Préchauffer une version : un lot et une ligne seule sur les exemples (durée en secondes)
+def rechauffer_modele(modele: ModeleCharge) -> float:
+    debut = time.perf_counter()
+    exemples = exemples_donneurs()
+    if modele.feature_encoder is not None:
+        predict_proba_lignes(modele.feature_encoder.encode_batch(exemples), modele)
+        predict_proba_lignes([modele.feature_encoder.encode(exemples[0])], modele)
+    else:
+        predict_proba_lignes([preparer_donnees_modele(exemple) for exemple in exemples], modele)
+    return time.perf_counter() - debut
+
+# Table de décision d'une version : lue depuis son fichier (clé : contenu du modèle et espace énuméré),
+# sinon calculée dans un thread (les requêtes passent par le modèle en attendant) puis enregistrée
+def preparer_table_decision(modele: ModeleCharge) -> None:
+    if modele.feature_encoder is None:
+        print(f"Table de décision indisponible pour {modele.version} (encodeur précompilé requis)")
+        return
+
+    # Champs lus par le modèle hors des dimensions : fixés à leur valeur par défaut
+    dimensions = {champ for champ, _ in DIMENSIONS_TABLE}
+    fixes = {}
+    for champ in modele.feature_encoder.fields():
+        if champ in dimensions:
+            continue
+        if champ not in DEFAUTS_DONNEUR:
+            print(f"Table de décision indisponible pour {modele.version} (le modèle lit {champ}, "
+                  f"champ obligatoire non énuméré)")
+            return
+        fixes[champ] = DEFAUTS_DONNEUR[champ]
+
+    # Le moteur fait partie de la clé : sklearn et le moteur compilé diffèrent au dernier bit près
+    cle = DecisionTable.key(modele.artifact.content_hash(), DIMENSIONS_TABLE, fixes,
+                            {"engine": modele.engine, "vocabulary": OPTIONS_VOCABULAIRE})
+    chemin = os.path.join(DECISION_TABLE_DIR, f"{modele.version}-{cle}.npy")
+    table = DecisionTable.load(chemin, DIMENSIONS_TABLE, fixes)
+    if table is not None:
+        modele.decision_table = table
+        print(f"Table de décision chargée: {chemin} ({len(table)} profils)")
+        return
+
+    def construire():
+        debut = time.perf_counter()
+        try:
+            table = DecisionTable.build(
+                DIMENSIONS_TABLE, fixes,
+                lambda donneurs: predict_proba_lignes(modele.feature_encoder.encode_batch(donneurs), modele))
+        except Exception as e:
+            print(f"Calcul de la table de décision impossible pour {modele.version}: {e}")
+            return
+        modele.decision_table = table
+        modele.timings["decision_table_s"] = time.perf_counter() - debut
+        try:
+            table.save(chemin)
+        except OSError as e:
+            print(f"Table de décision non enregistrée pour {modele.version}: {e}")
+        print(f"Table de décision de {modele.version}: {len(table)} profils en "
+              f"{modele.timings['decision_table_s']:.2f} s")
+
+    modele.decision_table_thread = threading.Thread(target=construire, name=f"table-{modele.version}", daemon=True)
+    modele.decision_table_thread.start()
+
+# Probabilités lues dans la table de décision du modèle (None si le donneur n'y figure pas)
+def lire_table_decision(input_data: Dict[str, Any], modele: ModeleCharge) -> Optional[np.ndarray]:
+    table = modele.decision_table
+    return table.lookup(input_data) if table is not None else None
+
+# Construire l'encodeur de caractéristiques à partir du pipeline et de model_info
+def construire_encodeur(pipeline: Any, model_info: Optional[Dict[str, Any]],
+                        required_columns: List[str]) -> Optional[FeatureEncoder]:
     try:
-        # Préparer les données pour le modèle
-        # Mapping entre les champs de l'API et les colonnes attendues par le modèle
-        feature_mapping = {
-            "age": "age",
-            "genre": "Genre",
-            "niveau_etude": "Niveau d'etude",
-            "situation_matrimoniale": "Situation Matrimoniale (SM)",
-            "profession": "Profession",
-            "nationalite": "Nationalité",
-            "religion": "Religion",
-            "deja_donne": "A-t-il (elle) déjà donné le sang",
-            "arrondissement": "Arrondissement de résidence",
-            "quartier": "Quartier de Résidence",
-            "taux_hemoglobine": "Taux d'hémoglobine"
-        }
+        defaults = {col: "" if col in COLONNES_CATEGORIELLES else 0 for col in required_columns}
         
-        # Créer un dictionnaire de données normalisées
-        normalized_data = {}
+        # Vérifier l'encodage contre le prétraitement du pipeline sur les exemples. Le pipeline ne
+        # reconnaît que les catégories exactes : la vérification se fait sans les correspondances
+        # normalisées ou approchées, qui changent volontairement l'encodage des variantes d'écriture.
+        strict = FeatureEncoder.from_pipeline(pipeline, SOURCES_ENCODEUR, defaults=defaults, model_info=model_info,
+                                              vocabulary_options={"match": "exact"})
+        exemples = exemples_donneurs()
+        attendu = pipeline.named_steps["preprocessor"].transform(
+            construire_dataframe([preparer_donnees_modele(exemple) for exemple in exemples], required_columns))
+        if not np.array_equal(strict.encode_batch(exemples), attendu.astype(np.float32)):
+            print("Encodeur précompilé écarté (encodage différent du prétraitement)")
+            return None
+        encoder = FeatureEncoder.from_pipeline(pipeline, SOURCES_ENCODEUR, defaults=defaults, model_info=model_info,
+                                               vocabulary_options=OPTIONS_VOCABULAIRE)
         
-        # Mapper les champs d'entrée aux colonnes attendues par le modèle
-        for api_field, model_column in feature_mapping.items():
-            if api_field in input_data:
-                normalized_data[model_column] = input_data[api_field]
+        print(f"Encodeur précompilé: {encoder.n_features} colonnes")
+        return encoder
+    except Exception as e:
+        print(f"Encodeur précompilé indisponible, utilisation du DataFrame: {e}")
+        return None
+
+# Compiler le pipeline et vérifier qu'il reproduit predict_proba (sinon rester sur sklearn) : sur les
+# exemples du schéma et sur les donneurs de vérification, assez nombreux pour passer près des seuils
+# des arbres (un seuil mal arrondi en float32 change une décision)
+def compiler_modele(pipeline: Any, required_columns: List[str]) -> Optional[CompiledModel]:
+    try:
+        compiled = compile_pipeline(pipeline)
         
-        # Ajouter les colonnes supplémentaires nécessaires
-        normalized_data["experience_don"] = 1 if input_data.get('deja_donne') == "Oui" else 0
-        normalized_data["arrondissement_clean"] = input_data.get('arrondissement', "Non précisé")
-        normalized_data["quartier_clean"] = input_data.get('quartier', "Non précisé")
+        # Même matrice d'entrée que le pipeline (l'encodeur a été vérifié contre ce prétraitement)
+        donneurs = exemples_donneurs() + donneurs_verification(categories_pipeline(pipeline))
+        donnees = construire_dataframe([preparer_donnees_modele(donneur) for donneur in donneurs],
+                                       required_columns)
+        X = pipeline.named_steps["preprocessor"].transform(donnees).astype(np.float32)
+        ecart = float(np.abs(compiled.predict_proba_matrix(X) - pipeline.predict_proba(donnees)).max())
+        if ecart > 1e-9:
+            print(f"Moteur compilé écarté (écart de probabilité {ecart:.2e})")
+            return None
         
-        # Calculer le groupe d'âge
-        age = input_data.get('age', 35)
-        if age < 18:
-            age_group = "<18"
-        elif age <= 25:
-            age_group = "18-25"
-        elif age <= 35:
-            age_group = "26-35"
-        elif age <= 45:
-            age_group = "36-45"
-        elif age <= 55:
-            age_group = "46-55"
-        elif age <= 65:
-            age_group = "56-65"
-        else:
-            age_group = ">65"
-        normalized_data["groupe_age"] = age_group
+        print(f"Moteur compilé: {len(compiled.roots)} arbres, {len(compiled.feature)} nœuds, "
+              f"{compiled.n_features} caractéristiques")
+        return compiled
+    except Exception as e:
+        print(f"Compilation du modèle impossible, utilisation du pipeline sklearn: {e}")
+        return None
+
+# Catégories apprises par le OneHotEncoder du pipeline, par colonne
+def categories_pipeline(pipeline: Any) -> Dict[str, List[Any]]:
+    categories: Dict[str, List[Any]] = {}
+    for _, transformer, columns in pipeline.named_steps["preprocessor"].transformers_:
+        onehot = dict(getattr(transformer, "steps", [])).get("onehot")
+        if onehot is not None:
+            categories.update((colonne, onehot.categories_[i].tolist()) for i, colonne in enumerate(columns))
+    return categories
+
+# Donneurs de vérification : exemples du schéma dont chaque champ lu tel quel par le modèle est tiré
+# dans les catégories connues du modèle (quelques valeurs manquantes : imputation) et l'âge dans ses bornes
+def donneurs_verification(categories_modele: Dict[str, List[Any]], n: int = 2000,
+                          graine: int = 0) -> List[Dict[str, Any]]:
+    aleatoire = random.Random(graine)
+    valeurs: Dict[str, List[Any]] = {"age": list(range(18, 71))}
+    for colonne, categories in categories_modele.items():
+        if colonne not in SOURCES_ENCODEUR:
+            continue
+        champ, transformation = SOURCES_ENCODEUR[colonne]
+        if transformation is None:
+            valeurs.setdefault(champ, [])
+            valeurs[champ].extend(c for c in categories if c not in valeurs[champ])
+    exemples = exemples_donneurs()
+    donneurs = []
+    for _ in range(n):
+        donneur = dict(aleatoire.choice(exemples))
+        for champ, candidats in valeurs.items():
+            manquant = champ != "age" and aleatoire.random() < 0.05
+            donneur[champ] = None if manquant else aleatoire.choice(candidats)
+        donneurs.append(donneur)
+    return donneurs
+
+# Compacter le moteur vérifié : indicatrices qu'aucun arbre ne teste retirées de l'encodeur et du
+# moteur, feuilles sœurs identiques fusionnées. Le résultat doit donner exactement les probabilités
+# du moteur complet, et celles du pipeline à 1e-9 près ; sinon le moteur complet est gardé.
+def compacter_modele(pipeline: Any, encoder: FeatureEncoder, compiled: CompiledModel,
+                     model_info: Optional[Dict[str, Any]], required_columns: List[str]) -> tuple:
+    try:
+        garder = compiled.used_features()
+        encodeur_compact = encoder.select(garder)
+        moteur_compact = compiled.compact(garder)
+
+        donneurs = donneurs_verification(categories_pipeline(pipeline))
+        attendu = compiled.predict_proba_matrix(encoder.encode_batch(donneurs))
+        obtenu = moteur_compact.predict_proba_matrix(encodeur_compact.encode_batch(donneurs))
+        if not np.array_equal(attendu, obtenu):
+            print("Compactage du moteur écarté (probabilités différentes du moteur complet)")
+            return encoder, compiled, None
+
+        # Contre le pipeline : vocabulaire exact, comme son OneHotEncoder
+        strict = FeatureEncoder.from_state(encoder.get_state(), encoder.template, SOURCES_ENCODEUR,
+                                           {"match": "exact"}).select(garder)
+        reference = pipeline.predict_proba(construire_dataframe([preparer_donnees_modele(donneur)
+                                                                 for donneur in donneurs], required_columns))
+        probabilites = moteur_compact.predict_proba_matrix(strict.encode_batch(donneurs))
+        ecart = float(np.abs(probabilites - reference).max())
+        accord = float((probabilites.argmax(axis=1) == reference.argmax(axis=1)).mean())
+        if ecart > 1e-9:
+            print(f"Compactage du moteur écarté (écart de probabilité avec le pipeline {ecart:.2e})")
+            return encoder, compiled, None
+    except Exception as e:
+        print(f"Compactage du moteur impossible: {e}")
+        return encoder, compiled, None
+
+    # Décisions identiques sur les donneurs de vérification : les métriques de model_info restent valables
+    model_info = model_info or {}
+    metriques_modele = {cle: model_info[cle] for cle in ("accuracy", "precision", "recall", "f1_score", "roc_auc")
+                        if cle in model_info}
+    verification = {
+        "rows": len(donneurs),
+        "label_agreement": accord,
+        "max_abs_proba_diff": ecart,
+        "features": [compiled.n_features, moteur_compact.n_features],
+        "nodes": [int(compiled.feature.shape[0]), int(moteur_compact.feature.shape[0])],
+        "model_info_metrics": metriques_modele,
+    }
+    print(f"Moteur compacté: {compiled.n_features} -> {moteur_compact.n_features} colonnes, "
+          f"{verification['nodes'][0]} -> {verification['nodes'][1]} nœuds ; vérifié sur {len(donneurs)} donneurs "
+          f"(décisions identiques au pipeline: {accord:.1%}, écart max {ecart:.1e}) ; métriques conservées: "
+          + ", ".join(f"{cle} {valeur:.3f}" for cle, valeur in metriques_modele.items()))
+    return encodeur_compact, moteur_compact, verification
+
+# Les explications demandent l'encodeur et le moteur compilé (pas de chemin sklearn/DataFrame)
+def verifier_explications(modele: ModeleCharge) -> None:
+    if modele.feature_encoder is None or modele.feature_encoder.spans is None or modele.compiled_model is None:
+        raise HTTPException(status_code=501,
+                            detail=f"Explications indisponibles pour le modèle {modele.version} (moteur compilé requis)")
+
+# Contributions des caractéristiques (colonnes de model_info) pour des lignes encodées
+def expliquer_lignes(X: np.ndarray, modele: ModeleCharge) -> List[Dict[str, Any]]:
+    colonnes = modele.feature_encoder.columns
+    base, par_colonne = modele.compiled_model.contributions(X, modele.feature_encoder.column_index(), len(colonnes))
+    # Colonnes sans champ de l'API (toujours à leur valeur par défaut) : le donneur n'y peut rien,
+    # leur part est comptée dans la valeur de base de la ligne
+    sans_source = np.array([colonne not in SOURCES_ENCODEUR for colonne in colonnes])
+    bases = (base + par_colonne[:, sans_source].sum(axis=1)).tolist()
+    par_colonne[:, sans_source] = 0.0
+    # Colonnes par contribution absolue décroissante, triées pour toutes les lignes à la fois
+    ordre = np.argsort(-np.abs(par_colonne), axis=1, kind="stable")
+    valeurs = np.take_along_axis(par_colonne, ordre, axis=1)
+    return [{"valeur_de_base": base_ligne,
+             "contributions": {colonnes[k]: v for k, v in zip(indices, ligne) if v != 0.0}}
+            for base_ligne, indices, ligne in zip(bases, ordre.tolist(), valeurs.tolist())]
+
+# Fonction de prédiction avec règles de sécurité strictes
+def predict_eligibility(input_data: Dict[str, Any], nom_modele: Optional[str] = None) -> Dict[str, Any]:
+    # Version de modèle demandée (503 si aucun modèle n'est actif)
+    modele = obtenir_modele(nom_modele)
+    
+    # Vérifier les critères d'exclusion absolus AVANT d'utiliser le modèle
+    exclusion = verifier_criteres_exclusion(input_data)
+    if exclusion is not None:
+        return exclusion
+    
+    try:
+        # Profil précalculé, sinon préparer les données pour le modèle et faire la prédiction
+        probabilities = lire_table_decision(input_data, modele)
+        if probabilities is None:
+            ligne = encoder_donneur(input_data, modele)
+            cle = prediction_cache.key(ligne, modele.signature)
+            probabilities = prediction_cache.get(cle)
+            if probabilities is None:
+                probabilities = predict_proba_lignes([ligne], modele)[0]
+                prediction_cache.put(cle, probabilities.copy())
+        prediction = modele.classes_[probabilities.argmax()]
         
-        # Conditions médicales (déjà vérifiées plus haut pour les critères d'exclusion)
-        for condition in ['porteur_vih_hbs_hcv', 'diabetique', 'hypertendu', 'asthmatique', 
-                          'drepanocytaire', 'cardiaque', 'transfusion', 'tatoue', 'scarifie']:
-            normalized_data[condition] = 1 if input_data.get(condition, False) else 0
+        # Interpréter les résultats
+        return interpreter_probabilites(input_data, prediction, probabilities)
         
-        # Créer un DataFrame avec une seule ligne
-        prediction_df = pd.DataFrame([normalized_data])
+    except Exception as e:
+        print(f"Erreur lors de la prédiction: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction: {str(e)}")
+
+# Version asynchrone : l'inférence passe par le planificateur (micro-batching hors de la boucle)
+async def predict_eligibility_async(input_data: Dict[str, Any], nom_modele: Optional[str] = None,
+                                    expliquer: bool = False) -> Dict[str, Any]:
+    # La version est résolue une fois : un changement de modèle actif n'affecte pas la requête en cours
+    modele = obtenir_modele(nom_modele)
+    if expliquer:
+        verifier_explications(modele)
+    
+    # Les règles d'exclusion sont peu coûteuses : elles restent sur la boucle d'événements
+    debut = time.perf_counter()
+    exclusion = verifier_criteres_exclusion(input_data)
+    t_regles = time.perf_counter()
+    ETAPES["predict", "rules"].observe(t_regles - debut)
+    if exclusion is not None:
+        PREDICTIONS.labels("predict", "rule").inc()
+        return exclusion
+    
+    # Profil couvert par la table de décision : ni encodage ni inférence (l'explication demande la ligne)
+    if not expliquer:
+        probabilities = lire_table_decision(input_data, modele)
+        if probabilities is not None:
+            ETAPES["predict", "table"].observe(time.perf_counter() - t_regles)
+            PREDICTIONS.labels("predict", "table").inc()
+            return interpreter_probabilites(input_data, modele.classes_[probabilities.argmax()], probabilities)
+    
+    # Une ligne déjà vue (même profil encodé, même modèle) ne repasse pas par l'inférence
+    ligne = encoder_donneur(input_data, modele)
+    t_encodage = time.perf_counter()
+    ETAPES["predict", "encoding"].observe(t_encodage - t_regles)
+    cle = prediction_cache.key(ligne, modele.signature)
+    probabilities = prediction_cache.get(cle)
+    t_cache = time.perf_counter()
+    ETAPES["predict", "cache"].observe(t_cache - t_encodage)
+    
+    try:
+        if probabilities is None:
+            probabilities = await inference_scheduler.submit((modele.version, ligne))
+            # Durée vue par la requête : attente dans la file comprise
+            ETAPES["predict", "inference"].observe(time.perf_counter() - t_cache)
+            # Copie : la ligne est une vue sur la matrice du micro-lot, que l'entrée garderait en vie
+            prediction_cache.put(cle, probabilities.copy())
+            PREDICTIONS.labels("predict", "model").inc()
+        else:
+            PREDICTIONS.labels("predict", "cache").inc()
+    except FileAttentePleine:
+        raise HTTPException(status_code=503, detail="Service saturé, veuillez réessayer",
+                            headers={"Retry-After": "1"})
+    except Exception as e:
+        print(f"Erreur lors de la prédiction: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction: {str(e)}")
+    
+    prediction = modele.classes_[probabilities.argmax()]
+    resultat = interpreter_probabilites(input_data, prediction, probabilities)
+    if expliquer:
+        # Quelques dizaines de microsecondes : calculé sur la boucle, sans passer par le planificateur
+        debut = time.perf_counter()
+        resultat["explication"] = expliquer_lignes(ligne[None, :], modele)[0]
+        ETAPES["predict", "explanation"].observe(time.perf_counter() - debut)
+    return resultat
+
+# Fonction de prédiction par lot : règles vectorisées puis un seul appel au modèle
+def predict_eligibility_batch(inputs: List[Dict[str, Any]], nom_modele: Optional[str] = None,
+                              expliquer: bool = False) -> List[Dict[str, Any]]:
+    # Version de modèle demandée (503 si aucun modèle n'est actif)
+    modele = obtenir_modele(nom_modele)
+    if expliquer:
+        verifier_explications(modele)
+    
+    n = len(inputs)
+    if n == 0:
+        return []
+    debut = time.perf_counter()
+    
+    # Toutes les règles en une passe sur les colonnes du lot : indice de la règle retenue
+    # pour chaque ligne (-1 si aucune) et matrice des règles vérifiées
+    regle, declenchees = moteur_regles.evaluate_batch(inputs)
+    
+    # Compter les règles : retenue (une par donneur, la première par priorité) et vérifiées
+    retenues = np.bincount(regle[regle >= 0], minlength=len(moteur_regles.rules))
+    for r, nombre, concernes in zip(moteur_regles.rules, retenues, declenchees.sum(axis=0)):
+        if nombre:
+            COMPTEURS_REGLES[r.id][0].inc(int(nombre))
+        if concernes:
+            COMPTEURS_REGLES[r.id][1].inc(int(concernes))
+    PREDICTIONS.labels("batch", "rule").inc(int((regle >= 0).sum()))
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * n
+    for i in np.flatnonzero(regle >= 0):
+        results[i] = moteur_regles.rules[regle[i]].result()
+    
+    # Lignes restantes : une seule matrice et un seul passage predict_proba
+    restants = np.flatnonzero(regle < 0)
+    t_regles = time.perf_counter()
+    ETAPES["batch", "rules"].observe(t_regles - debut)
+    
+    # Profils couverts par la table de décision : probabilités lues directement
+    table = modele.decision_table if not expliquer else None
+    if table is not None and len(restants):
+        positions = np.fromiter((table.index(inputs[i]) for i in restants), dtype=np.intp, count=len(restants))
+        couverts = positions >= 0
+        if couverts.any():
+            probabilities = table.probabilities[positions[couverts]]
+            predictions = modele.classes_[probabilities.argmax(axis=1)]
+            for i, prediction, proba in zip(restants[couverts], predictions, probabilities):
+                results[i] = interpreter_probabilites(inputs[i], prediction, proba)
+            PREDICTIONS.labels("batch", "table").inc(int(couverts.sum()))
+            restants = restants[~couverts]
+        t_table = time.perf_counter()
+        ETAPES["batch", "table"].observe(t_table - t_regles)
+        t_regles = t_table
+    
+    if len(restants):
+        try:
+            lignes = [inputs[i] for i in restants]
+            if modele.feature_encoder is not None:
+                X = modele.feature_encoder.encode_batch(lignes)
+                t_encodage = time.perf_counter()
+                ETAPES["batch", "encoding"].observe(t_encodage - t_regles)
+                
+                # Les lignes déjà en cache ne repassent pas par le modèle
+                cles = [prediction_cache.key(x, modele.signature) for x in X]
+                probabilities = np.empty((len(lignes), len(modele.classes_)))
+                absents = []
+                for j, cle in enumerate(cles):
+                    en_cache = prediction_cache.get(cle)
+                    if en_cache is None:
+                        absents.append(j)
+                    else:
+                        probabilities[j] = en_cache
+                t_cache = time.perf_counter()
+                ETAPES["batch", "cache"].observe(t_cache - t_encodage)
+                if absents:
+                    probabilities[absents] = predict_proba_lignes(X[absents], modele)
+                    for j in absents:
+                        prediction_cache.put(cles[j], probabilities[j].copy())
+                    ETAPES["batch", "inference"].observe(time.perf_counter() - t_cache)
+                PREDICTIONS.labels("batch", "cache").inc(len(lignes) - len(absents))
+                PREDICTIONS.labels("batch", "model").inc(len(absents))
+                if expliquer:
+                    t_explication = time.perf_counter()
+                    explications = expliquer_lignes(X, modele)
+                    ETAPES["batch", "explanation"].observe(time.perf_counter() - t_explication)
+            else:
+                probabilities = predict_proba_lignes([preparer_donnees_modele(ligne) for ligne in lignes], modele)
+                ETAPES["batch", "inference"].observe(time.perf_counter() - t_regles)
+                PREDICTIONS.labels("batch", "model").inc(len(lignes))
+            predictions = modele.classes_[probabilities.argmax(axis=1)]
+        except Exception as e:
+            print(f"Erreur lors de la prédiction par lot: {e}")
+            raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction: {str(e)}")
         
-        # Si nous avons une liste de colonnes requises, s'assurer que toutes sont présentes
-        if required_columns:
-            missing_columns = set(required_columns) - set(prediction_df.columns)
-            for col in missing_columns:
-                prediction_df[col] = "" if col in ["Niveau d'etude", "Genre", "Situation Matrimoniale (SM)",
-                                              "Profession", "Arrondissement de résidence", "Quartier de Résidence",
-                                              "Nationalité", "Religion", "A-t-il (elle) déjà donné le sang",
-                                              "groupe_age", "arrondissement_clean", "quartier_clean"] else 0
+        for j, i in enumerate(restants):
+            results[i] = interpreter_probabilites(inputs[i], predictions[j], probabilities[j])
+            if expliquer:
+                results[i]["explication"] = explications[j]
+    
+    return results
+
+# Nombre de lignes notées à la fois par /predict/stream et `python main.py score`
+STREAM_CHUNK_ROWS = int(os.environ.get("STREAM_CHUNK_ROWS", 512))
+
+# Valider un enregistrement lu dans un flux NDJSON/CSV (le donneur validé ou l'erreur de la ligne)
+def valider_enregistrement(enregistrement: Record) -> Dict[str, Any]:
+    ligne, champs, erreur = enregistrement
+    entree: Dict[str, Any] = {"line": ligne}
+    if champs is not None and "id" in champs:
+        # Identifiant du registre recopié tel quel dans le résultat
+        entree["id"] = champs["id"]
+    if erreur is not None:
+        entree["error"] = {"type": "parse", "message": erreur}
+        return entree
+    try:
+        entree["donneur"] = vars(DonneurInput(**champs))
+    except ValidationError as e:
+        entree["error"] = {
+            "type": "validation",
+            "details": [{"field": ".".join(str(partie) for partie in detail["loc"]), "message": detail["msg"]}
+                        for detail in e.errors()],
+        }
+    return entree
+
+# Noter une tranche d'enregistrements : lignes NDJSON dans l'ordre d'entrée, nombre de lignes en erreur
+# et paires (donneur, résultat) des lignes notées, pour l'audit et la notation en ombre
+# (fonction de module : exécutée dans le pool d'inférence, hors de la boucle d'événements)
+def noter_tranche(enregistrements: List[Record], nom_modele: Optional[str] = None,
+                  expliquer: bool = False) -> tuple:
+    entrees = [valider_enregistrement(enregistrement) for enregistrement in enregistrements]
+    valides = [entree for entree in entrees if "donneur" in entree]
+    
+    resultats: List[Dict[str, Any]] = []
+    erreur_prediction = None
+    if valides:
+        donneurs = [entree.pop("donneur") for entree in valides]
+        try:
+            resultats = predict_eligibility_batch(donneurs, nom_modele, expliquer)
+        except HTTPException as e:
+            # Une tranche en échec n'interrompt pas le flux : chacune de ses lignes porte l'erreur
+            erreur_prediction = {"type": "prediction", "message": str(e.detail)}
+        # Dépôt sans attente, depuis le pool d'inférence (sans effet hors du service)
+        if moniteur_derive.running:
+            for donneur, resultat in zip(donneurs, resultats):
+                moniteur_derive.submit(donneur, resultat)
+    
+    for entree, resultat in zip(valides, resultats):
+        entree.update(resultat)
+    if erreur_prediction is not None:
+        for entree in valides:
+            entree["error"] = erreur_prediction
+    erreurs = sum(1 for entree in entrees if "error" in entree)
+    notes = list(zip(donneurs, resultats)) if valides else []
+    return b"".join(encode_line(entree) for entree in entrees), erreurs, notes
+
+# Noter un fichier NDJSON ou CSV vers un fichier NDJSON ("-" : entrée ou sortie standard)
+def noter_fichier(chemin_entree: str, chemin_sortie: str = "-", fmt: Optional[str] = None,
+                  nom_modele: Optional[str] = None, taille_bloc: int = 1 << 16,
+                  expliquer: bool = False) -> Dict[str, Any]:
+    import sys
+    parser = RecordParser(fmt or detect_format(filename=chemin_entree))
+    modele = obtenir_modele(nom_modele)
+    if expliquer:
+        verifier_explications(modele)
+    version = modele.version
+    bilan = {"rows": 0, "errors": 0, "model": version}
+    debut = time.perf_counter()
+    
+    # sys.__stdout__ : la sortie standard réelle, même si les messages sont redirigés vers stderr
+    entree = sys.stdin.buffer if chemin_entree == "-" else open(chemin_entree, "rb")
+    sortie = sys.__stdout__.buffer if chemin_sortie == "-" else open(chemin_sortie, "wb")
+    try:
+        tranche: List[Record] = []
         
-        # Faire la prédiction
-        prediction = model.predict(prediction_df)[0]
-        probabilities = model.predict_proba(prediction_df)[0]
+        def vider():
+            contenu, erreurs, _ = noter_tranche(tranche, version, expliquer)
+            sortie.write(contenu)
+            bilan["rows"] += len(tranche)
+            bilan["errors"] += erreurs
+            tranche.clear()
         
-        # Interpréter les résultats
-        if prediction == 1:
-            result = "Éligible"
-            confidence = probabilities[1] * 100
+        for bloc in iter(lambda: entree.read(taille_bloc), b""):
+            for enregistrement in parser.feed(bloc):
+                tranche.append(enregistrement)
+                if len(tranche) >= STREAM_CHUNK_ROWS:
+                    vider()
+        tranche.extend(parser.close())
+        if tranche:
+            vider()
+    finally:
+        if entree is not sys.stdin.buffer:
+            entree.close()
+        if sortie is not sys.__stdout__.buffer:
+            sortie.close()
         else:
-            result = "Non éligible"
-            confidence = probabilities[0] * 100
-            
-            # Collecter les facteurs importants
-            if input_data.get('diabetique', False):
-                facteurs_importants.append("Diabète")
-            if input_data.get('hypertendu', False):
-                facteurs_importants.append("Hypertension")
-            if input_data.get('asthmatique', False):
-                facteurs_importants.append("Asthme")
-            
-            # Déterminer la raison principale d'inéligibilité
-            if facteurs_importants:
-                raison_ineligibilite = facteurs_importants[0]
-        
-        # VÉRIFICATION FINALE DES RÈGLES DE SÉCURITÉ
-        # Même si le modèle prédit "Éligible", double-vérifier les critères d'exclusion
-        if result == "Éligible":
-            # Vérifier à nouveau les critères d'exclusion
-            if input_data.get('porteur_vih_hbs_hcv', False):
-                result = "Non éligible"
-                confidence = 100.0
-                facteurs_importants = ["Porteur de VIH, hépatite B ou C"]
-                raison_ineligibilite = "Porteur de VIH, hépatite B ou C"
-            
-            elif input_data.get('drepanocytaire', False) or input_data.get('cardiaque', False):
-                result = "Non éligible"
-                confidence = 100.0
-                if input_data.get('drepanocytaire', False):
-                    facteurs_importants = ["Drépanocytaire"]
-                    raison_ineligibilite = "Drépanocytaire"
-                else:
-                    facteurs_importants = ["Problèmes cardiaques"]
-                    raison_ineligibilite = "Problèmes cardiaques"
-            
-            elif (genre == "Homme" and taux_hemoglobine < 13.0) or (genre == "Femme" and taux_hemoglobine < 12.0):
-                result = "Non éligible"
-                confidence = 95.0
-                facteurs_importants = ["Taux d'hémoglobine insuffisant"]
-                raison_ineligibilite = "Taux d'hémoglobine insuffisant"
+            sortie.flush()
+    
+    bilan["seconds"] = time.perf_counter() - debut
+    return bilan
+
+# Planificateur d'inférence (taille du pool et fenêtre de regroupement configurables)
+inference_scheduler = InferenceScheduler.from_env(predict_proba_lots, on_batch=observer_lot_inference)
+
+# Champs suivis par le moniteur de dérive : histogrammes (bornes, pas) et esquisses count-min
+CHAMPS_NUMERIQUES_DERIVE = {"age": (18.0, 71.0, 1.0), "taux_hemoglobine": (7.0, 20.1, 0.1)}
+CHAMPS_CATEGORIELS_DERIVE = ["genre", "niveau_etude", "situation_matrimoniale", "profession", "nationalite",
+                             "religion", "deja_donne", "arrondissement", "quartier"]
+
+# Issue d'une réponse : identifiant de la règle d'exclusion qui l'a fixée, sinon le modèle
+IDS_REGLES = {regle.reason: regle.id for regle in moteur_regles.rules}
+
+def issue_prediction(resultat: Dict[str, Any]) -> str:
+    return IDS_REGLES.get(resultat.get("raison_ineligibilite"), MODEL_OUTCOME)
+
+# Suivi de la dérive des entrées (DRIFT_MONITOR=0 : désactivé), comparées à la référence DRIFT_BASELINE.
+# Par défaut la référence est un fichier d'exécution (DRIFT_DIR, comme AUDIT_DIR), hors du dossier
+# versionné des modèles : la figer depuis l'API ne modifie pas l'arbre de travail
+moniteur_derive = DriftMonitor.from_env(CHAMPS_NUMERIQUES_DERIVE, CHAMPS_CATEGORIELS_DERIVE, issue_prediction,
+                                        default_baseline=os.path.join(os.environ.get("DRIFT_DIR", "./drift"),
+                                                                      "drift_baseline.json"))
+
+# Construire la référence de dérive à partir d'un registre NDJSON ou CSV noté hors ligne
+def profiler_fichier(chemin_entree: str, fmt: Optional[str] = None, nom_modele: Optional[str] = None,
+                     taille_bloc: int = 1 << 16) -> Dict[str, Any]:
+    import sys
+    parser = RecordParser(fmt or detect_format(filename=chemin_entree))
+    version = obtenir_modele(nom_modele).version
+    profil = moniteur_derive.new_profile()
+    bilan = {"rows": 0, "errors": 0, "model": version}
+    
+    entree = sys.stdin.buffer if chemin_entree == "-" else open(chemin_entree, "rb")
+    try:
+        tranche: List[Record] = []
         
-        return {
-            "prediction": result,
-            "confidence": confidence,
-            "facteurs_importants": facteurs_importants,
-            "raison_ineligibilite": raison_ineligibilite
-        }
+        def vider():
+            entrees = [valider_enregistrement(enregistrement) for enregistrement in tranche]
+            donneurs = [valide["donneur"] for valide in entrees if "donneur" in valide]
+            if donneurs:
+                resultats = predict_eligibility_batch(donneurs, version)
+                profil.add(moniteur_derive.profile_rows(list(zip(donneurs, resultats))))
+            bilan["rows"] += len(donneurs)
+            bilan["errors"] += len(entrees) - len(donneurs)
+            tranche.clear()
         
-    except Exception as e:
-        print(f"Erreur lors de la prédiction: {e}")
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction: {str(e)}")
+        for bloc in iter(lambda: entree.read(taille_bloc), b""):
+            for enregistrement in parser.feed(bloc):
+                tranche.append(enregistrement)
+                if len(tranche) >= STREAM_CHUNK_ROWS:
+                    vider()
+        tranche.extend(parser.close())
+        if tranche:
+            vider()
+    finally:
+        if entree is not sys.stdin.buffer:
+            entree.close()
+    
+    bilan["baseline"] = moniteur_derive.save_baseline(profil, os.path.basename(chemin_entree))
+    return bilan
+
+# Notation en ombre : le modèle candidat évalue le même donneur, sa réponse n'est jamais renvoyée.
+# Un donneur écarté par une règle reçoit la même réponse quel que soit le modèle : rien à comparer.
+async def predire_ombre(input_data: Dict[str, Any], version: str) -> Optional[Dict[str, Any]]:
+    if moteur_regles.first_match(input_data) is not None:
+        return None
+    modele = obtenir_modele(version)
+    probabilities = lire_table_decision(input_data, modele)
+    if probabilities is None:
+        ligne = encoder_donneur(input_data, modele)
+        cle = prediction_cache.key(ligne, modele.signature)
+        probabilities = prediction_cache.get(cle)
+        if probabilities is None:
+            probabilities = await inference_scheduler.submit((modele.version, ligne))
+            prediction_cache.put(cle, probabilities.copy())
+    return interpreter_probabilites(input_data, modele.classes_[probabilities.argmax()], probabilities)
 
-# Route pour vérifier si l'API est en ligne
+def observer_ombre(version: str, input_data: Dict[str, Any], resultat: Dict[str, Any], duree: float,
+                   accord: bool) -> None:
+    COMPARAISONS_OMBRE.labels(version, "agree" if accord else "disagree").inc()
+    DUREE_OMBRE.labels(version).observe(duree)
+    journal_audit.submit_nowait({"ts": time.time(), "request": None, "endpoint": "shadow", "model": version,
+                                 "input": input_data, "output": resultat})
+
+# Modèle candidat (SHADOW_MODEL), part du trafic notée (SHADOW_SAMPLE_RATE), évaluations simultanées max
+notateur_ombre = ShadowScorer.from_env(predire_ombre, on_result=observer_ombre)
+
+# Jauges lues au moment de l'export : cache, file d'inférence, modèles, démarrage
+def _statistiques_cache(cle: str):
+    return lambda: prediction_cache.stats()[cle]
+
+metriques.gauge("prediction_cache_entries", "Entrées dans le cache de prédictions", _statistiques_cache("size"))
+metriques.gauge("prediction_cache_capacity", "Capacité du cache de prédictions", _statistiques_cache("max_size"))
+for _cle in ("hits", "misses", "evictions", "expirations", "invalidations"):
+    metriques.gauge(f"prediction_cache_{_cle}_total", f"Cache de prédictions : {_cle}", _statistiques_cache(_cle),
+                    kind="counter")
+metriques.gauge("inference_queue_size", "Lignes en attente dans la file d'inférence",
+                lambda: inference_scheduler.queue_size)
+metriques.gauge("inference_queue_capacity", "Capacité de la file d'inférence",
+                lambda: inference_scheduler.max_queue_size)
+metriques.gauge("inference_rejected_total", "Lignes et lots refusés (file d'inférence pleine)",
+                lambda: inference_scheduler.rejected, kind="counter")
+metriques.gauge("audit_queue_size", "Enregistrements en attente d'écriture dans le journal d'audit",
+                lambda: journal_audit.queue_size)
+metriques.gauge("audit_records_total", "Enregistrements du journal d'audit, par issue (written, dropped, failed)",
+                lambda: {(issue,): getattr(journal_audit, issue) for issue in ("written", "dropped", "failed")},
+                ["outcome"], kind="counter")
+metriques.gauge("drift_monitor_predictions_total",
+                "Prédictions vues par le suivi de la dérive, par issue (recorded, dropped, sampled_out)",
+                lambda: {(issue,): getattr(moniteur_derive, issue) for issue in ("recorded", "dropped", "sampled_out")},
+                ["outcome"], kind="counter")
+metriques.gauge("drift_psi", "Indice de stabilité (PSI) des données récentes par rapport à la référence",
+                lambda: {(element,): valeur for element, valeur in moniteur_derive.last_psi.items()}, ["feature"])
+metriques.gauge("rate_limit_requests_total",
+                "Requêtes vues par le limiteur, par règle et issue (allowed, limited, overloaded)",
+                lambda: {cle: nombre for cle, nombre in limiteur.counts.items()}, ["route", "outcome"],
+                kind="counter")
+metriques.gauge("rate_limit_clients", "Seaux de clients suivis par le limiteur", lambda: limiteur.clients)
+metriques.gauge("inference_requests_in_flight", "Requêtes d'inférence en cours (plafond MAX_IN_FLIGHT)",
+                lambda: limiteur.in_flight)
+metriques.gauge("model_active", "Version de modèle active (1) parmi les versions chargées",
+                lambda: {statut["version"]: int(statut["active"]) for statut in registry.status()
+                         if statut["status"] == "chargé"}, ["version"])
+# Valeurs hors vocabulaire exact du modèle actif, par colonne (normalisées, approchées, inconnues)
+def _correspondances_vocabulaire() -> Dict[tuple, int]:
+    try:
+        modele = registry.get(None)
+    except ModeleIndisponible:
+        return {}
+    if modele.feature_encoder is None:
+        return {}
+    return {(colonne, correspondance): stats[correspondance]
+            for colonne, stats in modele.feature_encoder.vocabulary_stats().items()
+            for correspondance in VocabularyIndex.MATCHES}
+
+metriques.gauge("vocabulary_fallback_total",
+                "Valeurs catégorielles absentes du vocabulaire exact du modèle actif, par correspondance trouvée",
+                _correspondances_vocabulaire, ["column", "match"], kind="counter")
+metriques.gauge("startup_duration_seconds", "Durées du démarrage (import, chargement, préchauffage)",
+                lambda: {phase.removesuffix("_s"): valeur for phase, valeur in TEMPS_DEMARRAGE.items()
+                         if isinstance(valeur, float)},
+                ["phase"])
+
+# Durées du démarrage (secondes) : import du module, chargement et préchauffage du modèle par défaut
+TEMPS_DEMARRAGE: Dict[str, Any] = {}
+demarrage_termine = False
+
+# Route pour vérifier si l'API est en ligne (liveness : ne dépend pas du modèle)
 @app.get("/", tags=["Statut"])
 async def root():
-    return {"status": "API en ligne", "model_loaded": model is not None}
+    return {"status": "API en ligne", "model_loaded": registry.active_version is not None,
+            "active_model": registry.active_version}
+
+# Route de disponibilité (readiness) : 503 tant que le modèle par défaut n'est pas chargé et préchauffé.
+# Les enregistrements d'audit perdus y sont signalés (sans rendre le service indisponible)
+@app.get("/ready", tags=["Statut"])
+async def ready():
+    pret = demarrage_termine and registry.active_version is not None
+    contenu = {"ready": pret, "active_model": registry.active_version, "timings": TEMPS_DEMARRAGE}
+    if journal_audit.enabled:
+        contenu["audit"] = {"policy": journal_audit.policy, "dropped": journal_audit.dropped,
+                            "failed": journal_audit.failed}
+    if not pret:
+        return JSONResponse(status_code=503, content=contenu, headers={"Retry-After": "1"})
+    return contenu
+
+# Paramètre de requête commun pour épingler une version de modèle
+PARAMETRE_MODELE = Query(None, alias="model", description="Version de modèle (ex. random_forest_20250323)")
+PARAMETRE_EXPLICATION = Query(False, alias="explain",
+                              description="Ajouter les contributions des caractéristiques à chaque prédiction du modèle")
 
 # Route pour la prédiction d'éligibilité
-@app.post("/predict", response_model=PredictionOutput, tags=["Prédiction"])
-async def predict(donneur: DonneurInput):
-    # Convertir le modèle Pydantic en dictionnaire
-    input_data = donneur.dict()
-    
-    # Faire la prédiction
-    result = predict_eligibility(input_data)
-    
-    return PredictionOutput(
-        prediction=result["prediction"],
-        confidence=result["confidence"],
-        facteurs_importants=result["facteurs_importants"],
-        raison_ineligibilite=result["raison_ineligibilite"]
-    )
+# (le champ `explication` n'apparaît que s'il a été demandé ; réponse sérialisée sans revalidation, voir ReponseJSON)
+@app.post("/predict", response_model=PredictionOutput, response_class=ReponseJSON, tags=["Prédiction"])
+async def predict(donneur: DonneurInput, requete: Request, nom_modele: Optional[str] = PARAMETRE_MODELE,
+                  expliquer: bool = PARAMETRE_EXPLICATION):
+    # Temps passé avant la route : lecture du corps, décodage JSON et validation Pydantic
+    validation = elapsed_since(requete.scope)
+    if validation is not None:
+        ETAPES["predict", "validation"].observe(validation)
+    
+    # Champs du modèle Pydantic validé, sans copie (dictionnaire de ses attributs)
+    input_data = vars(donneur)
+    
+    # Version résolue ici : celle qui est journalisée est celle qui a servi
+    version = obtenir_modele(nom_modele).version
+    
+    # Faire la prédiction (inférence déléguée au planificateur)
+    result = await predict_eligibility_async(input_data, version, expliquer)
+    
+    # Journal d'audit : simple dépôt dans la file, l'écriture se fait en arrière-plan
+    await journal_audit.submit({"ts": time.time(), "request": uuid.uuid4().hex, "endpoint": "predict",
+                                "model": version, "input": input_data, "output": result})
+    
+    # Suivi de la dérive : même principe, les esquisses sont mises à jour par le thread du moniteur
+    moniteur_derive.submit(input_data, result)
+    
+    # Notation en ombre par le modèle candidat, après coup : la réponse n'attend pas
+    if notateur_ombre.enabled and notateur_ombre.version != version:
+        notateur_ombre.schedule(input_data, result)
+    
+    return ReponseJSON(result)
+
+# Route pour la prédiction d'éligibilité d'une liste de donneurs
+@app.post("/predict/batch", response_model=List[PredictionOutput], response_class=ReponseJSON, tags=["Prédiction"])
+async def predict_batch(donneurs: List[DonneurInput], requete: Request,
+                        nom_modele: Optional[str] = PARAMETRE_MODELE, expliquer: bool = PARAMETRE_EXPLICATION):
+    validation = elapsed_since(requete.scope)
+    if validation is not None:
+        ETAPES["batch", "validation"].observe(validation)
+    TAILLE_LOTS_REQUETE.labels().observe(len(donneurs))
+    
+    # Champs des modèles Pydantic validés, sans copie
+    inputs = [vars(donneur) for donneur in donneurs]
+    
+    # Résoudre la version ici : la même version sert tout le lot
+    version = obtenir_modele(nom_modele).version
+    
+    # Faire les prédictions dans le pool d'inférence (résultats dans l'ordre des entrées)
+    try:
+        results = await inference_scheduler.run(predict_eligibility_batch, inputs, version, expliquer)
+    except FileAttentePleine:
+        raise HTTPException(status_code=503, detail="Service saturé, veuillez réessayer",
+                            headers={"Retry-After": "1"})
+    
+    # Un enregistrement d'audit par donneur, reliés par l'identifiant de la requête, déposés en une fois
+    if journal_audit.enabled:
+        ts, identifiant = time.time(), uuid.uuid4().hex
+        await journal_audit.submit_many([{"ts": ts, "request": identifiant, "endpoint": "batch",
+                                          "model": version, "input": input_data, "output": result}
+                                         for input_data, result in zip(inputs, results)])
+    if moniteur_derive.running:
+        for input_data, result in zip(inputs, results):
+            moniteur_derive.submit(input_data, result)
+    
+    return ReponseJSON(results)
+
+# Route des métriques au format texte Prometheus
+@app.get("/metrics", tags=["Statut"], response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metriques.render(), media_type=MetricsRegistry.CONTENT_TYPE)
+
+# Réponse en flux dont le générateur lit lui-même le corps de la requête
+class ReponseFlux(StreamingResponse):
+    async def __call__(self, scope, receive, send):
+        # Pas d'écoute de la déconnexion en parallèle : elle consommerait les messages du corps
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+# Route pour noter un registre complet envoyé en NDJSON ou CSV (résultats en NDJSON, au fil de l'eau)
+@app.post(
+    "/predict/stream",
+    tags=["Prédiction"],
+    response_class=ReponseFlux,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string", "description": "Un donneur JSON par ligne"}},
+                "text/csv": {"schema": {"type": "string",
+                                        "description": "En-tête avec les noms des champs, puis un donneur par ligne"}},
+            },
+        },
+        "responses": {"200": {"description": "Une ligne JSON par donneur (`line`, `id` éventuel, "
+                                             "prédiction ou `error`)",
+                              "content": {"application/x-ndjson": {}}}},
+    },
+)
+async def predict_stream(requete: Request, nom_modele: Optional[str] = PARAMETRE_MODELE,
+                         expliquer: bool = PARAMETRE_EXPLICATION,
+                         format_entree: Optional[str] = Query(None, alias="format",
+                                                              description="ndjson ou csv (par défaut : Content-Type)")):
+    # Version résolue avant de commencer la réponse : tout le flux est noté par le même modèle
+    modele = obtenir_modele(nom_modele)
+    if expliquer:
+        verifier_explications(modele)
+    version = modele.version
+    try:
+        parser = RecordParser(format_entree or detect_format(requete.headers.get("content-type")))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Admission vérifiée avant de commencer la réponse ; une fois admis, le flux attend sa place
+    # pour chaque tranche (lecture du corps ralentie) au lieu d'être coupé en cours de route
+    try:
+        inference_scheduler.admit()
+    except FileAttentePleine:
+        raise HTTPException(status_code=503, detail="Service saturé, veuillez réessayer",
+                            headers={"Retry-After": "1"})
+    
+    # Le corps est lu, validé et noté par tranches : seule la tranche en cours est en mémoire.
+    # Les résultats partent pendant l'envoi : le client doit lire la réponse au fil de l'eau
+    # (ex. curl -T registre.ndjson) ; sinon utiliser `python main.py score` hors ligne.
+    # Comme /predict/batch : un enregistrement d'audit par ligne notée (le suivi de la dérive est
+    # alimenté par noter_tranche), et notation en ombre des mêmes donneurs
+    identifiant = uuid.uuid4().hex
+    
+    async def noter(tranche: List[Record]) -> bytes:
+        contenu, _, notes = await inference_scheduler.run(noter_tranche, tranche, version, expliquer, block=True)
+        if notes and journal_audit.enabled:
+            ts = time.time()
+            await journal_audit.submit_many([{"ts": ts, "request": identifiant, "endpoint": "stream",
+                                              "model": version, "input": input_data, "output": result}
+                                             for input_data, result in notes])
+        if notes and notateur_ombre.enabled and notateur_ombre.version != version:
+            for input_data, result in notes:
+                notateur_ombre.schedule(input_data, result)
+        return contenu
+    
+    async def generer():
+        tranche: List[Record] = []
+        async for bloc in requete.stream():
+            for enregistrement in parser.feed(bloc):
+                tranche.append(enregistrement)
+                if len(tranche) >= STREAM_CHUNK_ROWS:
+                    contenu = await noter(tranche)
+                    tranche = []
+                    yield contenu
+        tranche.extend(parser.close())
+        if tranche:
+            yield await noter(tranche)
+    
+    return ReponseFlux(generer(), media_type="application/x-ndjson")
+
+# Route pour consulter les statistiques du cache de prédictions
+@app.get("/cache/stats", tags=["Informations"])
+async def get_cache_stats():
+    return prediction_cache.stats()
+
+# Route pour consulter le limiteur de débit (règles, décisions, clients les plus limités)
+@app.get("/rate-limit/stats", tags=["Informations"])
+async def get_rate_limit_stats():
+    return limiteur.stats()
+
+# Route de suivi de la dérive : données récentes comparées à la référence (PSI par champ, nouvelles
+# valeurs catégorielles, taux de rejet par les règles, distribution de la confiance)
+@app.get("/monitoring/drift", tags=["Statut"])
+async def get_drift():
+    return await moniteur_derive.call(moniteur_derive.report)
+
+# Route pour figer les données récentes comme nouvelle référence de dérive
+@app.post("/monitoring/drift/baseline", tags=["Statut"], dependencies=[Depends(verifier_admin)])
+async def freeze_drift_baseline():
+    if not moniteur_derive.running:
+        raise HTTPException(status_code=404, detail="Suivi de la dérive désactivé (DRIFT_MONITOR=0)")
+    try:
+        return await moniteur_derive.call(moniteur_derive.freeze_baseline)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Écriture de la référence impossible: {e}")
+
+# Route pour lister les versions de modèle disponibles
+@app.get("/models", tags=["Informations"])
+async def get_models():
+    return {"active": registry.active_version, "models": registry.status()}
+
+# Route pour rescanner le dossier des modèles et charger les nouveaux artefacts en arrière-plan
+@app.post("/models/reload", tags=["Informations"], dependencies=[Depends(verifier_admin)])
+async def reload_models():
+    registry.refresh(background=True)
+    return {"active": registry.active_version, "models": registry.status()}
+
+# Route pour changer de modèle actif sans interruption
+@app.post("/models/{nom_modele}/activate", tags=["Informations"], dependencies=[Depends(verifier_admin)])
+async def activate_model(nom_modele: str):
+    try:
+        version = registry.resolve(nom_modele)
+        registry.activate(version)
+    except ModeleInconnu:
+        raise HTTPException(status_code=404, detail=f"Modèle inconnu: {nom_modele}")
+    except ModeleIndisponible:
+        raise HTTPException(status_code=409, detail=f"Modèle pas encore chargé: {nom_modele}")
+    return {"active": registry.active_version}
+
+# Routes de la notation en ombre : statistiques, choix du modèle candidat, désactivation
+@app.get("/models/shadow", tags=["Informations"])
+async def get_shadow():
+    return notateur_ombre.stats()
+
+@app.post("/models/{nom_modele}/shadow", tags=["Informations"], dependencies=[Depends(verifier_admin)])
+async def shadow_model(nom_modele: str,
+                       taux: Optional[float] = Query(None, alias="sample_rate", ge=0.0, le=1.0,
+                                                     description="Part des requêtes notées en ombre")):
+    try:
+        version = registry.resolve(nom_modele)
+    except ModeleInconnu:
+        raise HTTPException(status_code=404, detail=f"Modèle inconnu: {nom_modele}")
+    try:
+        registry.get(version)
+    except ModeleIndisponible:
+        # Les évaluations échouent (comptées dans `errors`) tant que le chargement n'est pas terminé
+        registry.load_in_background([version])
+    notateur_ombre.configure(version, taux)
+    return notateur_ombre.stats()
+
+@app.delete("/models/shadow", tags=["Informations"], dependencies=[Depends(verifier_admin)])
+async def disable_shadow():
+    notateur_ombre.configure(None)
+    return notateur_ombre.stats()
 
 # Route pour obtenir la liste des caractéristiques attendues par le modèle
+# (corps pré-encodé au chargement, 304 si le client a déjà cette version)
 @app.get("/features", tags=["Informations"])
-async def get_features():
-    # Si le modèle n'est pas chargé, essayer de le charger
-    if model is None:
-        if not load_model():
-            raise HTTPException(status_code=500, detail="Modèle non disponible")
-    
-    return {"features": required_columns}
+async def get_features(request: Request, nom_modele: Optional[str] = PARAMETRE_MODELE):
+    modele = obtenir_modele(nom_modele)
+    return modele.static_responses["features"].respond(request)
 
-# Route pour obtenir des informations sur le modèle
+# Route pour obtenir des informations sur le modèle (fichier d'info lu une seule fois, au chargement)
 @app.get("/model-info", tags=["Informations"])
-async def get_model_info():
-    # Si le modèle n'est pas chargé, essayer de le charger
-    if model is None:
-        if not load_model():
-            raise HTTPException(status_code=500, detail="Modèle non disponible")
-    
-    # Charger les informations du modèle si disponibles
-    if os.path.exists(MODEL_INFO_PATH):
-        import json
-        with open(MODEL_INFO_PATH, 'r') as f:
-            model_info = json.load(f)
-        return model_info
-    else:
-        return {
-            "model_name": "gradient_boosting",
-            "version": "1.0.0",
-            "features": required_columns
-        }
+async def get_model_info(request: Request, nom_modele: Optional[str] = PARAMETRE_MODELE):
+    modele = obtenir_modele(nom_modele)
+    return modele.static_responses["model-info"].respond(request)
 
 # Chargement du modèle au démarrage de l'application
 @app.on_event("startup")
 async def startup_event():
-    load_model()
+    global demarrage_termine
+    debut = time.perf_counter()
+    
+    # Le modèle par défaut est chargé (et préchauffé) tout de suite, les autres versions en arrière-plan
+    if load_model():
+        modele = registry.get()
+        TEMPS_DEMARRAGE.update(model=modele.version, format=modele.format, engine=modele.engine, **modele.timings)
+    registry.load_in_background([version for version in registry.artifacts if version != registry.active_version])
+    await inference_scheduler.start()
+    await journal_audit.start()
+    await moniteur_derive.start()
+    if notateur_ombre.enabled:
+        try:
+            notateur_ombre.configure(registry.resolve(notateur_ombre.version))
+            print(f"Notation en ombre avec {notateur_ombre.version} ({notateur_ombre.sample_rate:.0%} des requêtes)")
+        except ModeleInconnu:
+            print(f"Modèle de la notation en ombre inconnu: {notateur_ombre.version} (désactivée)")
+            notateur_ombre.configure(None)
+    
+    preparer_documentation()
+    TEMPS_DEMARRAGE["startup_s"] = time.perf_counter() - debut
+    demarrage_termine = True
+    print(f"Service prêt en {TEMPS_DEMARRAGE['startup_s']:.2f} s: {TEMPS_DEMARRAGE}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global demarrage_termine
+    demarrage_termine = False
+    await notateur_ombre.stop()
+    await inference_scheduler.stop()
+    await journal_audit.stop()
+    await moniteur_derive.stop()
+
+# Schéma OpenAPI et pages de documentation pré-encodés, construits une fois (au démarrage ou au
+# premier appel) : ni le schéma ni le HTML ne sont régénérés ou resérialisés à chaque requête
+# (la route /openapi.json de FastAPI, désactivée, resérialiserait le schéma à chaque appel)
+OPENAPI_URL = "/openapi.json"
+DOCUMENTATION: Dict[str, StaticResponse] = {}
+
+def preparer_documentation() -> Dict[str, StaticResponse]:
+    if not DOCUMENTATION:
+        from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+        DOCUMENTATION["openapi"] = StaticResponse.json(app.openapi(), DOCS_CACHE_CONTROL)
+        DOCUMENTATION["docs"] = StaticResponse.from_response(get_swagger_ui_html(
+            openapi_url=OPENAPI_URL,
+            title=app.title + " - Documentation API",
+            oauth2_redirect_url=app.swagger_ui_oauth2_redirect_url,
+            swagger_js_url="https://cdn.jsdelivr.net/npm/swagger-ui-dist@4.1.3/swagger-ui-bundle.js",
+            swagger_css_url="https://cdn.jsdelivr.net/npm/swagger-ui-dist@4.1.3/swagger-ui.css",
+        ), DOCS_CACHE_CONTROL)
+        DOCUMENTATION["redoc"] = StaticResponse.from_response(get_redoc_html(
+            openapi_url=OPENAPI_URL,
+            title=app.title + " - Documentation ReDoc",
+            redoc_js_url="https://cdn.jsdelivr.net/npm/redoc@next/bundles/redoc.standalone.js",
+        ), DOCS_CACHE_CONTROL)
+    return DOCUMENTATION
+
+@app.get(OPENAPI_URL, include_in_schema=False)
+async def openapi_json(request: Request):
+    return preparer_documentation()["openapi"].respond(request)
 
 @app.get("/docs", include_in_schema=False)
-async def custom_swagger_ui_html():
-    return get_swagger_ui_html(
-        openapi_url=app.openapi_url,
-        title=app.title + " - Documentation API",
-        oauth2_redirect_url=app.swagger_ui_oauth2_redirect_url,
-        swagger_js_url="https://cdn.jsdelivr.net/npm/swagger-ui-dist@4.1.3/swagger-ui-bundle.js",
-        swagger_css_url="https://cdn.jsdelivr.net/npm/swagger-ui-dist@4.1.3/swagger-ui.css",
-    )
+async def custom_swagger_ui_html(request: Request):
+    return preparer_documentation()["docs"].respond(request)
 
 @app.get("/redoc", include_in_schema=False)
-async def redoc_html():
-    return get_redoc_html(
-        openapi_url=app.openapi_url,
-        title=app.title + " - Documentation ReDoc",
-        redoc_js_url="https://cdn.jsdelivr.net/npm/redoc@next/bundles/redoc.standalone.js",
-    )
+async def redoc_html(request: Request):
+    return preparer_documentation()["redoc"].respond(request)
 
 # Fonction custom pour personnaliser OpenAPI (optionnel)
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
     
+    from fastapi.openapi.utils import get_openapi
     openapi_schema = get_openapi(
         title=app.title,
         version=app.version,
@@ -555,8 +1778,84 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+# Exporter les versions au format compact (à lancer au build de l'image, avant MODEL_FORMAT=compact)
+def exporter_modeles(noms: Optional[List[str]] = None) -> List[str]:
+    registry.scan()
+    versions = [registry.resolve(nom) for nom in noms] if noms else list(registry.artifacts)
+    chemins = []
+    for version in versions:
+        modele = charger_version(registry.artifacts[version], engine="compiled", model_format="pickle")
+        chemin = exporter_version(modele)
+        if chemin:
+            chemins.append(chemin)
+    return chemins
+
+# Charger toutes les versions dans le processus maître avant de forker les workers (WORKERS > 1) :
+# l'événement startup de chaque worker retrouve les modèles déjà chargés et n'en recharge aucun
+def precharger_modeles() -> None:
+    if not load_model():
+        return
+    for version in registry.artifacts:
+        try:
+            registry.load(version)
+        except ModeleIndisponible:
+            continue
+    # Tables de décision terminées avant le fork : les workers en héritent au lieu de les recalculer
+    for version in registry.artifacts:
+        try:
+            thread = registry.get(version).decision_table_thread
+        except ModeleIndisponible:
+            continue
+        if thread is not None:
+            thread.join()
+
+TEMPS_DEMARRAGE["import_s"] = time.perf_counter() - _DEBUT_IMPORT
+
 # Lancement de l'application
 if __name__ == "__main__":
-    import uvicorn
+    import sys
+    if sys.argv[1:2] == ["export"]:
+        # python main.py export [version ...]
+        sys.exit(0 if exporter_modeles(sys.argv[2:]) else 1)
+    if sys.argv[1:2] == ["score"]:
+        # python main.py score registre.csv [-o resultats.ndjson] [--format csv] [--model version] [--explain]
+        import argparse
+        parser = argparse.ArgumentParser(prog="python main.py score", description="Notation hors ligne d'un registre")
+        parser.add_argument("input", help="fichier NDJSON ou CSV ('-' : entrée standard)")
+        parser.add_argument("-o", "--output", default="-", help="fichier NDJSON de résultats ('-' : sortie standard)")
+        parser.add_argument("--format", choices=["ndjson", "csv"], default=None)
+        parser.add_argument("--model", default=None, help="version de modèle")
+        parser.add_argument("--explain", action="store_true", help="ajouter les contributions des caractéristiques")
+        args = parser.parse_args(sys.argv[2:])
+        
+        # Les messages vont sur stderr : la sortie standard peut porter les résultats
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):
+            if not load_model():
+                sys.exit(1)
+            bilan = noter_fichier(args.input, args.output, args.format, args.model, expliquer=args.explain)
+            print(f"{bilan['rows']} lignes notées ({bilan['errors']} en erreur) avec {bilan['model']} "
+                  f"en {bilan['seconds']:.1f} s")
+        sys.exit(0)
+    
+    if sys.argv[1:2] == ["drift-baseline"]:
+        # python main.py drift-baseline registre.csv [--format csv] [--model version]
+        import argparse
+        parser = argparse.ArgumentParser(prog="python main.py drift-baseline",
+                                         description="Référence de dérive construite à partir d'un registre")
+        parser.add_argument("input", help="fichier NDJSON ou CSV ('-' : entrée standard)")
+        parser.add_argument("--format", choices=["ndjson", "csv"], default=None)
+        parser.add_argument("--model", default=None, help="version de modèle")
+        args = parser.parse_args(sys.argv[2:])
+        if not load_model():
+            sys.exit(1)
+        bilan = profiler_fichier(args.input, args.format, args.model)
+        print(f"Référence de dérive écrite: {bilan['baseline']} ({bilan['rows']} lignes, "
+              f"{bilan['errors']} en erreur, modèle {bilan['model']})")
+        sys.exit(0)
+    
+    # WORKERS > 1 : processus forkés d'un maître qui a déjà chargé les modèles (voir serving.py)
+    from serving import serve
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    sys.exit(serve(app, host="0.0.0.0", port=port, workers=int(os.environ.get("WORKERS", 1)),
+                   preload=precharger_modeles))
\ No newline at end of file
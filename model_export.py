@@ -0,0 +1,98 @@
+# model_export.py - Export compact d'une version de modèle (tableaux .npy projetés en mémoire)
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder, Source
+from tree_engine import CompiledModel
+
+# Incrémenté à chaque changement de disposition ou de contenu de l'export
+EXPORT_FORMAT = 4
+MANIFEST = "manifest.json"
+
+
+def export_path(directory: str, version: str) -> str:
+    return os.path.join(directory, version)
+
+
+def export_model(directory: str, version: str, source_hash: str, encoder: FeatureEncoder,
+                 compiled: CompiledModel, model_info: Optional[Dict[str, Any]],
+                 required_columns: List[str], verification: Optional[Dict[str, Any]] = None) -> str:
+    """Écrit l'encodeur et les arbres compilés d'une version dans `<directory>/<version>/`.
+
+    Le manifeste JSON décrit l'encodeur et le moteur ; les tableaux sont des `.npy` bruts,
+    rechargés sans scikit-learn ni pandas. `source_hash` est le condensé du `.pkl` d'origine :
+    un export dont le pickle a changé est ignoré au chargement. `verification` (comparaison
+    du moteur compacté avec le pipeline d'origine) est conservé tel quel dans le manifeste.
+    """
+    os.makedirs(directory, exist_ok=True)
+    target = export_path(directory, version)
+    staging = tempfile.mkdtemp(prefix=f".{version}-", dir=directory)
+    try:
+        np.save(os.path.join(staging, "template.npy"), encoder.template)
+        for name, array in compiled.arrays().items():
+            np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+        manifest = {
+            "format": EXPORT_FORMAT,
+            "version": version,
+            "source_hash": source_hash,
+            "model_info": model_info,
+            "required_columns": list(required_columns),
+            "verification": verification,
+            "encoder": encoder.get_state(),
+            "engine": {
+                "n_features": compiled.n_features,
+                "max_depth": compiled.max_depth,
+                "init_raw": compiled.init_raw,
+                "classes": np.asarray(compiled.classes_).tolist(),
+            },
+        }
+        with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        # Remplacer l'export précédent d'un bloc (un lecteur voit l'ancien ou le nouveau)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+def load_export(directory: str, version: str, sources: Dict[str, Source],
+                source_hash: Optional[str] = None, mmap_mode: Optional[str] = "r",
+                vocabulary_options: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Recharge un export : renvoie None s'il est absent, d'un autre format ou périmé.
+
+    Les tableaux sont projetés en mémoire (`mmap_mode='r'`) : seules les pages lues sont
+    chargées et elles sont partagées entre les processus qui servent la même version.
+    """
+    path = export_path(directory, version)
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != EXPORT_FORMAT:
+        return None
+    if source_hash is not None and manifest.get("source_hash") != source_hash:
+        return None
+
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+              for name in CompiledModel.ARRAYS}
+    engine = manifest["engine"]
+    return {
+        "model_info": manifest["model_info"],
+        "required_columns": manifest["required_columns"],
+        "verification": manifest.get("verification"),
+        "encoder": FeatureEncoder.from_state(manifest["encoder"],
+                                             np.load(os.path.join(path, "template.npy")), sources,
+                                             vocabulary_options),
+        "compiled": CompiledModel.from_arrays(arrays, engine["n_features"], engine["max_depth"],
+                                              engine["init_raw"], engine["classes"]),
+    }
@@ -0,0 +1,278 @@
+# model_registry.py - Registre des versions de modèle (chargement en arrière-plan, bascule atomique)
+import csv
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# eligibility_model_<nom>_<AAAAMMJJ>_<HHMMSS>.pkl
+ARTIFACT_PATTERN = re.compile(r"^eligibility_model_(?P<name>.+)_(?P<timestamp>\d{8}_\d{6})\.pkl$")
+
+
+class ModeleInconnu(KeyError):
+    """Aucune version de modèle ne correspond au nom demandé."""
+
+
+class ModeleIndisponible(Exception):
+    """La version demandée existe mais n'est pas (encore) chargée."""
+
+
+class ModelArtifact:
+    """Fichiers d'une version de modèle dans le dossier des modèles."""
+
+    def __init__(self, name: str, timestamp: str, model_path: str,
+                 info_path: Optional[str] = None, metrics: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.timestamp = timestamp
+        self.model_path = model_path
+        self.info_path = info_path
+        self.metrics = metrics or {}
+        self._content_hash: Optional[tuple] = None
+
+    @property
+    def version(self) -> str:
+        return f"{self.name}_{self.timestamp}"
+
+    def signature(self) -> str:
+        """Signature de l'artefact sur disque (chemin, taille, date de modification)."""
+        try:
+            stat = os.stat(self.model_path)
+            return f"{os.path.abspath(self.model_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            return os.path.abspath(self.model_path)
+
+    def content_hash(self) -> str:
+        """Condensé du contenu de l'artefact (stable à la copie, recalculé s'il est modifié)."""
+        signature = self.signature()
+        if self._content_hash is None or self._content_hash[0] != signature:
+            digest = hashlib.blake2b(digest_size=16)
+            with open(self.model_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            self._content_hash = (signature, digest.hexdigest())
+        return self._content_hash[1]
+
+
+def _read_comparison(path: str) -> Dict[str, Dict[str, Any]]:
+    # model_comparison_<horodatage>.csv : une ligne de métriques par modèle entraîné
+    metrics: Dict[str, Dict[str, Any]] = {}
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name = row.pop("Model", None)
+                if name:
+                    metrics[name] = {key: float(value) for key, value in row.items() if value not in (None, "")}
+    except (OSError, ValueError) as e:
+        print(f"Lecture impossible de {path}: {e}")
+    return metrics
+
+
+def scan_artifacts(directory: str) -> Dict[str, ModelArtifact]:
+    """Recense les `eligibility_model_*.pkl` et leurs `model_info_*.json` associés."""
+    artifacts: Dict[str, ModelArtifact] = {}
+    comparisons: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for model_path in sorted(glob.glob(os.path.join(directory, "eligibility_model_*.pkl"))):
+        match = ARTIFACT_PATTERN.match(os.path.basename(model_path))
+        if not match:
+            continue
+        name, timestamp = match.group("name"), match.group("timestamp")
+        info_path = os.path.join(directory, f"model_info_{timestamp}.json")
+        if timestamp not in comparisons:
+            comparisons[timestamp] = _read_comparison(os.path.join(directory, f"model_comparison_{timestamp}.csv"))
+        artifact = ModelArtifact(name, timestamp, model_path,
+                                 info_path if os.path.exists(info_path) else None,
+                                 comparisons[timestamp].get(name))
+        artifacts[artifact.version] = artifact
+    return artifacts
+
+
+class ModelRegistry:
+    """Registre des versions de modèle disponibles dans un dossier.
+
+    `loader(artifact, **options)` construit l'objet servi pour une version (pipeline, encodeur...).
+    Les versions sont chargées en arrière-plan ; la version active est une simple
+    référence remplacée d'un bloc, les requêtes en cours gardent celle qu'elles ont lue.
+    """
+
+    def __init__(self, directory: str, loader: Callable[[ModelArtifact], Any], default: Optional[str] = None,
+                 on_change: Optional[Callable[[str], None]] = None):
+        self.directory = directory
+        self.loader = loader
+        self.default = default
+        # Appelé avec la version lorsque la version active change ou qu'une version chargée est remplacée
+        self.on_change = on_change
+
+        self.artifacts: Dict[str, ModelArtifact] = {}
+        self._loaded: Dict[str, Any] = {}
+        self._signatures: Dict[str, str] = {}
+        self._status: Dict[str, str] = {}
+        self._errors: Dict[str, str] = {}
+        self._active: Optional[str] = None
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Résolution des noms
+    # ------------------------------------------------------------------
+    def scan(self) -> Dict[str, ModelArtifact]:
+        artifacts = scan_artifacts(self.directory)
+        with self._lock:
+            self.artifacts = artifacts
+            for version in artifacts:
+                self._status.setdefault(version, "disponible")
+        return artifacts
+
+    def resolve(self, name: Optional[str] = None) -> str:
+        """Version exacte, préfixe (`random_forest_20250323`) ou nom (`xgboost`) -> clé de version.
+
+        Sans nom, renvoie la version active. Entre plusieurs candidats, la plus récente l'emporte.
+        """
+        with self._lock:
+            if not name:
+                if self._active is None:
+                    raise ModeleIndisponible("Aucun modèle actif")
+                return self._active
+            if name in self.artifacts:
+                return name
+            candidates = [version for version in self.artifacts if version.startswith(name)]
+            if not candidates:
+                raise ModeleInconnu(name)
+            return max(candidates, key=lambda version: self.artifacts[version].timestamp)
+
+    def default_version(self) -> Optional[str]:
+        try:
+            return self.resolve(self.default) if self.default else None
+        except ModeleInconnu:
+            pass
+        if not self.artifacts:
+            return None
+        return max(self.artifacts, key=lambda version: self.artifacts[version].timestamp)
+
+    # ------------------------------------------------------------------
+    # Chargement
+    # ------------------------------------------------------------------
+    def load(self, version: str, **options: Any) -> Any:
+        """Charge (ou recharge si l'artefact a changé) une version de façon synchrone.
+
+        Les `options` sont transmises au loader et forcent le rechargement.
+        """
+        artifact = self.artifacts[version]
+        signature = artifact.signature()
+        with self._lock:
+            if not options and version in self._loaded and self._signatures.get(version) == signature:
+                return self._loaded[version]
+            self._status[version] = "chargement"
+
+        start = time.perf_counter()
+        try:
+            loaded = self.loader(artifact, **options)
+        except Exception as e:
+            with self._lock:
+                self._status[version] = "erreur"
+                self._errors[version] = str(e)
+            print(f"Erreur lors du chargement du modèle {version}: {e}")
+            raise ModeleIndisponible(version) from e
+
+        with self._lock:
+            replaced = version in self._loaded
+            self._loaded[version] = loaded
+            self._signatures[version] = signature
+            self._status[version] = "chargé"
+            self._errors.pop(version, None)
+        print(f"Modèle {version} chargé en {time.perf_counter() - start:.2f} s")
+        if replaced and self.on_change is not None:
+            self.on_change(version)
+        return loaded
+
+    def load_in_background(self, versions: Optional[List[str]] = None,
+                           activate: Optional[str] = None) -> threading.Thread:
+        """Charge les versions dans un thread ; active `activate` dès qu'elle est prête."""
+        versions = list(versions if versions is not None else self.artifacts)
+        if activate and activate in versions:
+            # Charger d'abord la version à activer
+            versions.remove(activate)
+            versions.insert(0, activate)
+
+        def run():
+            if activate and activate not in versions and activate in self._loaded:
+                self.activate(activate)
+            for version in versions:
+                try:
+                    self.load(version)
+                except ModeleIndisponible:
+                    continue
+                if version == activate:
+                    self.activate(version)
+
+        thread = threading.Thread(target=run, name="model-registry-loader", daemon=True)
+        self._thread = thread
+        thread.start()
+        return thread
+
+    def refresh(self, background: bool = True) -> Optional[threading.Thread]:
+        """Rescanne le dossier et (re)charge les artefacts nouveaux ou modifiés."""
+        self.scan()
+        with self._lock:
+            changed = [version for version, artifact in self.artifacts.items()
+                       if self._signatures.get(version) != artifact.signature()]
+            # Une version active rechargée reste active ; sinon activer la version par défaut
+            activate = self._active if self._active in changed else None
+            if self._active is None or self._active not in self.artifacts:
+                activate = self.default_version()
+        if background:
+            return self.load_in_background(changed, activate=activate)
+        for version in changed:
+            try:
+                self.load(version)
+            except ModeleIndisponible:
+                continue
+        if activate:
+            self.activate(activate)
+        return None
+
+    def activate(self, version: str) -> Any:
+        """Bascule atomiquement la version active (la version doit être chargée)."""
+        with self._lock:
+            if version not in self._loaded:
+                raise ModeleIndisponible(version)
+            previous, self._active = self._active, version
+        print(f"Modèle actif: {version}")
+        if previous is not None and previous != version and self.on_change is not None:
+            self.on_change(version)
+        return self._loaded[version]
+
+    # ------------------------------------------------------------------
+    # Accès
+    # ------------------------------------------------------------------
+    @property
+    def active_version(self) -> Optional[str]:
+        return self._active
+
+    def get(self, name: Optional[str] = None) -> Any:
+        """Objet chargé pour une version (la version active par défaut)."""
+        version = self.resolve(name)
+        loaded = self._loaded.get(version)
+        if loaded is None:
+            raise ModeleIndisponible(version)
+        return loaded
+
+    def status(self) -> List[Dict[str, Any]]:
+        # Noms de fichiers seulement : la liste est publique (GET /models), le chemin du dossier ne l'est pas
+        with self._lock:
+            return [
+                {
+                    "version": version,
+                    "name": artifact.name,
+                    "timestamp": artifact.timestamp,
+                    "status": self._status.get(version, "disponible"),
+                    "active": version == self._active,
+                    "model_file": os.path.basename(artifact.model_path),
+                    "info_file": os.path.basename(artifact.info_path) if artifact.info_path else None,
+                    "metrics": artifact.metrics,
+                    "error": self._errors.get(version),
+                }
+                for version, artifact in sorted(self.artifacts.items())
+            ]
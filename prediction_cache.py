@@ -0,0 +1,101 @@
+# prediction_cache.py - Cache LRU/TTL des probabilités du modèle
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class PredictionCache:
+    """Cache borné (LRU + durée de vie) des probabilités, indexé par la ligne encodée.
+
+    La clé combine la signature de l'artefact du modèle et un condensé de la ligne de
+    caractéristiques : un artefact modifié ou une autre version ne retrouve jamais les
+    entrées d'un autre modèle, et `invalidate` les supprime.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "PredictionCache":
+        """Construit le cache à partir de PREDICTION_CACHE_SIZE (0 = désactivé) et PREDICTION_CACHE_TTL."""
+        return cls(
+            max_size=int(os.environ.get("PREDICTION_CACHE_SIZE", 10000)),
+            ttl_seconds=float(os.environ.get("PREDICTION_CACHE_TTL", 3600)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def key(self, row: Any, signature: str = "") -> Optional[bytes]:
+        """Clé canonique d'une ligne encodée pour un modèle (None si la ligne n'est pas un vecteur NumPy)."""
+        if not self.enabled or not isinstance(row, np.ndarray):
+            return None
+        digest = hashlib.blake2b(np.ascontiguousarray(row).tobytes(), digest_size=16)
+        digest.update(signature.encode("utf-8"))
+        return digest.digest()
+
+    def get(self, key: Optional[bytes]) -> Optional[Any]:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Optional[bytes], value: Any) -> None:
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Vide le cache (ex. lorsqu'un artefact déjà servi est rechargé)."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
@@ -0,0 +1,237 @@
+# rate_limit.py - Limitation de débit par client (seaux à jetons en mémoire) et plafond d'inférences simultanées
+import hashlib
+import json
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Limites par défaut (préfixe de route -> (requêtes par seconde, rafale)) : lot et flux plus stricts,
+# le reste de l'API (/, /models, /features...) plus souple
+DEFAULT_RULES = "/predict/batch=2/10,/predict/stream=1/2,/predict=20/40,/=50/100"
+
+# Routes jamais limitées (sondes et collecte des métriques)
+DEFAULT_EXEMPT = "/metrics,/ready"
+
+
+def parse_rules(text: str) -> Dict[str, Tuple[float, float]]:
+    """Lit des limites « /route=débit/rafale, ... » (débit en requêtes par seconde)."""
+    rules: Dict[str, Tuple[float, float]] = {}
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            prefix, limit = item.rsplit("=", 1)
+            rate, _, burst = limit.partition("/")
+            rate = float(rate)
+            burst = float(burst) if burst else max(1.0, rate)
+        except ValueError:
+            raise ValueError(f"Limite de débit invalide: {item!r} (attendu: /route=débit/rafale)")
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Limite de débit invalide: {item!r} (débit > 0, rafale >= 1)")
+        rules["/" + prefix.strip().strip("/")] = (rate, burst)
+    return rules
+
+
+class RateLimiter:
+    """Seau à jetons par client et par règle, et plafond global de requêtes d'inférence en cours.
+
+    Un client est identifié par sa clé d'API (en-tête `key_header`, conservée sous forme
+    de condensé) si elle fait partie de `api_keys` ; une clé inconnue est ignorée (sinon
+    chaque requête pourrait choisir son propre seau). À défaut, le client est son adresse
+    IP : avec `trust_proxy` mandataires de confiance devant le service, le saut de
+    X-Forwarded-For ajouté par le plus externe d'entre eux (le `trust_proxy`-ième en
+    partant de la droite ; ceux de gauche sont fournis par le client), sinon l'adresse de
+    la connexion. La règle d'une requête est celle du plus long préfixe de route qui
+    correspond à son chemin ; chaque règle accorde `débit` requêtes par seconde avec des
+    rafales de `rafale` requêtes. Au plus `max_clients` seaux sont gardés (les moins
+    récemment utilisés sont oubliés : leur client repart avec un seau plein).
+
+    Indépendamment des seaux, au plus `max_in_flight` requêtes vers les routes
+    `inference_routes` sont traitées à la fois (0 : pas de plafond) ; au-delà, la requête
+    est refusée tout de suite plutôt que mise en attente.
+
+    Tout se passe sur la boucle d'événements : aucun verrou n'est nécessaire.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, Tuple[float, float]]] = None, enabled: bool = True,
+                 exempt: Sequence[str] = ("/metrics", "/ready"), key_header: str = "x-api-key",
+                 trust_proxy: int = 0, max_clients: int = 10000, max_in_flight: int = 0,
+                 inference_routes: Sequence[str] = ("/predict",), api_keys: Sequence[str] = ()):
+        self.rules = dict(rules if rules is not None else parse_rules(DEFAULT_RULES))
+        # Préfixes du plus long au plus court : le premier qui correspond l'emporte
+        self._prefixes = sorted(self.rules, key=len, reverse=True)
+        self.enabled = enabled
+        self.exempt = set(exempt)
+        self.key_header = key_header.lower().encode("latin-1")
+        self.trust_proxy = max(0, int(trust_proxy))
+        self.api_keys = {key.encode("latin-1") for key in api_keys if key}
+        self.max_clients = max(1, max_clients)
+        self.max_in_flight = max(0, max_in_flight)
+        self.inference_routes = tuple(inference_routes)
+        self.in_flight = 0
+
+        # (client, règle) -> [jetons, instant de la dernière mise à jour]
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._routes: Dict[str, Optional[str]] = {}
+        # Décisions par (règle, issue) et clients les plus souvent limités
+        self.counts: Counter = Counter()
+        self.limited_clients: Counter = Counter()
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Construit le limiteur à partir de RATE_LIMIT (1 : seaux actifs), RATE_LIMITS, RATE_LIMIT_EXEMPT,
+        RATE_LIMIT_KEY_HEADER, RATE_LIMIT_API_KEYS (clés reconnues, séparées par des virgules),
+        RATE_LIMIT_TRUST_PROXY (nombre de mandataires de confiance ; true : un seul),
+        RATE_LIMIT_MAX_CLIENTS et MAX_IN_FLIGHT (0 : sans plafond)."""
+        actif = ("1", "true", "oui", "yes")
+        mandataires = os.environ.get("RATE_LIMIT_TRUST_PROXY", "0").strip().lower()
+        return cls(
+            rules=parse_rules(os.environ.get("RATE_LIMITS", DEFAULT_RULES)),
+            enabled=os.environ.get("RATE_LIMIT", "0").lower() in actif,
+            exempt=[route.strip() for route in os.environ.get("RATE_LIMIT_EXEMPT", DEFAULT_EXEMPT).split(",")
+                    if route.strip()],
+            key_header=os.environ.get("RATE_LIMIT_KEY_HEADER", "x-api-key"),
+            trust_proxy=1 if mandataires in actif else int(mandataires) if mandataires.isdigit() else 0,
+            max_clients=int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", 10000)),
+            max_in_flight=int(os.environ.get("MAX_IN_FLIGHT", 0)),
+            api_keys=[key.strip() for key in os.environ.get("RATE_LIMIT_API_KEYS", "").split(",")],
+        )
+
+    @property
+    def active(self) -> bool:
+        return self.enabled or self.max_in_flight > 0
+
+    @property
+    def clients(self) -> int:
+        return len(self._buckets)
+
+    def route(self, path: str) -> Optional[str]:
+        """Règle (préfixe) applicable à un chemin, None si le chemin est exempté ou sans règle."""
+        try:
+            return self._routes[path]
+        except KeyError:
+            pass
+        rule = None
+        if path not in self.exempt:
+            for prefix in self._prefixes:
+                if prefix == "/" or path == prefix or path.startswith(prefix + "/"):
+                    rule = prefix
+                    break
+        # Chemins distincts en nombre borné dans le mémo (un balayage d'URL ne le fait pas grossir)
+        if len(self._routes) < 1024:
+            self._routes[path] = rule
+        return rule
+
+    def client(self, scope: Dict[str, Any]) -> str:
+        forwarded: List[str] = []
+        for name, value in scope.get("headers", ()):
+            if name == self.key_header and value in self.api_keys:
+                return "key:" + hashlib.blake2b(value, digest_size=8).hexdigest()
+            if name == b"x-forwarded-for" and self.trust_proxy:
+                # Plusieurs en-têtes : une seule liste, dans l'ordre
+                forwarded.extend(hop.strip() for hop in value.decode("latin-1").split(","))
+        hops = [hop for hop in forwarded if hop]
+        if hops:
+            # Moins de sauts que de mandataires : tous ont été ajoutés par eux, le premier est le client
+            return hops[-min(self.trust_proxy, len(hops))]
+        client = scope.get("client")
+        return client[0] if client else "inconnu"
+
+    def acquire(self, client: str, rule: str, now: Optional[float] = None) -> float:
+        """Prend un jeton dans le seau du client ; 0 si la requête passe, sinon l'attente en secondes."""
+        rate, burst = self.rules[rule]
+        now = time.monotonic() if now is None else now
+        key = (client, rule)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return 0.0
+        return (1.0 - bucket[0]) / rate
+
+    def record(self, rule: str, outcome: str, client: Optional[str] = None) -> None:
+        self.counts[rule, outcome] += 1
+        # Clients limités comptés dans la même borne que les seaux
+        if client is not None and (client in self.limited_clients or len(self.limited_clients) < self.max_clients):
+            self.limited_clients[client] += 1
+
+    def inference(self, path: str) -> bool:
+        return any(path == route or path.startswith(route + "/") for route in self.inference_routes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "rules": {prefix: {"rate": rate, "burst": burst} for prefix, (rate, burst) in self.rules.items()},
+            "clients": self.clients,
+            "max_clients": self.max_clients,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "requests": {f"{rule} {outcome}": count for (rule, outcome), count in sorted(self.counts.items())},
+            "top_limited_clients": dict(self.limited_clients.most_common(10)),
+        }
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI : applique un RateLimiter avant la route et répond 429 avec Retry-After.
+
+    Issues comptées par règle : allowed, limited (seau vide) et overloaded (plafond
+    d'inférences en cours atteint). Une requête d'inférence occupe sa place jusqu'à la fin
+    de sa réponse, flux compris.
+    """
+
+    def __init__(self, app: Any, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def _refuse(self, send: Callable, detail: str, retry_after: float) -> None:
+        body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+        await send({"type": "http.response.start", "status": 429,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode()),
+                                (b"retry-after", str(max(1, math.ceil(retry_after))).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        limiter = self.limiter
+        if scope["type"] != "http" or not limiter.active:
+            await self.app(scope, receive, send)
+            return
+        path = scope.get("path", "")
+        rule = limiter.route(path)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        if limiter.enabled:
+            client = limiter.client(scope)
+            attente = limiter.acquire(client, rule)
+            if attente > 0:
+                limiter.record(rule, "limited", client)
+                await self._refuse(send, "Trop de requêtes, veuillez ralentir", attente)
+                return
+
+        if limiter.max_in_flight and limiter.inference(path):
+            if limiter.in_flight >= limiter.max_in_flight:
+                limiter.record(rule, "overloaded")
+                await self._refuse(send, "Service saturé, veuillez réessayer", 1.0)
+                return
+            limiter.in_flight += 1
+            limiter.record(rule, "allowed")
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                limiter.in_flight -= 1
+            return
+
+        limiter.record(rule, "allowed")
+        await self.app(scope, receive, send)
@@ -0,0 +1,191 @@
+# rule_engine.py - Moteur de règles d'exclusion déclaratif, compilé pour un donneur ou un lot
+import operator
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Condition : nom de champ (vrai si le champ est vrai) ou (champ, opérateur, valeur)
+Condition = Union[str, Tuple[str, str, Any]]
+
+OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+# Opérateurs de comparaison d'ordre : la colonne du champ est numérique dans l'évaluation par lot
+ORDERING = {"<", "<=", ">", ">="}
+
+
+def _truthy(value: Any, _: Any) -> bool:
+    return bool(value)
+
+
+def _champs(record: Any) -> Mapping:
+    # Accepte un dictionnaire ou un DonneurInput validé
+    return record if isinstance(record, Mapping) else vars(record)
+
+
+class Rule:
+    """Règle d'exclusion : elle se déclenche si l'une des clauses de `when` est vraie,
+    une clause étant vraie si toutes ses conditions le sont."""
+
+    def __init__(self, id: str, reason: str, confidence: float, when: Sequence[Sequence[Condition]]):
+        self.id = id
+        self.reason = reason
+        self.confidence = float(confidence)
+        self.when = [[self._normalize(condition) for condition in clause] for clause in when]
+
+    @staticmethod
+    def _normalize(condition: Condition) -> Tuple[str, str, Any]:
+        if isinstance(condition, str):
+            return (condition, "truthy", None)
+        field, op, value = condition
+        if op not in OPERATORS:
+            raise ValueError(f"Opérateur non supporté: {op}")
+        return (field, op, value)
+
+    @classmethod
+    def from_dict(cls, definition: Dict[str, Any]) -> "Rule":
+        return cls(definition["id"], definition["reason"], definition["confidence"], definition["when"])
+
+    def result(self) -> Dict[str, Any]:
+        """Réponse de l'API pour un donneur écarté par cette règle."""
+        return {
+            "prediction": "Non éligible",
+            "confidence": self.confidence,
+            "facteurs_importants": [self.reason],
+            "raison_ineligibilite": self.reason,
+        }
+
+
+class RuleEngine:
+    """Évalue une liste ordonnée de règles (la première déclenchée l'emporte).
+
+    Les règles sont préparées une fois : en tests (champ, opérateur, valeur) parcourus
+    dans l'ordre pour un donneur seul, en masques NumPy calculés colonne par colonne pour
+    un lot. Chaque condition distincte n'est évaluée qu'une fois, même si plusieurs
+    règles la partagent.
+    `defaults` donne la valeur d'un champ absent (False pour un champ booléen, par exemple).
+    """
+
+    def __init__(self, rules: Sequence[Union[Rule, Dict[str, Any]]], defaults: Optional[Dict[str, Any]] = None):
+        self.rules = [rule if isinstance(rule, Rule) else Rule.from_dict(rule) for rule in rules]
+        self.defaults = dict(defaults or {})
+        ids = [rule.id for rule in self.rules]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Identifiants de règles en double")
+
+        # Conditions distinctes, et type de colonne de chaque champ pour l'évaluation par lot
+        self.conditions: List[Tuple[str, str, Any]] = []
+        operateurs: Dict[str, set] = {}
+        for rule in self.rules:
+            for clause in rule.when:
+                for condition in clause:
+                    if condition not in self.conditions:
+                        self.conditions.append(condition)
+                    operateurs.setdefault(condition[0], set()).add(condition[1])
+        self.fields: Dict[str, str] = {
+            field: "number" if ops & ORDERING else ("bool" if ops == {"truthy"} else "object")
+            for field, ops in operateurs.items()
+        }
+
+        # Indices des conditions de chaque clause, et test de chaque condition pour un donneur seul :
+        # (champ, fonction de comparaison, valeur comparée, valeur par défaut du champ)
+        self._clauses = [[[self.conditions.index(condition) for condition in clause] for clause in rule.when]
+                         for rule in self.rules]
+        self._checks = [(field, _truthy if op == "truthy" else OPERATORS[op], value, self.defaults.get(field))
+                        for field, op, value in self.conditions]
+
+    # ------------------------------------------------------------------
+    # Un donneur
+    # ------------------------------------------------------------------
+    def _first_one(self, champs: Mapping) -> int:
+        """Indice de la première règle vérifiée (-1 si aucune) ; les conditions ne sont calculées
+        qu'au besoin, et une seule fois chacune."""
+        get = champs.get
+        known: Dict[int, bool] = {}
+        for k, clauses in enumerate(self._clauses):
+            for clause in clauses:
+                for i in clause:
+                    result = known.get(i)
+                    if result is None:
+                        field, test, operand, default = self._checks[i]
+                        result = known[i] = bool(test(get(field, default), operand))
+                    if not result:
+                        break
+                else:
+                    return k
+        return -1
+
+    def _evaluate_one(self, champs: Mapping) -> List[int]:
+        """Indices de toutes les règles vérifiées (chaque condition distincte calculée une fois)."""
+        get = champs.get
+        results = [bool(test(get(field, default), operand)) for field, test, operand, default in self._checks]
+        fired = []
+        for k, clauses in enumerate(self._clauses):
+            for clause in clauses:
+                for i in clause:
+                    if not results[i]:
+                        break
+                else:
+                    fired.append(k)
+                    break
+        return fired
+
+    def first_match(self, record: Any) -> Optional[Rule]:
+        """Première règle déclenchée (les suivantes ne sont pas évaluées), ou None."""
+        k = self._first_one(_champs(record))
+        return self.rules[k] if k >= 0 else None
+
+    def evaluate(self, record: Any) -> Tuple[Optional[Rule], List[str]]:
+        """Règle retenue (la première déclenchée) et identifiants de toutes les règles déclenchées."""
+        fired = self._evaluate_one(_champs(record))
+        return (self.rules[fired[0]] if fired else None), [self.rules[k].id for k in fired]
+
+    # ------------------------------------------------------------------
+    # Un lot
+    # ------------------------------------------------------------------
+    def columns(self, records: Sequence[Any]) -> Dict[str, np.ndarray]:
+        """Colonnes NumPy des champs utilisés par les règles (valeurs par défaut comprises)."""
+        n = len(records)
+        champs = [_champs(record) for record in records]
+        columns: Dict[str, np.ndarray] = {}
+        for field, kind in self.fields.items():
+            default = self.defaults.get(field)
+            values = (c.get(field, default) for c in champs)
+            if kind == "bool":
+                columns[field] = np.fromiter((bool(v) for v in values), dtype=bool, count=n)
+            elif kind == "number":
+                columns[field] = np.fromiter(values, dtype=np.float64, count=n)
+            else:
+                column = np.empty(n, dtype=object)
+                column[:] = list(values)
+                columns[field] = column
+        return columns
+
+    def evaluate_columns(self, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Évalue toutes les règles sur des colonnes en une passe.
+
+        Renvoie l'indice de la règle retenue pour chaque ligne (-1 si aucune) et la matrice
+        booléenne (lignes x règles) des règles déclenchées.
+        """
+        n = len(next(iter(columns.values()))) if columns else 0
+        masks = []
+        for field, op, value in self.conditions:
+            column = columns[field]
+            mask = column.astype(bool) if op == "truthy" else OPERATORS[op](column, value)
+            masks.append(np.asarray(mask, dtype=bool))
+
+        fired = np.zeros((n, len(self.rules)), dtype=bool)
+        for k, clauses in enumerate(self._clauses):
+            for clause in clauses:
+                fired[:, k] |= np.logical_and.reduce([masks[i] for i in clause]) if clause else True
+        first = np.where(fired.any(axis=1), fired.argmax(axis=1), -1)
+        return first, fired
+
+    def evaluate_batch(self, records: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        return self.evaluate_columns(self.columns(records))
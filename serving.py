@@ -0,0 +1,171 @@
+# serving.py - Service multi-processus : workers forkés après le chargement du modèle, socket partagé
+import asyncio
+import gc
+import os
+import select
+import signal
+import socket
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+# Champs de /proc/<pid>/smaps_rollup (Linux) repris dans le bilan mémoire
+_CHAMPS_MEMOIRE = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def memory_usage(pid: int) -> Dict[str, float]:
+    """Mémoire d'un processus en Mo : rss, pss (part proportionnelle des pages partagées),
+    shared et private. Vide si /proc n'est pas disponible."""
+    valeurs: Dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for ligne in f:
+                nom, _, reste = ligne.partition(":")
+                if nom in _CHAMPS_MEMOIRE:
+                    valeurs[nom] = int(reste.split()[0]) / 1024
+    except (OSError, ValueError):
+        try:
+            with open(f"/proc/{pid}/status", encoding="ascii") as f:
+                for ligne in f:
+                    if ligne.startswith("VmRSS:"):
+                        return {"rss": int(ligne.split()[1]) / 1024}
+        except (OSError, ValueError):
+            pass
+        return {}
+    return {
+        "rss": valeurs.get("Rss", 0.0),
+        "pss": valeurs.get("Pss", 0.0),
+        "shared": valeurs.get("Shared_Clean", 0.0) + valeurs.get("Shared_Dirty", 0.0),
+        "private": valeurs.get("Private_Clean", 0.0) + valeurs.get("Private_Dirty", 0.0),
+    }
+
+
+def print_memory_summary(processes: Dict[str, int]) -> None:
+    """Affiche la mémoire de chaque processus ({nom: pid}) et le total réel (somme des PSS)."""
+    print(f"{'processus':<12}{'pid':>8}{'RSS Mo':>10}{'PSS Mo':>10}{'partagé Mo':>12}{'privé Mo':>10}")
+    total = 0.0
+    for nom, pid in processes.items():
+        memoire = memory_usage(pid)
+        total += memoire.get("pss", memoire.get("rss", 0.0))
+        colonnes = "".join(f"{memoire[cle]:>{largeur}.1f}" if cle in memoire else f"{'-':>{largeur}}"
+                           for cle, largeur in (("rss", 10), ("pss", 10), ("shared", 12), ("private", 10)))
+        print(f"{nom:<12}{pid:>8}{colonnes}")
+    print(f"Mémoire totale (somme des PSS): {total:.1f} Mo pour {len(processes)} processus")
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app: Any, sock: socket.socket, ready_fd: int, number: int, options: Dict[str, Any]) -> None:
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, **options))
+
+    async def run() -> None:
+        tache = asyncio.ensure_future(server.serve(sockets=[sock]))
+        # Signaler au maître la fin du démarrage (événements startup exécutés, socket en écoute)
+        while not server.started and not tache.done():
+            await asyncio.sleep(0.05)
+        if server.started:
+            os.write(ready_fd, f"{number} {os.getpid()}\n".encode())
+        await tache
+
+    asyncio.run(run())
+
+
+def serve(app: Any, host: str = "0.0.0.0", port: int = 8000, workers: int = 1,
+          preload: Optional[Callable[[], Any]] = None, ready_timeout: float = 120.0, **options: Any) -> int:
+    """Sert `app` avec `workers` processus uvicorn forkés d'un maître qui a déjà chargé le modèle.
+
+    `preload()` s'exécute dans le maître avant le fork : les workers héritent des modèles
+    chargés (pages partagées en copie sur écriture ; les tableaux de l'export compact sont
+    projetés depuis le même fichier, une seule copie en mémoire pour tous). Les workers
+    acceptent les connexions sur un socket commun, le noyau répartit la charge. Le maître
+    affiche la mémoire de chaque processus une fois les workers prêts, relance un worker
+    qui s'arrête et transmet SIGINT/SIGTERM à tous. Les métriques et le cache de
+    prédictions restent propres à chaque worker.
+    """
+    import uvicorn
+    if workers <= 1 or not hasattr(os, "fork"):
+        uvicorn.run(app, host=host, port=port, **options)
+        return 0
+
+    debut = time.perf_counter()
+    if preload is not None:
+        preload()
+    # Objets du maître hors du ramasse-miettes : ses passages ne recopient pas leurs pages dans les workers
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind(host, port)
+    lecture, ecriture = os.pipe()
+    enfants: Dict[int, int] = {}
+    arret = False
+
+    def arreter(signum: int, frame: Any) -> None:
+        nonlocal arret
+        arret = True
+        for pid in list(enfants):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def lancer(number: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(lecture)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                _run_worker(app, sock, ecriture, number, options)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        enfants[pid] = number
+
+    signal.signal(signal.SIGINT, arreter)
+    signal.signal(signal.SIGTERM, arreter)
+    print(f"Maître {os.getpid()}: {workers} workers sur http://{host}:{port}")
+    for number in range(workers):
+        lancer(number)
+
+    # Attendre que chaque worker ait terminé son démarrage, puis afficher le bilan mémoire
+    prets: Dict[str, int] = {}
+    tampon = b""
+    limite = time.monotonic() + ready_timeout
+    while len(prets) < workers and not arret and time.monotonic() < limite:
+        if not select.select([lecture], [], [], 0.5)[0]:
+            continue
+        tampon += os.read(lecture, 4096)
+        *lignes, tampon = tampon.split(b"\n")
+        for ligne in lignes:
+            number, pid = ligne.split()
+            prets[f"worker {int(number)}"] = int(pid)
+    if not arret:
+        print(f"{len(prets)}/{workers} workers prêts en {time.perf_counter() - debut:.2f} s")
+        print_memory_summary({"maître": os.getpid(), **dict(sorted(prets.items()))})
+
+    # Superviser les workers jusqu'à l'arrêt
+    while enfants:
+        try:
+            pid, statut = os.wait()
+        except ChildProcessError:
+            break
+        number = enfants.pop(pid, None)
+        if number is not None and not arret:
+            print(f"Worker {number} (pid {pid}) arrêté (statut {statut}), relance")
+            lancer(number)
+
+    sock.close()
+    os.close(lecture)
+    os.close(ecriture)
+    return 0
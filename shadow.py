@@ -0,0 +1,171 @@
+# shadow.py - Comparaison de deux modèles : accord, dérive de confiance, notation en ombre sur le trafic réel
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Libellé de la classe positive : la confiance est ramenée à la probabilité (en %) d'être éligible
+ELIGIBLE = "Éligible"
+
+
+def eligibility_score(result: Dict[str, Any]) -> float:
+    """Probabilité d'éligibilité (en %) d'une réponse de l'API, quelle que soit la classe prédite."""
+    confidence = float(result["confidence"])
+    return confidence if result["prediction"] == ELIGIBLE else 100.0 - confidence
+
+
+class Comparison:
+    """Accumule l'accord entre les réponses d'un modèle de référence et d'un modèle candidat.
+
+    La dérive de confiance est l'écart (candidat - référence) de la probabilité
+    d'éligibilité, en points de pourcentage : elle reste comparable lorsque les deux
+    modèles ne prédisent pas la même classe.
+    """
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.agree = 0
+        self.drift_sum = 0.0
+        self.abs_drift_sum = 0.0
+        self.max_abs_drift = 0.0
+        self.transitions: Counter = Counter()
+
+    def add(self, reference: Dict[str, Any], candidate: Dict[str, Any]) -> bool:
+        """Ajoute une paire de réponses ; True si les prédictions concordent."""
+        drift = eligibility_score(candidate) - eligibility_score(reference)
+        self.rows += 1
+        self.drift_sum += drift
+        self.abs_drift_sum += abs(drift)
+        self.max_abs_drift = max(self.max_abs_drift, abs(drift))
+        agree = reference["prediction"] == candidate["prediction"]
+        if agree:
+            self.agree += 1
+        else:
+            self.transitions[f"{reference['prediction']} -> {candidate['prediction']}"] += 1
+        return agree
+
+    def merge(self, other: "Comparison") -> "Comparison":
+        self.rows += other.rows
+        self.agree += other.agree
+        self.drift_sum += other.drift_sum
+        self.abs_drift_sum += other.abs_drift_sum
+        self.max_abs_drift = max(self.max_abs_drift, other.max_abs_drift)
+        self.transitions.update(other.transitions)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.rows:
+            return {"rows": 0}
+        return {
+            "rows": self.rows,
+            "agreement_rate": self.agree / self.rows,
+            "disagreements": dict(self.transitions),
+            "mean_confidence_drift": self.drift_sum / self.rows,
+            "mean_abs_confidence_drift": self.abs_drift_sum / self.rows,
+            "max_abs_confidence_drift": self.max_abs_drift,
+        }
+
+
+class ShadowScorer:
+    """Note chaque requête une seconde fois avec un modèle candidat, sans toucher à la réponse.
+
+    `schedule` est appelé une fois la réponse du modèle servi calculée : il lance une
+    tâche asynchrone qui évalue le donneur avec `score_fn(donneur, version)` et compare
+    les deux réponses. La requête n'attend jamais cette tâche. Au plus `max_pending`
+    évaluations en ombre sont en cours à la fois ; au-delà, la requête n'est pas notée
+    en ombre (`skipped`), pour que le candidat ne puisse pas saturer le service.
+    `score_fn` peut renvoyer None lorsque la réponse ne dépend pas du modèle (donneur
+    écarté par une règle d'exclusion) : la requête est alors comptée dans `not_applicable`.
+
+    `on_result(version, donneur, réponse, durée, accord)` est appelé après chaque comparaison.
+    """
+
+    def __init__(self, score_fn: Callable[[Dict[str, Any], str], Awaitable[Optional[Dict[str, Any]]]],
+                 version: Optional[str] = None, sample_rate: float = 1.0, max_pending: int = 64,
+                 on_result: Optional[Callable[[str, Dict[str, Any], Dict[str, Any], float, bool], None]] = None):
+        self.score_fn = score_fn
+        self.version = version
+        self.sample_rate = sample_rate
+        self.max_pending = max(1, max_pending)
+        self.on_result = on_result
+        self._pending: set = set()
+        self._comparisons: Dict[str, Comparison] = {}
+        self._counts: Dict[str, Counter] = {}
+        self._durations: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls, score_fn: Callable[..., Awaitable[Any]], **kwargs: Any) -> "ShadowScorer":
+        """Construit le notateur à partir de SHADOW_MODEL (vide : désactivé), SHADOW_SAMPLE_RATE et SHADOW_MAX_PENDING."""
+        return cls(
+            score_fn,
+            version=os.environ.get("SHADOW_MODEL") or None,
+            sample_rate=float(os.environ.get("SHADOW_SAMPLE_RATE", 1.0)),
+            max_pending=int(os.environ.get("SHADOW_MAX_PENDING", 64)),
+            **kwargs,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.version is not None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def configure(self, version: Optional[str], sample_rate: Optional[float] = None) -> None:
+        """Change de modèle candidat (None : désactive). Les statistiques de chaque version sont conservées."""
+        self.version = version
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    def schedule(self, donneur: Dict[str, Any], reference: Dict[str, Any]) -> bool:
+        version = self.version
+        if version is None:
+            return False
+        counts = self._counts.setdefault(version, Counter())
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            counts["sampled_out"] += 1
+            return False
+        if len(self._pending) >= self.max_pending:
+            counts["skipped"] += 1
+            return False
+        task = asyncio.ensure_future(self._run(version, donneur, reference))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return True
+
+    async def _run(self, version: str, donneur: Dict[str, Any], reference: Dict[str, Any]) -> None:
+        counts = self._counts[version]
+        debut = time.perf_counter()
+        try:
+            candidate = await self.score_fn(donneur, version)
+        except Exception as e:
+            counts["errors"] += 1
+            if counts["errors"] == 1:
+                print(f"Erreur de la notation en ombre avec {version}: {e!r}")
+            return
+        duree = time.perf_counter() - debut
+        if candidate is None:
+            counts["not_applicable"] += 1
+            return
+        agree = self._comparisons.setdefault(version, Comparison()).add(reference, candidate)
+        self._durations[version] = self._durations.get(version, 0.0) + duree
+        if self.on_result is not None:
+            self.on_result(version, donneur, candidate, duree, agree)
+
+    async def stop(self) -> None:
+        """Attend la fin des évaluations en cours."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        versions = {}
+        for version in sorted(set(self._counts) | set(self._comparisons)):
+            resume = self._comparisons.get(version, Comparison()).summary()
+            if resume["rows"]:
+                resume["mean_latency_ms"] = self._durations[version] / resume["rows"] * 1000
+            versions[version] = {**resume, **self._counts.get(version, {})}
+        return {"version": self.version, "sample_rate": self.sample_rate, "pending": self.pending,
+                "max_pending": self.max_pending, "versions": versions}
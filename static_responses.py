@@ -0,0 +1,52 @@
+# static_responses.py - Réponses statiques pré-encodées (corps, ETag) avec revalidation conditionnelle (304)
+import hashlib
+import json
+from typing import Any, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class StaticResponse:
+    """Corps déjà sérialisé d'une route dont le contenu ne change pas entre deux chargements.
+
+    L'ETag (fort) est le condensé du corps. Une requête dont l'en-tête If-None-Match
+    contient cet ETag reçoit un 304 sans corps ; les autres reçoivent les octets tels
+    quels, sans nouvelle sérialisation. `cache_control` fixe la politique des clients
+    ("no-cache" : garder la réponse mais la revalider à chaque fois).
+    """
+
+    __slots__ = ("body", "media_type", "etag", "cache_control")
+
+    def __init__(self, body: bytes, media_type: str = "application/json", cache_control: str = "no-cache"):
+        self.body = body
+        self.media_type = media_type
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.cache_control = cache_control
+
+    @classmethod
+    def json(cls, content: Any, cache_control: str = "no-cache") -> "StaticResponse":
+        # Mêmes octets que JSONResponse
+        body = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                          separators=(",", ":")).encode("utf-8")
+        return cls(body, "application/json", cache_control)
+
+    @classmethod
+    def from_response(cls, response: Response, cache_control: str = "no-cache") -> "StaticResponse":
+        """Fige le corps d'une réponse Starlette déjà construite (ex. pages de documentation)."""
+        return cls(bytes(response.body), response.media_type or "application/octet-stream", cache_control)
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+    def respond(self, request: Request) -> Response:
+        headers = {"etag": self.etag, "cache-control": self.cache_control}
+        if self.not_modified(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        return Response(self.body, media_type=self.media_type, headers=headers)
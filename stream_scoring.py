@@ -0,0 +1,145 @@
+# stream_scoring.py - Lecture incrémentale de donneurs en NDJSON ou CSV (notation de gros registres)
+import csv
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Formats acceptés : une ligne JSON par donneur, ou CSV avec une ligne d'en-tête (noms des champs de l'API)
+FORMATS = ("ndjson", "csv")
+
+# Taille maximale d'une ligne : au-delà, la ligne est signalée en erreur et ignorée
+MAX_LINE_BYTES = 1 << 20
+
+# Un enregistrement lu : (numéro de ligne, champs, erreur). Exactement un des deux derniers est renseigné.
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def detect_format(content_type: Optional[str] = None, filename: Optional[str] = None) -> str:
+    """Format d'après le Content-Type ou l'extension du fichier (NDJSON par défaut)."""
+    indice = f"{content_type or ''} {filename or ''}".lower()
+    return "csv" if "csv" in indice else "ndjson"
+
+
+def encode_line(obj: Dict[str, Any]) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class RecordParser:
+    """Découpe un flux d'octets en enregistrements au fil de l'eau.
+
+    `feed(bloc)` renvoie les enregistrements complets contenus dans les octets reçus jusqu'ici,
+    `close()` ceux de la fin du flux. Seule la ligne en cours est gardée en mémoire : la
+    consommation ne dépend pas de la taille de l'entrée. Une ligne illisible produit un
+    enregistrement en erreur au lieu d'interrompre la lecture.
+    """
+
+    def __init__(self, fmt: str = "ndjson", max_line_bytes: int = MAX_LINE_BYTES):
+        if fmt not in FORMATS:
+            raise ValueError(f"Format non supporté: {fmt} (attendu: {', '.join(FORMATS)})")
+        self.format = fmt
+        self.max_line_bytes = max_line_bytes
+        self._buffer = b""
+        self._line = 0
+        self._skipping = False
+        # CSV : en-tête, et enregistrement en cours lorsqu'un champ entre guillemets contient un saut de ligne
+        self._header: Optional[List[str]] = None
+        self._pending: List[str] = []
+        self._pending_start = 0
+
+    def feed(self, data: bytes) -> List[Record]:
+        records: List[Record] = []
+        self._buffer += data
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = self._buffer[start:end]
+            start = end + 1
+            self._line += 1
+            if self._skipping:
+                # Fin d'une ligne trop longue déjà signalée
+                self._skipping = False
+                continue
+            if len(line) > self.max_line_bytes:
+                # Même limite que la ligne reçue en plusieurs blocs : le résultat ne dépend pas du découpage
+                records.append((self._line, None, f"Ligne trop longue (> {self.max_line_bytes} octets)"))
+                continue
+            self._parse_line(line, records)
+        self._buffer = self._buffer[start:]
+
+        if len(self._buffer) > self.max_line_bytes and not self._skipping:
+            records.append((self._line + 1, None, f"Ligne trop longue (> {self.max_line_bytes} octets)"))
+            self._skipping = True
+        if self._skipping:
+            self._buffer = b""
+        return records
+
+    def close(self) -> List[Record]:
+        records: List[Record] = []
+        if self._buffer and not self._skipping:
+            self._line += 1
+            self._parse_line(self._buffer, records)
+        self._buffer = b""
+        if self._pending:
+            records.append((self._pending_start, None, "Guillemets non refermés en fin de fichier"))
+            self._pending = []
+        return records
+
+    def _parse_line(self, raw: bytes, records: List[Record]) -> None:
+        try:
+            text = raw.decode("utf-8")
+        except UnicodeDecodeError as e:
+            records.append((self._line, None, f"Encodage invalide (UTF-8 attendu): {e.reason}"))
+            return
+        if self._line == 1:
+            text = text.lstrip("\ufeff")
+        text = text.rstrip("\r")
+        if self.format == "ndjson":
+            self._parse_json(text, records)
+        else:
+            self._parse_csv(text, records)
+
+    def _parse_json(self, text: str, records: List[Record]) -> None:
+        if not text.strip():
+            return
+        try:
+            value = json.loads(text)
+        except ValueError as e:
+            records.append((self._line, None, f"JSON invalide: {e}"))
+            return
+        if not isinstance(value, dict):
+            records.append((self._line, None, "Un objet JSON est attendu sur chaque ligne"))
+            return
+        records.append((self._line, value, None))
+
+    def _parse_csv(self, text: str, records: List[Record]) -> None:
+        if not self._pending:
+            if not text.strip():
+                return
+            self._pending_start = self._line
+        self._pending.append(text)
+        # Nombre impair de guillemets : un champ entre guillemets continue sur la ligne suivante
+        joined = "\n".join(self._pending)
+        if joined.count('"') % 2:
+            if len(joined) > self.max_line_bytes:
+                # Guillemet isolé : ne pas accumuler le reste du fichier
+                records.append((self._pending_start, None, "Guillemets non refermés"))
+                self._pending = []
+            return
+        self._pending = []
+
+        try:
+            values = next(csv.reader([joined]))
+        except csv.Error as e:
+            records.append((self._pending_start, None, f"CSV invalide: {e}"))
+            return
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return
+        if len(values) != len(self._header):
+            records.append((self._pending_start, None,
+                            f"{len(values)} colonnes au lieu de {len(self._header)}"))
+            return
+        # Une cellule vide équivaut à un champ absent (valeur par défaut du schéma)
+        records.append((self._pending_start,
+                        {name: value for name, value in zip(self._header, values) if value != ""}, None))
@@ -0,0 +1,48 @@
+# tests/conftest.py - Configuration commune des tests : modèle du dépôt, fichiers d'exécution en dossier temporaire
+import os
+import sys
+import tempfile
+
+import pytest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+# Avant l'import de main : chemins absolus (les tests ne dépendent pas du dossier courant) et rien
+# n'est écrit dans l'arbre de travail (exports compilés, tables de décision, audit, référence de dérive)
+SORTIES = tempfile.mkdtemp(prefix="indabax-tests-")
+os.environ.setdefault("MODEL_DIR", os.path.join(RACINE, "model"))
+os.environ.setdefault("MODEL_EXPORT_DIR", os.path.join(SORTIES, "compiled"))
+os.environ.setdefault("AUDIT_LOG", "off")
+os.environ.setdefault("DRIFT_DIR", os.path.join(SORTIES, "drift"))
+
+
+@pytest.fixture(scope="session")
+def main_module():
+    import main
+    assert main.load_model(), "Modèle du dépôt introuvable"
+    return main
+
+
+@pytest.fixture(scope="session")
+def modele(main_module):
+    return main_module.obtenir_modele(None)
+
+
+@pytest.fixture(scope="session")
+def pipeline(modele):
+    assert modele.pipeline is not None
+    return modele.pipeline
+
+
+@pytest.fixture(scope="session")
+def donneurs_modele(main_module, pipeline):
+    """Donneurs tirés dans les catégories connues du modèle (quelques valeurs manquantes)."""
+    return main_module.donneurs_verification(main_module.categories_pipeline(pipeline), n=500, graine=7)
+
+
+@pytest.fixture(scope="session")
+def donneurs_mixtes():
+    """Donneurs du générateur du benchmark : règles d'exclusion et modèle, vocabulaire hors modèle compris."""
+    from benchmark.payloads import generate_payloads
+    return generate_payloads(500, profil="mixte", seed=11)
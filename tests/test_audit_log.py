@@ -0,0 +1,161 @@
+# tests/test_audit_log.py - Journal d'audit : file bornée, dépôt par lot et enregistrements des routes de prédiction
+import asyncio
+import glob
+import json
+import os
+
+import httpx
+
+from audit_log import AuditLog
+
+
+def lire(dossier):
+    return [json.loads(ligne) for chemin in sorted(glob.glob(os.path.join(dossier, "*.jsonl")))
+            for ligne in open(chemin, encoding="utf-8")]
+
+
+def test_file_pleine_abandon(tmp_path):
+    async def scenario():
+        journal = AuditLog(str(tmp_path), flush_interval=60.0, flush_size=1000, max_queue_size=5,
+                           policy="drop")
+        await journal.start()
+        deposes = [await journal.submit({"n": i}) for i in range(8)]
+        await journal.stop()
+        return deposes, journal
+
+    deposes, journal = asyncio.run(scenario())
+    # Politique "drop" : ce qui dépasse la file est abandonné et compté, sans attente
+    assert deposes == [True] * 5 + [False] * 3 and journal.dropped == 3 and journal.written == 5
+    assert [enregistrement["n"] for enregistrement in lire(str(tmp_path))] == [0, 1, 2, 3, 4]
+
+
+def test_file_pleine_bloquante(tmp_path):
+    async def scenario():
+        journal = AuditLog(str(tmp_path), flush_interval=60.0, flush_size=4, max_queue_size=4, policy="block",
+                           block_timeout=5.0)
+        await journal.start()
+        # Au-delà de la file, chaque dépôt attend que la tâche de fond la vide
+        deposes = [await journal.submit({"n": i}) for i in range(10)]
+        await journal.stop()
+        return deposes, journal
+
+    deposes, journal = asyncio.run(scenario())
+    assert all(deposes) and journal.dropped == 0
+    assert [enregistrement["n"] for enregistrement in lire(str(tmp_path))] == list(range(10))
+
+
+def test_submit_many(tmp_path):
+    async def scenario():
+        journal = AuditLog(str(tmp_path), flush_interval=60.0, flush_size=1000, max_queue_size=5,
+                           policy="drop")
+        await journal.start()
+        deposes = await journal.submit_many([{"n": i} for i in range(8)])
+        await journal.stop()
+        return deposes, journal
+
+    deposes, journal = asyncio.run(scenario())
+    # Politique "drop" : ce qui dépasse la file est abandonné et compté, sans attente
+    assert deposes == 5 and journal.dropped == 3 and journal.written == 5
+    assert [enregistrement["n"] for enregistrement in lire(str(tmp_path))] == [0, 1, 2, 3, 4]
+
+
+def test_submit_many_bloquant(tmp_path):
+    async def scenario():
+        journal = AuditLog(str(tmp_path), flush_interval=60.0, flush_size=4, max_queue_size=4, policy="block",
+                           block_timeout=5.0)
+        await journal.start()
+        # Le reste du lot attend que la tâche de fond vide la file
+        deposes = await journal.submit_many([{"n": i} for i in range(10)])
+        await journal.stop()
+        return deposes, journal
+
+    deposes, journal = asyncio.run(scenario())
+    assert deposes == 10 and journal.dropped == 0
+    assert [enregistrement["n"] for enregistrement in lire(str(tmp_path))] == list(range(10))
+
+
+def test_journal_arrete(tmp_path):
+    journal = AuditLog(str(tmp_path))
+    assert asyncio.run(journal.submit_many([{}, {}])) == 0 and journal.dropped == 2
+    assert not asyncio.run(journal.submit({})) and journal.dropped == 3
+    assert not AuditLog(str(tmp_path), backend="off").submit_nowait({})
+
+
+def test_audit_de_predict_et_du_lot(main_module, tmp_path, monkeypatch):
+    journal = AuditLog(str(tmp_path), flush_interval=0.01)
+    monkeypatch.setattr(main_module, "journal_audit", journal)
+    exemples = main_module.DonneurInput.Config.schema_extra["examples"]
+    donneurs = [exemple["value"] for exemple in exemples.values()]
+
+    async def scenario():
+        await journal.start()
+        try:
+            transport = httpx.ASGITransport(app=main_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+                return (await client.post("/predict", json=donneurs[0]),
+                        await client.post("/predict/batch", json=donneurs))
+        finally:
+            await journal.stop()
+            await main_module.inference_scheduler.stop()
+
+    unitaire, lot = asyncio.run(scenario())
+    assert unitaire.status_code == 200 and lot.status_code == 200
+    enregistrements = lire(str(tmp_path))
+    assert [e["endpoint"] for e in enregistrements] == ["predict"] + ["batch"] * len(donneurs)
+    # Les lignes du lot sont reliées par l'identifiant de la requête
+    assert len({e["request"] for e in enregistrements[1:]}) == 1
+    assert {e["model"] for e in enregistrements} == {main_module.registry.active_version}
+    assert enregistrements[0]["output"]["prediction"] == unitaire.json()["prediction"]
+    assert [e["output"]["prediction"] for e in enregistrements[1:]] == [r["prediction"] for r in lot.json()]
+
+
+def test_audit_du_flux(main_module, tmp_path, monkeypatch):
+    from benchmark.payloads import generate_payloads
+    journal = AuditLog(str(tmp_path), flush_interval=0.01)
+    monkeypatch.setattr(main_module, "journal_audit", journal)
+    donneurs = generate_payloads(30, seed=29)
+    corps = b"".join(json.dumps(donneur).encode() + b"\n" for donneur in donneurs) + b"{invalide\n"
+
+    async def scenario():
+        await journal.start()
+        try:
+            transport = httpx.ASGITransport(app=main_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+                return await client.post("/predict/stream", content=corps,
+                                         headers={"content-type": "application/x-ndjson"})
+        finally:
+            await journal.stop()
+            await main_module.inference_scheduler.stop()
+
+    reponse = asyncio.run(scenario())
+    assert reponse.status_code == 200 and len(reponse.text.splitlines()) == 31
+    enregistrements = lire(str(tmp_path))
+    # Une ligne d'audit par donneur noté (pas pour la ligne illisible), toutes reliées au même flux
+    assert len(enregistrements) == 30
+    assert {enregistrement["endpoint"] for enregistrement in enregistrements} == {"stream"}
+    assert len({enregistrement["request"] for enregistrement in enregistrements}) == 1
+    sorties = [json.loads(ligne) for ligne in reponse.text.splitlines()[:30]]
+    assert [e["output"]["prediction"] for e in enregistrements] == [s["prediction"] for s in sorties]
+
+
+def test_politique_par_defaut(monkeypatch):
+    monkeypatch.delenv("AUDIT_POLICY", raising=False)
+    # Traçabilité des décisions : la requête attend plutôt que de perdre l'enregistrement
+    assert AuditLog().policy == "block" and AuditLog.from_env().policy == "block"
+    monkeypatch.setenv("AUDIT_POLICY", "Drop")
+    assert AuditLog.from_env().policy == "drop"
+
+
+def test_pertes_signalees_par_ready(main_module, tmp_path, monkeypatch):
+    journal = AuditLog(str(tmp_path))
+    journal.dropped = 3
+    monkeypatch.setattr(main_module, "journal_audit", journal)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return await client.get("/ready")
+
+    # Signalées que le service soit prêt ou non (le démarrage complet n'est pas exécuté ici)
+    reponse = asyncio.run(scenario())
+    assert reponse.json()["audit"] == {"policy": "block", "dropped": 3, "failed": 0}
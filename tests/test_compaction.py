@@ -0,0 +1,64 @@
+# tests/test_compaction.py - Moteur et encodeur compactés : mêmes probabilités que le moteur complet
+import numpy as np
+import pytest
+
+from feature_encoder import FeatureEncoder
+from tree_engine import compile_pipeline
+
+
+@pytest.fixture(scope="module")
+def complet(main_module, modele, pipeline):
+    defaults = {col: "" if col in main_module.COLONNES_CATEGORIELLES else 0 for col in modele.required_columns}
+    encodeur = FeatureEncoder.from_pipeline(pipeline, main_module.SOURCES_ENCODEUR, defaults=defaults,
+                                            model_info=modele.model_info)
+    return encodeur, compile_pipeline(pipeline)
+
+
+def test_moteur_compacte(complet, donneurs_modele, donneurs_mixtes):
+    encodeur, moteur = complet
+    garder = moteur.used_features()
+    compact = moteur.compact(garder)
+    assert compact.n_features == len(garder) < moteur.n_features
+    assert compact.feature.shape[0] < moteur.feature.shape[0]
+    assert compact.max_depth <= moteur.max_depth
+    for donneurs in (donneurs_modele, donneurs_mixtes):
+        X = encodeur.encode_batch(donneurs)
+        np.testing.assert_array_equal(compact.predict_proba_matrix(X[:, garder]), moteur.predict_proba_matrix(X))
+        # Chemin ligne seule
+        np.testing.assert_array_equal(compact.decision_function(X[:1, garder]), moteur.decision_function(X[:1]))
+
+
+def test_compactage_sans_renumerotation(complet, donneurs_mixtes):
+    encodeur, moteur = complet
+    X = encodeur.encode_batch(donneurs_mixtes)
+    compact = moteur.compact()
+    assert compact.n_features == moteur.n_features
+    np.testing.assert_array_equal(compact.predict_proba_matrix(X), moteur.predict_proba_matrix(X))
+
+
+def test_caracteristique_testee_retiree(complet):
+    _, moteur = complet
+    with pytest.raises(ValueError):
+        moteur.compact(moteur.used_features()[1:])
+
+
+def test_encodeur_reduit(complet, donneurs_mixtes):
+    encodeur, moteur = complet
+    garder = moteur.used_features()
+    reduit = encodeur.select(garder)
+    assert reduit.n_features == len(garder)
+    np.testing.assert_array_equal(reduit.encode_batch(donneurs_mixtes), encodeur.encode_batch(donneurs_mixtes)[:, garder])
+    np.testing.assert_array_equal(reduit.encode(donneurs_mixtes[0]), encodeur.encode(donneurs_mixtes[0])[garder])
+    # Chaque colonne d'origine garde une plage contiguë (explications regroupées de la même façon)
+    assert len(reduit.spans) == len(encodeur.spans)
+    assert all(start <= stop for start, stop in reduit.spans)
+
+
+def test_compacter_modele(main_module, modele, pipeline, complet):
+    encodeur, moteur = complet
+    encodeur_compact, moteur_compact, verification = main_module.compacter_modele(
+        pipeline, encodeur, moteur, modele.model_info, modele.required_columns)
+    assert verification is not None
+    assert verification["label_agreement"] == 1.0 and verification["max_abs_proba_diff"] <= 1e-9
+    assert verification["features"] == [moteur.n_features, moteur_compact.n_features]
+    assert moteur_compact.n_features == encodeur_compact.n_features
@@ -0,0 +1,105 @@
+# tests/test_decision_table.py - Table de décision : mêmes probabilités et mêmes réponses que le modèle
+import random
+from enum import Enum
+
+import numpy as np
+import pytest
+
+from decision_table import DecisionTable
+
+
+class Couleur(str, Enum):
+    ROUGE = "Rouge"
+    BLEU = "Bleu"
+
+
+DIMENSIONS = [("n", range(3)), ("couleur", list(Couleur))]
+
+
+def noter(donneurs):
+    # Probabilité fictive qui dépend de chaque dimension et du champ fixe
+    scores = np.array([(d["n"] * 2 + (d["couleur"] == Couleur.BLEU)) / 10 + d["f"] for d in donneurs])
+    return np.column_stack((1 - scores, scores))
+
+
+def test_table_sur_un_petit_espace(tmp_path):
+    table = DecisionTable.build(DIMENSIONS, {"f": 0.1}, noter, chunk_rows=4)
+    assert len(table) == 6
+    for n in range(3):
+        for couleur in Couleur:
+            donneur = {"n": n, "couleur": couleur, "f": 0.1}
+            np.testing.assert_array_equal(table.lookup(donneur), noter([donneur])[0])
+            # Valeur de l'énumération ou chaîne : même profil
+            np.testing.assert_array_equal(table.lookup({**donneur, "couleur": couleur.value}), noter([donneur])[0])
+
+    # Hors de l'espace : dimension non énumérée, champ fixe différent ou absent, valeur non hachable
+    for donneur in ({"n": 3, "couleur": "Rouge", "f": 0.1}, {"n": 1, "couleur": "Vert", "f": 0.1},
+                    {"n": 1, "couleur": "Rouge", "f": 0.2}, {"n": 1, "couleur": "Rouge"},
+                    {"n": [1], "couleur": "Rouge", "f": 0.1}):
+        assert table.lookup(donneur) is None
+
+    chemin = table.save(str(tmp_path / "table.npy"))
+    relue = DecisionTable.load(chemin, DIMENSIONS, {"f": 0.1})
+    np.testing.assert_array_equal(relue.probabilities, table.probabilities)
+    assert DecisionTable.load(chemin, DIMENSIONS[:1], {"f": 0.1}) is None
+    assert DecisionTable.load(str(tmp_path / "absente.npy"), DIMENSIONS, {"f": 0.1}) is None
+
+
+def test_cle_du_fichier():
+    cle = DecisionTable.key("abc", DIMENSIONS, {"f": 0.1})
+    assert cle == DecisionTable.key("abc", DIMENSIONS, {"f": 0.1})
+    assert cle != DecisionTable.key("abd", DIMENSIONS, {"f": 0.1})
+    assert cle != DecisionTable.key("abc", DIMENSIONS, {"f": 0.2})
+    assert cle != DecisionTable.key("abc", DIMENSIONS, {"f": 0.1}, {"engine": "sklearn"})
+
+
+@pytest.fixture(scope="module")
+def table_modele(main_module, modele):
+    # Même construction qu'au chargement avec DECISION_TABLE=1 (fichier dans le dossier temporaire)
+    main_module.preparer_table_decision(modele)
+    if modele.decision_table_thread is not None:
+        modele.decision_table_thread.join()
+    assert modele.decision_table is not None
+    yield modele.decision_table
+    modele.decision_table = None
+
+
+@pytest.fixture(scope="module")
+def donneurs_couverts(main_module):
+    aleatoire = random.Random(3)
+    donneurs = []
+    for _ in range(300):
+        donneur = dict(main_module.DEFAUTS_DONNEUR)
+        for champ, valeurs in main_module.DIMENSIONS_TABLE:
+            donneur[champ] = aleatoire.choice(list(valeurs))
+        donneur["taux_hemoglobine"] = 15.0
+        donneurs.append(donneur)
+    return donneurs
+
+
+def test_probabilites_du_modele(main_module, modele, table_modele, donneurs_couverts):
+    attendu = main_module.predict_proba_lignes(modele.feature_encoder.encode_batch(donneurs_couverts), modele)
+    obtenu = np.vstack([table_modele.lookup(donneur) for donneur in donneurs_couverts])
+    np.testing.assert_array_equal(obtenu, attendu)
+
+
+def test_reponses_identiques(main_module, modele, table_modele, donneurs_couverts, donneurs_mixtes):
+    donneurs = donneurs_couverts + donneurs_mixtes
+    assert sum(table_modele.lookup(donneur) is not None for donneur in donneurs) >= len(donneurs_couverts)
+    main_module.prediction_cache.invalidate()
+    avec_table = [main_module.predict_eligibility(donneur) for donneur in donneurs]
+    modele.decision_table = None
+    try:
+        main_module.prediction_cache.invalidate()
+        sans_table = [main_module.predict_eligibility(donneur) for donneur in donneurs]
+    finally:
+        modele.decision_table = table_modele
+    assert avec_table == sans_table
+
+
+def test_table_relue_depuis_le_fichier(main_module, modele, table_modele):
+    modele.decision_table = None
+    main_module.preparer_table_decision(modele)
+    # Fichier enregistré par la construction : relu sans nouveau calcul
+    assert modele.decision_table is not None and modele.decision_table is not table_modele
+    np.testing.assert_array_equal(modele.decision_table.probabilities, table_modele.probabilities)
@@ -0,0 +1,189 @@
+# tests/test_drift.py - Suivi de la dérive : histogrammes, esquisses count-min, PSI, fenêtres et référence
+import json
+
+import numpy as np
+import pytest
+
+import drift
+from drift import CountMinSketch, DriftMonitor, Histogram, MODEL_OUTCOME, Profile, compare, psi
+from shadow import ELIGIBLE
+
+NUMERIQUES = {"age": (18.0, 70.0, 1.0)}
+CATEGORIELS = ["genre"]
+
+
+def moniteur(tmp_path, **options):
+    return DriftMonitor(NUMERIQUES, CATEGORIELS, baseline_path=str(tmp_path / "reference.json"), **options)
+
+
+def paires(ages, genre="Homme", confidence=80.0):
+    return [({"age": float(age), "genre": genre}, {"prediction": ELIGIBLE, "confidence": confidence})
+            for age in ages]
+
+
+def profil(ages, genre="Homme"):
+    resultat = Profile(NUMERIQUES, CATEGORIELS)
+    resultat.add([({"age": float(age), "genre": genre}, MODEL_OUTCOME, 80.0) for age in ages])
+    return resultat
+
+
+def test_quantiles_histogramme():
+    histogramme = Histogram(0.0, 100.0, 1.0)
+    valeurs = np.random.default_rng(0).uniform(0.0, 100.0, 20000)
+    histogramme.add(valeurs)
+    for q in (0.05, 0.5, 0.95):
+        # Interpolation dans la classe : erreur bornée par la largeur d'une classe
+        assert abs(histogramme.quantile(q) - np.quantile(valeurs, q)) <= 1.0
+    assert Histogram(0.0, 1.0, 0.1).quantile(0.5) is None
+
+    # Débordements : classes dédiées, quantiles ramenés aux bornes
+    histogramme = Histogram(0.0, 10.0, 1.0)
+    histogramme.add(np.array([-5.0, -1.0, 20.0, 30.0]))
+    assert histogramme.summary()["below_range"] == 2 and histogramme.summary()["above_range"] == 2
+    assert histogramme.quantile(0.25) == 0.0 and histogramme.quantile(1.0) == 10.0
+
+    # Une valeur sur une borne de classe tombe dans la classe qui commence à cette borne
+    histogramme = Histogram(7.0, 20.0, 0.1)
+    histogramme.add(np.array([13.0]))
+    assert histogramme.counts[int(round((13.0 - 7.0) / 0.1)) + 1] == 1
+
+
+def test_histogramme_fusion_et_etat():
+    a, b = Histogram(0.0, 10.0, 1.0), Histogram(0.0, 10.0, 1.0)
+    a.add(np.array([1.0, 2.0, 3.0]))
+    b.add(np.array([4.0, 5.0]))
+    fusion = a.copy().merge(b)
+    assert fusion.count == 5 and fusion.sum == 15.0
+    relu = Histogram.from_dict(json.loads(json.dumps(fusion.to_dict())))
+    assert np.array_equal(relu.counts, fusion.counts) and relu.summary() == fusion.summary()
+    with pytest.raises(ValueError):
+        a.merge(Histogram(0.0, 20.0, 1.0))
+
+
+def test_count_min_estimation():
+    esquisse = CountMinSketch(width=256, depth=4, top=3)
+    valeurs = ["A"] * 50 + ["B"] * 30 + ["C"] * 10 + [f"rare-{i}" for i in range(40)]
+    esquisse.add(valeurs)
+    reels = {valeur: valeurs.count(valeur) for valeur in set(valeurs)}
+    # Jamais de sous-estimation
+    assert all(esquisse.estimate(valeur) >= compte for valeur, compte in reels.items())
+    assert esquisse.total == len(valeurs)
+    assert list(esquisse.summary()["top"]) == ["A", "B", "C"]
+
+
+def test_count_min_fusion_et_etat():
+    a, b = CountMinSketch(width=128, depth=3, top=4), CountMinSketch(width=128, depth=3, top=4)
+    a.add(["A"] * 5 + ["B"] * 2)
+    b.add(["B"] * 7 + ["C"])
+    fusion = a.copy().merge(b)
+    assert fusion.total == 15 and fusion.estimate("B") >= 9 and fusion.estimate("C") >= 1
+    # Additivité : fusionner revient à tout ajouter dans une seule esquisse
+    unique = CountMinSketch(width=128, depth=3, top=4)
+    unique.add(["A"] * 5 + ["B"] * 9 + ["C"])
+    assert np.array_equal(fusion.table, unique.table)
+
+    relue = CountMinSketch.from_dict(json.loads(json.dumps(fusion.to_dict())))
+    assert np.array_equal(relue.table, fusion.table)
+    assert relue.total == fusion.total and relue.top == fusion.top
+    assert all(relue.estimate(valeur) == fusion.estimate(valeur) for valeur in "ABCD")
+    with pytest.raises(ValueError):
+        a.merge(CountMinSketch(width=64, depth=3))
+
+
+def test_psi():
+    assert psi([10, 20, 30], [10, 20, 30]) == 0.0
+    assert psi([10, 20, 30], [1, 2, 3]) == pytest.approx(0.0)
+    assert psi([0, 0], [1, 2]) == 0.0
+    # Symétrique, et une classe vide donne un indice fini
+    assert psi([50, 50], [90, 10]) == pytest.approx(psi([90, 10], [50, 50]))
+    assert 0.25 < psi([50, 50, 0], [0, 50, 50]) < np.inf
+    attendu = 0.3 * np.log(0.8 / 0.5) + (-0.3) * np.log(0.2 / 0.5)
+    assert psi([50, 50], [80, 20]) == pytest.approx(attendu)
+
+
+def test_compare():
+    reference = profil(np.random.default_rng(1).uniform(20, 40, 2000))
+    stable = profil(np.random.default_rng(2).uniform(20, 40, 2000))
+    comparaison = compare(reference, stable, threshold=0.2)
+    assert comparaison["drifted"] == []
+    assert comparaison["features"]["age"]["psi"] < 0.05
+
+    derive = profil(np.random.default_rng(3).uniform(45, 65, 2000), genre="Femme")
+    derive.add([({"age": 30.0, "genre": "Femme"}, "femme_enceinte", None)] * 500)
+    comparaison = compare(reference, derive, threshold=0.2)
+    assert set(comparaison["drifted"]) == {"age", "genre", "rule_rejection"}
+    # Les 500 lignes écartées par une règle (30 ans) restent dans la plage de la référence
+    assert comparaison["features"]["age"]["ks"] == pytest.approx(0.8)
+    assert comparaison["features"]["genre"]["new_values"] == {"Femme": 2500}
+    assert comparaison["rule_rejection"]["live_rate"] == pytest.approx(0.2)
+    assert comparaison["rule_rejection"]["by_rule"]["femme_enceinte"]["baseline"] == 0.0
+
+
+def test_rotation_des_fenetres(tmp_path, monkeypatch):
+    horloge = [1000.0]
+    monkeypatch.setattr(drift.time, "monotonic", lambda: horloge[0])
+    suivi = moniteur(tmp_path, window=60.0)
+
+    suivi._update(paires([20] * 3))
+    assert suivi.live().rows == 3
+    horloge[0] += 61.0
+    suivi._update(paires([30] * 2))
+    # La fenêtre précédente reste dans les données récentes
+    assert suivi._previous.rows == 3 and suivi._current.rows == 2 and suivi.live().rows == 5
+    horloge[0] += 61.0
+    suivi._update(paires([40]))
+    # Deux rotations : les premières lignes sont sorties des données récentes
+    assert suivi._previous.rows == 2 and suivi.live().rows == 3
+    assert suivi.recorded == 6
+
+
+def test_psi_expose_apres_min_rows(tmp_path, monkeypatch):
+    horloge = [1000.0]
+    monkeypatch.setattr(drift.time, "monotonic", lambda: horloge[0])
+    suivi = moniteur(tmp_path, window=0.0, min_rows=100)
+    suivi.baseline = profil(np.random.default_rng(4).uniform(20, 40, 500))
+
+    # Trop peu de lignes récentes : pas de PSI exposé, comme dans le rapport
+    suivi._update(paires([60] * 10))
+    assert suivi.last_psi == {}
+    assert suivi.report()["status"] == "insufficient_data"
+
+    horloge[0] += drift.PSI_REFRESH_S
+    suivi._update(paires([60] * 150))
+    assert suivi.last_psi["age"] > 0.25
+    assert suivi.report()["status"] == "ok"
+
+
+def test_reference_enregistree_et_relue(tmp_path):
+    suivi = moniteur(tmp_path, min_rows=10)
+    suivi._update(paires(range(20, 40)))
+    assert suivi.freeze_baseline()["rows"] == 20
+
+    relu = moniteur(tmp_path)
+    assert relu.load_baseline()
+    assert relu.baseline.rows == 20
+    assert np.array_equal(relu.baseline.numeric["age"].counts, suivi.baseline.numeric["age"].counts)
+
+
+def test_reference_incompatible_rejetee(tmp_path):
+    suivi = moniteur(tmp_path, min_rows=10)
+    suivi._update(paires(range(20, 40)))
+    suivi.freeze_baseline()
+    chemin = tmp_path / "reference.json"
+
+    # Autres bornes d'histogramme, autres dimensions d'esquisse, autres champs
+    autres_bornes = DriftMonitor({"age": (0.0, 100.0, 1.0)}, CATEGORIELS, baseline_path=str(chemin))
+    assert not autres_bornes.load_baseline() and autres_bornes.baseline is None
+    autre_esquisse = DriftMonitor(NUMERIQUES, CATEGORIELS, baseline_path=str(chemin), width=1024)
+    assert not autre_esquisse.load_baseline()
+    autres_champs = DriftMonitor(NUMERIQUES, ["genre", "niveau_etude"], baseline_path=str(chemin))
+    assert not autres_champs.load_baseline()
+
+    # Format inconnu ou fichier illisible
+    etat = json.loads(chemin.read_text(encoding="utf-8"))
+    etat["format"] = drift.BASELINE_FORMAT + 1
+    chemin.write_text(json.dumps(etat), encoding="utf-8")
+    assert not moniteur(tmp_path).load_baseline()
+    chemin.write_text("{", encoding="utf-8")
+    assert not moniteur(tmp_path).load_baseline()
+    assert not DriftMonitor(NUMERIQUES, CATEGORIELS, baseline_path=str(tmp_path / "absente.json")).load_baseline()
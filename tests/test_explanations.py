@@ -0,0 +1,63 @@
+# tests/test_explanations.py - Contributions des caractéristiques (?explain=true)
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from tree_engine import compile_pipeline
+
+
+@pytest.fixture(scope="module")
+def lignes(modele, donneurs_modele):
+    return modele.feature_encoder.encode_batch(donneurs_modele)
+
+
+def test_somme_egale_au_score(main_module, modele, lignes):
+    explications = main_module.expliquer_lignes(lignes, modele)
+    scores = modele.compiled_model.decision_function(lignes)
+    for explication, score in zip(explications, scores):
+        assert explication["valeur_de_base"] + sum(explication["contributions"].values()) == pytest.approx(score, abs=1e-9)
+    # Ligne seule : mêmes contributions que dans le lot
+    seule = main_module.expliquer_lignes(lignes[:1], modele)[0]
+    assert seule["valeur_de_base"] == pytest.approx(explications[0]["valeur_de_base"], abs=1e-12)
+    for colonne, valeur in seule["contributions"].items():
+        assert valeur == pytest.approx(explications[0]["contributions"][colonne], abs=1e-12)
+
+
+def test_colonnes_sans_champ_dans_la_valeur_de_base(main_module, modele, lignes):
+    sans_source = {colonne for colonne in modele.feature_encoder.columns if colonne not in main_module.SOURCES_ENCODEUR}
+    for explication in main_module.expliquer_lignes(lignes, modele):
+        assert not sans_source & set(explication["contributions"])
+
+
+def test_valeurs_des_noeuds_derivees_des_feuilles(pipeline):
+    moteur = compile_pipeline(pipeline)
+    taux = pipeline.named_steps["classifier"].learning_rate
+    for estimateur, racine in zip(pipeline.named_steps["classifier"].estimators_[:, 0], moteur.roots):
+        arbre = estimateur.tree_
+        feuilles = arbre.children_left == -1
+        valeurs = moteur.value[racine:racine + arbre.node_count]
+        # Feuilles inchangées ; racine : moyenne des feuilles pondérée par les échantillons
+        np.testing.assert_array_equal(valeurs[feuilles], arbre.value[feuilles, 0, 0] * taux)
+        poids = arbre.weighted_n_node_samples[feuilles]
+        assert valeurs[0] == pytest.approx((valeurs[feuilles] * poids).sum() / poids.sum(), rel=1e-9, abs=1e-12)
+
+
+def test_explication_sur_demande(main_module):
+    exemples = main_module.DonneurInput.Config.schema_extra["examples"]
+    donneur = exemples["donneur_eligible"]["value"]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return [await client.post("/predict", json=donneur),
+                    await client.post("/predict?explain=true", json=donneur),
+                    await client.post("/predict/batch?explain=true", json=[donneur])]
+
+    simple, explique, lot = asyncio.run(scenario())
+    # Sans le paramètre, la réponse ne change pas ; avec, lot et ligne seule donnent la même explication
+    assert "explication" not in simple.json()
+    assert {cle: valeur for cle, valeur in explique.json().items() if cle != "explication"} == simple.json()
+    assert explique.json()["explication"]["contributions"]
+    assert lot.json()[0]["explication"]["contributions"].keys() == explique.json()["explication"]["contributions"].keys()
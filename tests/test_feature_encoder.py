@@ -0,0 +1,124 @@
+# tests/test_feature_encoder.py - Encodeur précompilé contre le ColumnTransformer du pipeline
+import asyncio
+from collections import Counter
+
+import httpx
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from feature_encoder import FeatureEncoder
+from vocabulary import UNKNOWN, normalize
+
+
+def construire(main_module, modele, pipeline, **options) -> FeatureEncoder:
+    defaults = {col: "" if col in main_module.COLONNES_CATEGORIELLES else 0 for col in modele.required_columns}
+    return FeatureEncoder.from_pipeline(pipeline, main_module.SOURCES_ENCODEUR, defaults=defaults,
+                                        model_info=modele.model_info, vocabulary_options=options)
+
+
+def transformer(main_module, modele, pipeline, donneurs) -> np.ndarray:
+    donnees = main_module.construire_dataframe([main_module.preparer_donnees_modele(donneur) for donneur in donneurs],
+                                               modele.required_columns)
+    return pipeline.named_steps["preprocessor"].transform(donnees).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def strict(main_module, modele, pipeline):
+    return construire(main_module, modele, pipeline, match="exact")
+
+
+@pytest.fixture(scope="module")
+def variantes(donneurs_modele):
+    """Variantes d'écriture des catégories connues : inconnues du OneHotEncoder, reconnues par l'encodeur."""
+    donneurs = []
+    for donneur in donneurs_modele[:100]:
+        donneur = dict(donneur)
+        for champ in ("genre", "profession", "religion", "arrondissement"):
+            if isinstance(donneur.get(champ), str):
+                donneur[champ] = "  " + donneur[champ].upper() + " "
+        donneurs.append(donneur)
+    return donneurs
+
+
+def test_strict_identique_au_pretraitement(main_module, modele, pipeline, strict, donneurs_modele, donneurs_mixtes,
+                                           variantes):
+    # Catégories connues, valeurs manquantes, vocabulaire hors modèle, variantes d'écriture
+    for donneurs in (donneurs_modele, donneurs_mixtes, variantes):
+        np.testing.assert_array_equal(strict.encode_batch(donneurs),
+                                      transformer(main_module, modele, pipeline, donneurs))
+
+
+def test_ligne_seule_identique_au_lot(strict, donneurs_mixtes):
+    lot = strict.encode_batch(donneurs_mixtes)
+    np.testing.assert_array_equal(np.vstack([strict.encode(donneur) for donneur in donneurs_mixtes]), lot)
+
+
+def test_variantes_reconnues_en_mode_normalise(main_module, modele, pipeline, strict):
+    # Mode normalized : une variante d'écriture se résout vers sa catégorie (si sa forme normalisée
+    # est unique : sinon la première catégorie l'emporte) ; en mode exact elle reste inconnue
+    souple = construire(main_module, modele, pipeline, match="normalized")
+    verifiees = 0
+    for colonne, index in souple.vocabularies.items():
+        formes = Counter(normalize(categorie) for categorie in index.categories)
+        for code, categorie in enumerate(index.categories):
+            variante = "  " + str(categorie).upper() + " "
+            if not isinstance(categorie, str) or formes[normalize(categorie)] > 1 or variante in index.codes:
+                continue
+            assert index.lookup(variante) == code, (colonne, categorie)
+            assert strict.vocabularies[colonne].lookup(variante) == UNKNOWN, (colonne, categorie)
+            verifiees += 1
+    assert verifiees > 100
+
+
+def test_etat_exporte(main_module, modele, pipeline, strict, donneurs_mixtes):
+    copie = FeatureEncoder.from_state(strict.get_state(), strict.template, main_module.SOURCES_ENCODEUR,
+                                      {"match": "exact"})
+    np.testing.assert_array_equal(copie.encode_batch(donneurs_mixtes), strict.encode_batch(donneurs_mixtes))
+    assert copie.columns == strict.columns and copie.spans == strict.spans
+
+
+def test_encodeur_servi_comme_le_pipeline(main_module, modele, pipeline, variantes):
+    # Configuration par défaut (VOCABULARY_MATCH=exact) : une variante d'écriture est ignorée comme
+    # par le OneHotEncoder, le moteur compilé et MODEL_ENGINE=sklearn donnent les mêmes probabilités
+    assert main_module.OPTIONS_VOCABULAIRE["match"] == "exact"
+    servi = construire(main_module, modele, pipeline, **main_module.OPTIONS_VOCABULAIRE)
+    donnees = main_module.construire_dataframe([main_module.preparer_donnees_modele(donneur) for donneur in variantes],
+                                               modele.required_columns)
+    np.testing.assert_array_equal(servi.encode_batch(variantes),
+                                  pipeline.named_steps["preprocessor"].transform(donnees).astype(np.float32))
+    ecart = np.abs(modele.compiled_model.predict_proba_matrix(modele.feature_encoder.encode_batch(variantes))
+                   - pipeline.predict_proba(donnees)).max()
+    assert ecart <= 1e-9
+
+
+def test_api_identique_au_dataframe(main_module, modele, donneurs_modele, monkeypatch):
+    # Champs hors des énumérations de l'API retirés (valeur par défaut du schéma)
+    lot = []
+    for donneur in donneurs_modele[:200]:
+        donneur = {cle: valeur for cle, valeur in donneur.items() if valeur is not None}
+        try:
+            main_module.DonneurInput(**donneur)
+        except ValidationError as e:
+            for erreur in e.errors():
+                donneur.pop(erreur["loc"][0], None)
+        if "genre" in donneur and "deja_donne" in donneur:
+            lot.append(donneur)
+    assert len(lot) >= 100
+
+    async def predire():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            reponse = await client.post("/predict/batch", json=lot)
+        assert reponse.status_code == 200
+        return reponse.json()
+
+    encode = asyncio.run(predire())
+    # Sans encodeur : retour au DataFrame construit à la main
+    monkeypatch.setattr(modele, "feature_encoder", None)
+    monkeypatch.setattr(modele, "compiled_model", None)
+    dataframe = asyncio.run(predire())
+    # Moteur compilé contre sklearn : probabilités égales à 1e-9 près
+    for a, b in zip(dataframe, encode):
+        assert a == {**b, "confidence": pytest.approx(b["confidence"], abs=1e-7)}
+    assert len(dataframe) == len(encode)
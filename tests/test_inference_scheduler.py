@@ -0,0 +1,174 @@
+# tests/test_inference_scheduler.py - Planificateur d'inférence : micro-batching, admission et réponses 503
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from inference_scheduler import FileAttentePleine, InferenceScheduler
+
+
+def doubler(lignes):
+    return [2 * ligne for ligne in lignes]
+
+
+def test_micro_batching():
+    tailles = []
+
+    async def scenario():
+        planificateur = InferenceScheduler(doubler, max_workers=2, max_batch_size=8, max_wait_ms=20.0,
+                                           on_batch=lambda taille, attentes, duree: tailles.append(taille))
+        await planificateur.start()
+        try:
+            return await asyncio.gather(*(planificateur.submit(i) for i in range(40))), planificateur
+        finally:
+            await planificateur.stop()
+
+    resultats, planificateur = asyncio.run(scenario())
+    assert resultats == [2 * i for i in range(40)]
+    assert sum(tailles) == 40 and max(tailles) <= 8 and len(tailles) < 40
+    assert planificateur.rows_executed == 40 and planificateur.batches_executed == len(tailles)
+
+
+def test_file_pleine():
+    liberation = threading.Event()
+
+    def bloquer(lignes):
+        liberation.wait(5)
+        return lignes
+
+    async def scenario():
+        planificateur = InferenceScheduler(bloquer, max_workers=1, max_batch_size=1, max_wait_ms=0.0,
+                                           max_queue_size=2)
+        await planificateur.start()
+        try:
+            # Une ligne en cours d'exécution et une retenue par le collecteur (worker occupé)...
+            en_cours = [asyncio.ensure_future(planificateur.submit(i)) for i in range(2)]
+            await asyncio.sleep(0)
+            while planificateur.queue_size:
+                await asyncio.sleep(0.001)
+            # ... puis deux en file : la suivante est refusée
+            en_cours += [asyncio.ensure_future(planificateur.submit(i)) for i in range(2, 4)]
+            await asyncio.sleep(0)
+            assert planificateur.queue_size == 2
+            with pytest.raises(FileAttentePleine):
+                await planificateur.submit(4)
+            liberation.set()
+            return await asyncio.gather(*en_cours), planificateur.rejected
+        finally:
+            liberation.set()
+            await planificateur.stop()
+
+    assert asyncio.run(scenario()) == ([0, 1, 2, 3], 1)
+
+
+def test_admission_des_appels_directs():
+    liberation = threading.Event()
+    demarres = []
+
+    def lot(i):
+        demarres.append(i)
+        liberation.wait(5)
+        return i
+
+    async def scenario():
+        # 3 workers : 2 créneaux pour les appels directs, 1 réservé au micro-batching ; 1 appel en attente
+        planificateur = InferenceScheduler(doubler, max_workers=3, max_wait_ms=0.0, max_run_queue=1)
+        await planificateur.start()
+        try:
+            appels = [asyncio.ensure_future(planificateur.run(lot, i)) for i in range(3)]
+            while len(demarres) < 2 or not planificateur.run_queue_full:
+                await asyncio.sleep(0.001)
+            assert planificateur.stats()["runs_waiting"] == 1
+
+            # Appels directs refusés au-delà de la file ; une ligne seule passe par le worker réservé
+            with pytest.raises(FileAttentePleine):
+                await planificateur.run(lot, 3)
+            # Même vérification avant de commencer un flux, comptée de la même façon
+            with pytest.raises(FileAttentePleine):
+                planificateur.admit()
+            assert await asyncio.wait_for(planificateur.submit(21), 2) == 42
+
+            # Suite d'un flux déjà admis : attend sa place au lieu d'être refusée
+            suite = asyncio.ensure_future(planificateur.run(lot, 4, block=True))
+            await asyncio.sleep(0.01)
+            assert not suite.done()
+            liberation.set()
+            return await asyncio.gather(*appels, suite), planificateur.rejected, planificateur.stats()
+        finally:
+            liberation.set()
+            await planificateur.stop()
+
+    resultats, rejetes, stats = asyncio.run(scenario())
+    assert resultats == [0, 1, 2, 4] and rejetes == 2
+    assert stats["runs_waiting"] == 0 and stats["max_run_queue"] == 1
+
+
+def test_arret_previent_le_lot_retenu():
+    liberation = threading.Event()
+
+    def bloquer(lignes):
+        liberation.wait(5)
+        return lignes
+
+    async def scenario():
+        planificateur = InferenceScheduler(bloquer, max_workers=1, max_batch_size=1, max_wait_ms=0.0)
+        await planificateur.start()
+        en_cours = asyncio.ensure_future(planificateur.submit(0))
+        await asyncio.sleep(0)
+        while planificateur.queue_size:
+            await asyncio.sleep(0.001)
+        # Retirée de la file par le collecteur, qui attend que le worker se libère
+        retenue = asyncio.ensure_future(planificateur.submit(1))
+        await asyncio.sleep(0)
+        while planificateur.queue_size:
+            await asyncio.sleep(0.001)
+        arret = asyncio.ensure_future(planificateur.stop())
+        # La ligne retenue échoue dès l'annulation du collecteur, sans attendre la fin du lot en cours
+        with pytest.raises(FileAttentePleine):
+            await asyncio.wait_for(retenue, 2)
+        liberation.set()
+        await arret
+        return await en_cours
+
+    try:
+        assert asyncio.run(scenario()) == 0
+    finally:
+        liberation.set()
+
+
+@pytest.fixture
+def client_sature(main_module, monkeypatch):
+    """Client de l'application dont le planificateur refuse toute nouvelle inférence."""
+    planificateur = main_module.inference_scheduler
+
+    async def refuser(*args, **kwargs):
+        planificateur.rejected += 1
+        raise FileAttentePleine("File d'attente d'inférence pleine")
+
+    monkeypatch.setattr(InferenceScheduler, "run_queue_full", property(lambda self: True))
+    monkeypatch.setattr(planificateur, "submit", refuser)
+    main_module.prediction_cache.invalidate()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main_module.app), base_url="http://t")
+
+
+def test_503_service_sature(main_module, client_sature):
+    from benchmark.payloads import generate_payloads
+    donneurs = generate_payloads(5, profil="modele", seed=23)
+    version = main_module.registry.active_version
+
+    async def scenario():
+        async with client_sature as client:
+            return [
+                await client.post(f"/predict?model={version}", json=donneurs[0]),
+                await client.post(f"/predict/batch?model={version}", json=donneurs),
+                await client.post(f"/predict/stream?model={version}", content=b"{}\n",
+                                  headers={"content-type": "application/x-ndjson"}),
+            ]
+
+    avant = main_module.inference_scheduler.rejected
+    reponses = asyncio.run(scenario())
+    assert [r.status_code for r in reponses] == [503, 503, 503]
+    assert all(r.headers["retry-after"] == "1" for r in reponses)
+    assert reponses[0].json() == {"detail": "Service saturé, veuillez réessayer"}
+    assert main_module.inference_scheduler.rejected == avant + 3
@@ -0,0 +1,49 @@
+# tests/test_json_responses.py - Réponses de prédiction : mêmes octets avec orjson et avec le module json
+import asyncio
+import json
+
+import httpx
+import pytest
+
+
+@pytest.fixture
+def requetes(main_module):
+    from benchmark.payloads import generate_payloads
+    donneurs = generate_payloads(40, profil="mixte", seed=41)
+    version = main_module.registry.active_version
+
+    async def envoyer():
+        main_module.prediction_cache.invalidate()
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            reponses = [await client.post(f"/predict?model={version}", json=donneur) for donneur in donneurs[:10]]
+            reponses.append(await client.post(f"/predict?model={version}&explain=true", json=donneurs[0]))
+            reponses.append(await client.post(f"/predict/batch?model={version}", json=donneurs))
+            reponses.append(await client.post(f"/predict/batch?model={version}&explain=true", json=donneurs))
+        await main_module.inference_scheduler.stop()
+        return reponses
+
+    return envoyer
+
+
+def test_orjson_et_json_identiques(main_module, requetes, monkeypatch):
+    pytest.importorskip("orjson")
+    avec_orjson = asyncio.run(requetes())
+    monkeypatch.setattr(main_module, "orjson", None)
+    avec_json = asyncio.run(requetes())
+
+    for a, b in zip(avec_orjson, avec_json):
+        assert a.status_code == b.status_code == 200
+        assert a.headers["content-type"] == b.headers["content-type"] == "application/json"
+        assert a.content == b.content
+    # Le texte est de l'UTF-8 non échappé, comme le reste de l'API
+    assert "Éligible".encode("utf-8") in b"".join(r.content for r in avec_json)
+
+
+def test_sortie_conforme_au_schema(main_module, requetes):
+    # Réponses construites sans revalidation par FastAPI : elles doivent déjà respecter PredictionOutput
+    for reponse in asyncio.run(requetes()):
+        contenu = json.loads(reponse.content)
+        for resultat in contenu if isinstance(contenu, list) else [contenu]:
+            main_module.PredictionOutput(**resultat)
+            assert set(resultat) <= set(main_module.PredictionOutput.__fields__)
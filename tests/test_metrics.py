@@ -0,0 +1,89 @@
+# tests/test_metrics.py - Format d'exposition de /metrics : étiquettes, histogrammes et jauges
+import asyncio
+
+import httpx
+
+from metrics import MetricsRegistry
+
+
+def lignes(registre):
+    return registre.render().splitlines()
+
+
+def test_echappement_des_etiquettes():
+    registre = MetricsRegistry()
+    compteur = registre.counter("erreurs", "Erreurs par message", ["message"])
+    compteur.labels('chemin "C:\\modeles"\nfin').inc(2)
+    assert lignes(registre) == [
+        "# HELP erreurs_total Erreurs par message",
+        "# TYPE erreurs_total counter",
+        'erreurs_total{message="chemin \\"C:\\\\modeles\\"\\nfin"} 2',
+    ]
+
+
+def test_series_histogramme():
+    registre = MetricsRegistry()
+    duree = registre.histogram("duree_seconds", "Durée", ["route"], buckets=(0.1, 1.0))
+    for valeur in (0.05, 0.1, 0.5, 3.0):
+        duree.labels("/predict").observe(valeur)
+    assert lignes(registre)[2:] == [
+        # Bornes cumulatives, la borne elle-même incluse, puis +Inf, _sum et _count
+        'duree_seconds_bucket{route="/predict",le="0.1"} 2',
+        'duree_seconds_bucket{route="/predict",le="1"} 3',
+        'duree_seconds_bucket{route="/predict",le="+Inf"} 4',
+        'duree_seconds_sum{route="/predict"} 3.65',
+        'duree_seconds_count{route="/predict"} 4',
+    ]
+    assert lignes(registre)[1] == "# TYPE duree_seconds histogram"
+
+
+def test_series_sans_etiquette():
+    registre = MetricsRegistry()
+    registre.counter("demarrages", "Démarrages")
+    registre.histogram("taille", "Taille", buckets=(1, 2))
+    # Une série sans étiquette est exportée même avant la première observation
+    assert lignes(registre)[2] == "demarrages_total 0"
+    assert lignes(registre)[5:] == ['taille_bucket{le="1"} 0', 'taille_bucket{le="2"} 0',
+                                    'taille_bucket{le="+Inf"} 0', "taille_sum 0", "taille_count 0"]
+
+
+def test_jauges_evaluees_a_l_export():
+    etat = {"file": 3}
+    registre = MetricsRegistry()
+    registre.gauge("file", "Taille de la file", lambda: etat["file"])
+    registre.gauge("issues_total", "Issues", lambda: {"written": 5, "dropped": 1}, ["outcome"], kind="counter")
+    registre.gauge("modele", "Modèle actif", lambda: {("v1", "a"): 1, ("v2", "b"): 0}, ["version", "nom"])
+    registre.gauge("indisponible", "Lève une exception", lambda: 1 / 0)
+
+    etat["file"] = 7
+    assert lignes(registre) == [
+        "# HELP file Taille de la file", "# TYPE file gauge", "file 7",
+        "# HELP issues_total Issues", "# TYPE issues_total counter",
+        'issues_total{outcome="written"} 5', 'issues_total{outcome="dropped"} 1',
+        "# HELP modele Modèle actif", "# TYPE modele gauge",
+        'modele{version="v1",nom="a"} 1', 'modele{version="v2",nom="b"} 0',
+    ]
+    assert registre.gauge("infini", "Valeurs spéciales", lambda: float("inf")).render()[-1] == "infini +Inf"
+
+
+def test_route_metrics(main_module):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            await client.get("/")
+            return await client.get("/metrics")
+
+    reponse = asyncio.run(scenario())
+    assert reponse.status_code == 200
+    assert reponse.headers["content-type"] == MetricsRegistry.CONTENT_TYPE
+    texte = reponse.text
+    assert texte.endswith("\n")
+    assert 'http_requests_total{method="GET",route="/",status="200"}' in texte
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/",le="+Inf"}' in texte
+    assert "# TYPE inference_queue_size gauge" in texte
+    # Chaque série est précédée de son HELP et de son TYPE
+    noms = {ligne.split()[2] for ligne in texte.splitlines() if ligne.startswith("# TYPE")}
+    for ligne in texte.splitlines():
+        if not ligne.startswith("#"):
+            nom = ligne.split("{")[0].split(" ")[0]
+            assert nom in noms or nom.rsplit("_", 1)[0] in noms
@@ -0,0 +1,139 @@
+# tests/test_model_registry.py - Registre des versions : résolution, rechargement, bascule et routes d'administration
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from model_registry import ModelRegistry, ModeleIndisponible, ModeleInconnu
+
+
+def artefact(dossier, version, contenu):
+    chemin = os.path.join(dossier, f"eligibility_model_{version}.pkl")
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write(contenu)
+    return chemin
+
+
+def lire(artifact, **options):
+    with open(artifact.model_path, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def registre(tmp_path):
+    for version in ("random_forest_20250101_120000", "random_forest_20250323_104955",
+                    "gradient_boosting_20250323_104955", "xgboost_20240101_000000"):
+        artefact(str(tmp_path), version, version)
+    changements = []
+    registre = ModelRegistry(str(tmp_path), lire, default="gradient_boosting", on_change=changements.append)
+    registre.changements = changements
+    registre.scan()
+    return registre
+
+
+def test_resolution(registre):
+    assert registre.resolve("xgboost_20240101_000000") == "xgboost_20240101_000000"
+    # Nom ou préfixe : la version la plus récente l'emporte
+    assert registre.resolve("random_forest") == "random_forest_20250323_104955"
+    assert registre.resolve("random_forest_20250101") == "random_forest_20250101_120000"
+    assert registre.default_version() == "gradient_boosting_20250323_104955"
+    with pytest.raises(ModeleInconnu):
+        registre.resolve("svm")
+    # Sans nom : la version active, qui n'existe pas encore
+    with pytest.raises(ModeleIndisponible):
+        registre.resolve()
+
+
+def test_bascule_et_invalidation(registre):
+    registre.refresh(background=False)
+    assert registre.active_version == "gradient_boosting_20250323_104955"
+    assert registre.get() == "gradient_boosting_20250323_104955"
+    # Première activation : rien à invalider
+    assert registre.changements == []
+
+    registre.activate(registre.resolve("xgboost"))
+    assert registre.get() == "xgboost_20240101_000000"
+    assert registre.changements == ["xgboost_20240101_000000"]
+    # Réactiver la version active ne change rien
+    registre.activate("xgboost_20240101_000000")
+    assert registre.changements == ["xgboost_20240101_000000"]
+
+
+def test_activation_d_une_version_non_chargee(registre):
+    with pytest.raises(ModeleIndisponible):
+        registre.activate("xgboost_20240101_000000")
+    with pytest.raises(ModeleIndisponible):
+        registre.get("xgboost")
+
+
+def test_refresh_recharge_l_artefact_modifie(registre, tmp_path):
+    registre.refresh(background=False)
+    active = registre.active_version
+    chemin = registre.artifacts[active].model_path
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write("réentraîné")
+    os.utime(chemin, ns=(1, os.stat(chemin).st_mtime_ns + 10 ** 9))
+    # Nouvelle version déposée dans le dossier pendant que le service tourne
+    artefact(str(tmp_path), "svm_20250401_000000", "svm")
+
+    registre.refresh(background=False)
+    assert registre.get() == "réentraîné" and registre.active_version == active
+    assert registre.get("svm") == "svm"
+    # Version rechargée : les résultats mis en cache pour elle sont invalidés
+    assert registre.changements == [active]
+
+
+def test_erreur_de_chargement(tmp_path):
+    artefact(str(tmp_path), "random_forest_20250101_120000", "")
+
+    def echouer(artifact):
+        raise ValueError("artefact corrompu")
+
+    registre = ModelRegistry(str(tmp_path), echouer)
+    registre.refresh(background=False)
+    statut, = registre.status()
+    assert statut["status"] == "erreur" and statut["error"] == "artefact corrompu"
+    assert registre.active_version is None
+
+
+def test_statut_sans_chemins(registre, tmp_path):
+    registre.refresh(background=False)
+    for statut in registre.status():
+        assert statut["model_file"] == f"eligibility_model_{statut['version']}.pkl"
+        assert str(tmp_path) not in str(statut)
+
+
+def test_routes_d_administration(main_module, monkeypatch):
+    version = main_module.registry.active_version
+
+    async def appeler(entetes=None):
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t", headers=entetes) as client:
+            return [
+                await client.post("/models/reload"),
+                await client.post(f"/models/{version}/activate"),
+                await client.post(f"/models/{version}/shadow"),
+                await client.delete("/models/shadow"),
+            ], await client.get("/models")
+
+    # Sans ADMIN_TOKEN : routes désactivées ; la liste reste publique, sans chemins sur le disque
+    monkeypatch.setattr(main_module, "ADMIN_TOKEN", "")
+    reponses, liste = asyncio.run(appeler({"X-Admin-Token": "quelconque"}))
+    assert [r.status_code for r in reponses] == [403] * 4
+    assert liste.status_code == 200
+    assert main_module.MODEL_DIR not in liste.text and os.path.abspath(main_module.MODEL_DIR) not in liste.text
+
+    monkeypatch.setattr(main_module, "ADMIN_TOKEN", "secret")
+    reponses, _ = asyncio.run(appeler())
+    assert [r.status_code for r in reponses] == [401] * 4
+    reponses, _ = asyncio.run(appeler({"X-Admin-Token": "mauvais"}))
+    assert [r.status_code for r in reponses] == [401] * 4
+
+    async def activer():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return await client.post(f"/models/{version}/activate", headers={"X-Admin-Token": "secret"})
+
+    reponse = asyncio.run(activer())
+    assert reponse.status_code == 200 and reponse.json() == {"active": version}
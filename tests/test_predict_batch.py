@@ -0,0 +1,57 @@
+# tests/test_predict_batch.py - /predict/batch : mêmes réponses que /predict appelé donneur par donneur
+import asyncio
+import random
+
+import httpx
+
+CONDITIONS = ["porteur_vih_hbs_hcv", "diabetique", "hypertendu", "asthmatique", "drepanocytaire", "cardiaque",
+              "transfusion", "tatoue", "scarifie"]
+
+
+def donneurs(main_module, n, graine):
+    """Exemples du schéma modifiés au hasard : une partie est écartée par les règles d'exclusion,
+    le reste est noté par le modèle (éligibles et non éligibles)."""
+    aleatoire = random.Random(graine)
+    exemples = [exemple["value"] for exemple in main_module.DonneurInput.Config.schema_extra["examples"].values()]
+    resultat = []
+    for _ in range(n):
+        donneur = dict(aleatoire.choice(exemples))
+        donneur["age"] = aleatoire.randint(18, 70)
+        donneur["genre"] = aleatoire.choice(list(main_module.Genre)).value
+        donneur["deja_donne"] = aleatoire.choice(list(main_module.DejaFaitDon)).value
+        donneur["taux_hemoglobine"] = round(aleatoire.uniform(11.0, 17.0), 1)
+        for condition in CONDITIONS:
+            donneur[condition] = aleatoire.random() < 0.04
+        resultat.append(donneur)
+    return resultat
+
+
+def test_lot_identique_aux_predictions_unitaires(main_module):
+    lot = donneurs(main_module, 200, graine=3)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            reponse = await client.post("/predict/batch", json=lot)
+            unitaires = [await client.post("/predict", json=donneur) for donneur in lot]
+        return reponse, unitaires
+
+    reponse, unitaires = asyncio.run(scenario())
+    assert reponse.status_code == 200 and all(r.status_code == 200 for r in unitaires)
+    resultats = reponse.json()
+    assert resultats == [r.json() for r in unitaires]
+    # Les deux chemins sont couverts : lignes écartées par une règle et lignes notées par le modèle
+    regles = [unitaire.json() for unitaire, donneur in zip(unitaires, lot)
+              if any(donneur[condition] for condition in ("porteur_vih_hbs_hcv", "drepanocytaire", "cardiaque"))]
+    assert len(regles) >= 10 and all(r["confidence"] == 100.0 for r in regles)
+    assert {r["prediction"] for r in resultats} == {"Éligible", "Non éligible"}
+
+
+def test_lot_vide(main_module):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return await client.post("/predict/batch", json=[])
+
+    reponse = asyncio.run(scenario())
+    assert reponse.status_code == 200 and reponse.json() == []
@@ -0,0 +1,106 @@
+# tests/test_prediction_cache.py - Cache des probabilités : LRU, durée de vie, clés par modèle et invalidation
+import asyncio
+
+import httpx
+import numpy as np
+
+import prediction_cache as module_cache
+from prediction_cache import PredictionCache
+
+
+def ligne(*valeurs):
+    return np.array(valeurs, dtype=np.float64)
+
+
+def test_lru():
+    cache = PredictionCache(max_size=2)
+    a, b, c = (cache.key(ligne(i, 0.5)) for i in range(3))
+    cache.put(a, "A")
+    cache.put(b, "B")
+    assert cache.get(a) == "A"
+    # `a` vient d'être lu : c'est `b` qui sort
+    cache.put(c, "C")
+    assert cache.get(b) is None and cache.get(a) == "A" and cache.get(c) == "C"
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1, 1)
+
+
+def test_expiration(monkeypatch):
+    horloge = [100.0]
+    monkeypatch.setattr(module_cache.time, "monotonic", lambda: horloge[0])
+    cache = PredictionCache(max_size=10, ttl_seconds=60.0)
+    cle = cache.key(ligne(1.0))
+    cache.put(cle, "A")
+    horloge[0] += 59.0
+    assert cache.get(cle) == "A"
+    # La lecture ne prolonge pas la durée de vie
+    horloge[0] += 2.0
+    assert cache.get(cle) is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["size"] == 0
+
+
+def test_cles_par_modele():
+    cache = PredictionCache()
+    # Même ligne, autre artefact : autre clé ; mêmes octets : même clé, même pour une vue non contiguë
+    assert cache.key(ligne(1, 2), "v1:10") != cache.key(ligne(1, 2), "v2:10")
+    assert cache.key(ligne(1, 2), "v1") == cache.key(np.array([[1, 9], [2, 9]], dtype=np.float64)[:, 0], "v1")
+    assert cache.key(ligne(1, 2), "v1") != cache.key(ligne(1, 3), "v1")
+    assert cache.key([1, 2]) is None
+    desactive = PredictionCache(max_size=0)
+    assert not desactive.enabled and desactive.key(ligne(1)) is None
+    desactive.put(None, "A")
+    assert desactive.get(None) is None and desactive.stats()["size"] == 0
+
+
+def test_invalidation():
+    cache = PredictionCache()
+    cle = cache.key(ligne(1.0))
+    cache.put(cle, "A")
+    cache.invalidate()
+    assert cache.get(cle) is None and cache.stats()["invalidations"] == 1
+
+
+def test_cache_de_l_api(main_module):
+    donneur = main_module.DonneurInput.Config.schema_extra["examples"]["donneur_eligible"]["value"]
+    cache = main_module.prediction_cache
+    cache.invalidate()
+    avant = cache.stats()
+
+    async def predire():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            reponses = [await client.post("/predict", json=donneur) for _ in range(2)]
+            reponses.append(await client.post("/predict/batch", json=[donneur]))
+            return reponses, (await client.get("/cache/stats")).json()
+
+    (premiere, seconde, lot), stats = asyncio.run(predire())
+    assert premiere.status_code == 200 and premiere.json() == seconde.json() == lot.json()[0]
+    assert stats["size"] == 1
+    assert (stats["hits"] - avant["hits"], stats["misses"] - avant["misses"]) == (2, 1)
+
+
+def test_cache_de_l_api_vide_au_rechargement(main_module):
+    from benchmark.payloads import generate_payloads
+    donneur = generate_payloads(1, profil="modele", seed=37)[0]
+    cache, registre = main_module.prediction_cache, main_module.registry
+    version = registre.active_version
+    cache.invalidate()
+
+    async def predire():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            reponses = [await client.post(f"/predict?model={version}", json=donneur) for _ in range(2)]
+        await main_module.inference_scheduler.stop()
+        return reponses
+
+    premiere, seconde = asyncio.run(predire())
+    assert premiere.json() == seconde.json()
+    stats = cache.stats()
+    assert stats["size"] == 1 and stats["hits"] >= 1
+
+    # Artefact rechargé (ici de force, comme après sa modification sur disque) : les probabilités
+    # de l'ancien objet ne sont plus servies
+    registre.load(version, engine=main_module.MODEL_ENGINE)
+    assert cache.stats()["size"] == 0 and cache.stats()["invalidations"] == stats["invalidations"] + 1
+    troisieme = asyncio.run(predire())[0]
+    assert troisieme.json() == premiere.json()
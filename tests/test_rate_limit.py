@@ -0,0 +1,127 @@
+# tests/test_rate_limit.py - Limiteur de débit : seaux, identification des clients, réponses 429
+import asyncio
+
+import httpx
+import pytest
+
+from rate_limit import RateLimiter, RateLimitMiddleware, parse_rules
+
+
+def portee(*entetes, client="10.0.0.1"):
+    return {"headers": [(nom.encode(), valeur.encode()) for nom, valeur in entetes], "client": (client, 1234)}
+
+
+def test_regles():
+    assert parse_rules("/predict/batch=2/10, /=5") == {"/predict/batch": (2.0, 10.0), "/": (5.0, 5.0)}
+    for texte in ("/predict", "/predict=0/1", "/predict=1/0.5", "/predict=x/2"):
+        with pytest.raises(ValueError):
+            parse_rules(texte)
+    limiteur = RateLimiter(parse_rules("/predict/batch=2/10,/predict=20/40,/=50/100"), exempt=["/metrics"])
+    assert limiteur.route("/predict") == "/predict"
+    assert limiteur.route("/predict/batch") == "/predict/batch"
+    assert limiteur.route("/predict/stream") == "/predict"
+    assert limiteur.route("/predictions") == "/"
+    assert limiteur.route("/metrics") is None
+
+
+def test_seau_a_jetons():
+    limiteur = RateLimiter({"/": (2.0, 3.0)})
+    assert [limiteur.acquire("a", "/", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiteur.acquire("a", "/", now=0.0) == pytest.approx(0.5)
+    # Autre client : son propre seau
+    assert limiteur.acquire("b", "/", now=0.0) == 0.0
+    # Une demi-seconde plus tard, un jeton est revenu (et un seul)
+    assert limiteur.acquire("a", "/", now=0.5) == 0.0
+    assert limiteur.acquire("a", "/", now=0.5) > 0
+
+
+def test_clients_oublies_au_dela_de_la_borne():
+    limiteur = RateLimiter({"/": (1.0, 1.0)}, max_clients=2)
+    for client in ("a", "b", "c"):
+        limiteur.acquire(client, "/", now=0.0)
+    assert limiteur.clients == 2
+    # « a », le moins récemment utilisé, repart avec un seau plein
+    assert limiteur.acquire("a", "/", now=0.0) == 0.0
+
+
+def test_cle_api_reconnue_seulement():
+    limiteur = RateLimiter(api_keys=["secrete"])
+    cle = limiteur.client(portee(("x-api-key", "secrete")))
+    assert cle.startswith("key:") and "secrete" not in cle
+    # Clé inconnue : ignorée, le client reste son adresse (changer de clé ne donne pas un seau neuf)
+    assert limiteur.client(portee(("x-api-key", "autre"))) == "10.0.0.1"
+    assert RateLimiter().client(portee(("x-api-key", "secrete"))) == "10.0.0.1"
+
+
+def test_x_forwarded_for():
+    entetes = ("x-forwarded-for", "6.6.6.6, 1.2.3.4")
+    # Sans mandataire de confiance : l'en-tête est ignoré
+    assert RateLimiter().client(portee(entetes)) == "10.0.0.1"
+    # Un mandataire : le saut qu'il a ajouté (le plus à droite), pas celui fourni par le client
+    assert RateLimiter(trust_proxy=1).client(portee(entetes)) == "1.2.3.4"
+    # Deux mandataires, en-têtes répétés : le deuxième saut en partant de la droite
+    limiteur = RateLimiter(trust_proxy=2)
+    assert limiteur.client(portee(("x-forwarded-for", "6.6.6.6, 1.2.3.4"), ("x-forwarded-for", "10.1.1.1"))) == "1.2.3.4"
+    assert limiteur.client(portee(("x-forwarded-for", "1.2.3.4"))) == "1.2.3.4"
+    assert RateLimiter(trust_proxy=1).client(portee()) == "10.0.0.1"
+
+
+def test_configuration_par_environnement(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_API_KEYS", "a, b,")
+    monkeypatch.setenv("RATE_LIMIT_TRUST_PROXY", "true")
+    limiteur = RateLimiter.from_env()
+    assert limiteur.api_keys == {b"a", b"b"} and limiteur.trust_proxy == 1
+    monkeypatch.setenv("RATE_LIMIT_TRUST_PROXY", "2")
+    assert RateLimiter.from_env().trust_proxy == 2
+    monkeypatch.setenv("RATE_LIMIT_TRUST_PROXY", "non")
+    assert RateLimiter.from_env().trust_proxy == 0
+
+
+async def application_lente(scope, receive, send, liberation: asyncio.Event):
+    await liberation.wait()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def test_plafond_inferences_429():
+    async def scenario():
+        liberation = asyncio.Event()
+        limiteur = RateLimiter(enabled=False, max_in_flight=2)
+        app = RateLimitMiddleware(lambda s, r, e: application_lente(s, r, e, liberation), limiteur)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+            en_cours = [asyncio.ensure_future(client.post("/predict")) for _ in range(2)]
+            while limiteur.in_flight < 2:
+                await asyncio.sleep(0.001)
+            refusee = await client.post("/predict/batch")
+            # Hors des routes d'inférence : pas de plafond
+            liberation.set()
+            autre = await client.get("/models")
+            reponses = await asyncio.gather(*en_cours)
+        return refusee, autre, reponses, limiteur
+
+    refusee, autre, reponses, limiteur = asyncio.run(scenario())
+    assert refusee.status_code == 429 and refusee.headers["retry-after"] == "1"
+    assert autre.status_code == 200 and [r.status_code for r in reponses] == [200, 200]
+    assert limiteur.in_flight == 0 and limiteur.counts["/predict/batch", "overloaded"] == 1
+
+
+def test_429_sur_l_application(main_module, monkeypatch):
+    limiteur = main_module.limiteur
+    monkeypatch.setattr(limiteur, "enabled", True)
+    monkeypatch.setattr(limiteur, "rules", {"/": (0.001, 2.0)})
+    monkeypatch.setattr(limiteur, "_prefixes", ["/"])
+    monkeypatch.setattr(limiteur, "_routes", {})
+    monkeypatch.setattr(limiteur, "_buckets", type(limiteur._buckets)())
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app, client=("192.0.2.10", 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            reponses = [await client.get("/") for _ in range(3)]
+            # Routes exemptées : jamais limitées
+            reponses.append(await client.get("/metrics"))
+        return reponses
+
+    reponses = asyncio.run(scenario())
+    assert [r.status_code for r in reponses] == [200, 200, 429, 200]
+    assert int(reponses[2].headers["retry-after"]) >= 1
+    assert reponses[2].json() == {"detail": "Trop de requêtes, veuillez ralentir"}
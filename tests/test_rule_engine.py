@@ -0,0 +1,73 @@
+# tests/test_rule_engine.py - Moteur de règles d'exclusion contre la chaîne de conditions d'origine
+import itertools
+
+import numpy as np
+import pytest
+
+from rule_engine import RuleEngine
+
+
+def chaine_initiale(input_data):
+    """Critères d'exclusion absolus tels qu'écrits dans predict_eligibility avant le moteur de règles."""
+    def exclu(raison, confiance):
+        return {"prediction": "Non éligible", "confidence": confiance,
+                "facteurs_importants": [raison], "raison_ineligibilite": raison}
+
+    if input_data.get('porteur_vih_hbs_hcv', False):
+        return exclu("Porteur de VIH, hépatite B ou C", 100.0)
+    if input_data.get('drepanocytaire', False):
+        return exclu("Drépanocytaire", 100.0)
+    if input_data.get('cardiaque', False):
+        return exclu("Problèmes cardiaques", 100.0)
+    genre = input_data.get('genre', '')
+    taux_hemoglobine = input_data.get('taux_hemoglobine', 0)
+    if (genre == "Homme" and taux_hemoglobine < 13.0) or (genre == "Femme" and taux_hemoglobine < 12.0):
+        return exclu("Taux d'hémoglobine insuffisant", 95.0)
+    return None
+
+
+@pytest.fixture(scope="module")
+def donneurs_limites():
+    """Toutes les combinaisons des champs lus par les règles, seuils d'hémoglobine et champs absents compris."""
+    donneurs = []
+    for vih, drepano, cardiaque, genre, taux in itertools.product(
+            (False, True, None), (False, True), (False, True), ("Homme", "Femme", "Autre", "", None),
+            (0.0, 11.99, 12.0, 12.5, 12.99, 13.0, 16.0, None)):
+        donneur = {"porteur_vih_hbs_hcv": vih, "drepanocytaire": drepano, "cardiaque": cardiaque,
+                   "genre": genre, "taux_hemoglobine": taux}
+        # None : champ absent (valeur par défaut des règles)
+        donneurs.append({champ: valeur for champ, valeur in donneur.items() if valeur is not None})
+    return donneurs
+
+
+def test_ligne_par_ligne(main_module, donneurs_limites, donneurs_mixtes):
+    for donneur in donneurs_limites + donneurs_mixtes:
+        assert main_module.verifier_criteres_exclusion(donneur) == chaine_initiale(donneur), donneur
+
+
+def test_lot(main_module, donneurs_limites, donneurs_mixtes):
+    moteur = main_module.moteur_regles
+    donneurs = donneurs_limites + donneurs_mixtes
+    retenues, declenchees = moteur.evaluate_batch(donneurs)
+    for donneur, k, ligne in zip(donneurs, retenues.tolist(), declenchees):
+        attendu = chaine_initiale(donneur)
+        assert (moteur.rules[k].result() if k >= 0 else None) == attendu, donneur
+        # Règles déclenchées : les mêmes que l'évaluation d'un seul donneur
+        _, identifiants = moteur.evaluate(donneur)
+        assert [moteur.rules[j].id for j in np.flatnonzero(ligne)] == identifiants
+
+
+def test_premiere_regle_seulement():
+    moteur = RuleEngine([
+        {"id": "a", "reason": "A", "confidence": 100.0, "when": [["a"]]},
+        {"id": "b", "reason": "B", "confidence": 90.0, "when": [[("x", ">=", 2)], [("y", "==", "oui"), "b"]]},
+    ], defaults={"a": False, "b": False, "x": 0, "y": ""})
+    assert moteur.first_match({"a": True, "x": 5}).id == "a"
+    assert moteur.evaluate({"a": True, "x": 5})[1] == ["a", "b"]
+    assert moteur.first_match({"y": "oui"}) is None
+    assert moteur.first_match({"y": "oui", "b": 1}).id == "b"
+
+
+def test_operateur_inconnu():
+    with pytest.raises(ValueError):
+        RuleEngine([{"id": "a", "reason": "A", "confidence": 1.0, "when": [[("x", "~", 1)]]}])
@@ -0,0 +1,100 @@
+# tests/test_shadow.py - Notation en ombre : la réponse servie ne dépend jamais du modèle candidat
+import asyncio
+
+import httpx
+import pytest
+
+from shadow import ELIGIBLE, ShadowScorer
+
+
+@pytest.fixture(scope="module")
+def donneurs():
+    from benchmark.payloads import generate_payloads
+    return generate_payloads(40, profil="mixte", seed=41)
+
+
+def repondre(main_module, donneurs):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            reponses = [await client.post("/predict", json=donneur) for donneur in donneurs]
+        await main_module.notateur_ombre.stop()
+        await main_module.inference_scheduler.stop()
+        return reponses
+
+    reponses = asyncio.run(scenario())
+    assert all(reponse.status_code == 200 for reponse in reponses)
+    return [reponse.content for reponse in reponses]
+
+
+def test_reponse_inchangee_par_l_ombre(main_module, donneurs, monkeypatch):
+    attendues = repondre(main_module, donneurs)
+    vus = []
+
+    async def candidat(donneur, version):
+        # Candidat lent, en désaccord systématique, qui modifie ce qu'il reçoit et échoue parfois
+        await asyncio.sleep(0.01)
+        if main_module.moteur_regles.first_match(donneur) is not None:
+            return None
+        vus.append(dict(donneur))
+        donneur["age"] = -1
+        if len(vus) % 5 == 0:
+            raise RuntimeError("candidat en panne")
+        return {"prediction": "Non éligible", "confidence": 100.0}
+
+    notateur = ShadowScorer(candidat, version="candidat", max_pending=8)
+    monkeypatch.setattr(main_module, "notateur_ombre", notateur)
+    main_module.prediction_cache.invalidate()
+    # Réponses servies octet pour octet identiques, avec ou sans notation en ombre
+    assert repondre(main_module, donneurs) == attendues
+
+    stats = notateur.stats()["versions"]["candidat"]
+    notes = len(vus) - stats.get("errors", 0)
+    assert vus and notes == stats["rows"]
+    assert stats["rows"] + stats.get("errors", 0) + stats.get("not_applicable", 0) == len(donneurs)
+    assert stats["agreement_rate"] < 1.0
+
+
+def test_ombre_saturee_ignoree(main_module, donneurs, monkeypatch):
+    attendues = repondre(main_module, donneurs)
+
+    async def bloque(donneur, version):
+        await asyncio.sleep(3600)
+
+    notateur = ShadowScorer(bloque, version="candidat", max_pending=3)
+    monkeypatch.setattr(main_module, "notateur_ombre", notateur)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            reponses = [await client.post("/predict", json=donneur) for donneur in donneurs]
+        # Les évaluations en ombre en cours n'ont pas retenu les réponses
+        assert notateur.pending == 3
+        for tache in list(notateur._pending):
+            tache.cancel()
+        await main_module.inference_scheduler.stop()
+        return [reponse.content for reponse in reponses]
+
+    assert asyncio.run(scenario()) == attendues
+    assert notateur.stats()["versions"]["candidat"]["skipped"] == len(donneurs) - 3
+
+
+def test_predire_ombre_comme_la_version_servie(main_module, donneurs):
+    version = main_module.registry.active_version
+
+    async def scenario():
+        resultats = [await main_module.predire_ombre(dict(donneur), version) for donneur in donneurs]
+        servis = [await main_module.predict_eligibility_async(dict(donneur), version) for donneur in donneurs]
+        await main_module.inference_scheduler.stop()
+        return resultats, servis
+
+    resultats, servis = asyncio.run(scenario())
+    for resultat, servi, donneur in zip(resultats, servis, donneurs):
+        if main_module.moteur_regles.first_match(donneur) is not None:
+            # Écarté par une règle : réponse indépendante du modèle, rien à comparer
+            assert resultat is None
+        else:
+            assert resultat["prediction"] == servi["prediction"]
+            assert resultat["confidence"] == pytest.approx(servi["confidence"], abs=1e-9)
+    assert any(resultat is None for resultat in resultats)
+    assert any(resultat is not None and resultat["prediction"] == ELIGIBLE for resultat in resultats)
@@ -0,0 +1,71 @@
+# tests/test_static_responses.py - Réponses pré-encodées : ETag, If-None-Match et 304
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from static_responses import StaticResponse
+
+ROUTES = ["/features", "/model-info", "/openapi.json", "/docs", "/redoc"]
+
+
+def test_revalidation():
+    reponse = StaticResponse.json({"features": ["âge", "genre"]})
+    # Mêmes octets que JSONResponse, ETag fort dérivé du corps
+    assert reponse.body == '{"features":["âge","genre"]}'.encode("utf-8")
+    assert reponse.etag.startswith('"') and reponse.etag == StaticResponse(reponse.body).etag
+    assert reponse.etag != StaticResponse.json({"features": ["âge"]}).etag
+
+    assert reponse.not_modified(reponse.etag)
+    assert reponse.not_modified(f'"autre", W/{reponse.etag}')
+    assert reponse.not_modified("*")
+    assert not reponse.not_modified(None) and not reponse.not_modified("")
+    assert not reponse.not_modified('"autre"') and not reponse.not_modified(reponse.etag.strip('"'))
+
+
+@pytest.fixture
+def client(main_module):
+    return lambda: httpx.AsyncClient(transport=httpx.ASGITransport(app=main_module.app), base_url="http://t")
+
+
+def test_routes_statiques(main_module, client):
+    async def scenario():
+        async with client() as c:
+            premieres = {route: await c.get(route) for route in ROUTES}
+            revalidees = {route: await c.get(route, headers={"If-None-Match": premieres[route].headers["etag"]})
+                          for route in ROUTES}
+            perimees = {route: await c.get(route, headers={"If-None-Match": '"perime"'}) for route in ROUTES}
+            return premieres, revalidees, perimees
+
+    premieres, revalidees, perimees = asyncio.run(scenario())
+    for route in ROUTES:
+        premiere = premieres[route]
+        assert premiere.status_code == 200 and premiere.content
+        assert premiere.headers["etag"] and "cache-control" in premiere.headers
+        # Client à jour : 304 sans corps, avec le même ETag
+        assert revalidees[route].status_code == 304 and revalidees[route].content == b""
+        assert revalidees[route].headers["etag"] == premiere.headers["etag"]
+        # Version différente : corps complet, octets identiques
+        assert perimees[route].status_code == 200 and perimees[route].content == premiere.content
+
+    assert premieres["/features"].json() == {"features": main_module.obtenir_modele(None).required_columns}
+    assert premieres["/features"].headers["cache-control"] == main_module.STATIC_CACHE_CONTROL
+    assert premieres["/docs"].headers["content-type"].startswith("text/html")
+    assert json.loads(premieres["/openapi.json"].content)["paths"]["/predict"]
+
+
+def test_etag_par_version(main_module, client):
+    version = main_module.registry.active_version
+
+    async def scenario():
+        async with client() as c:
+            active = await c.get("/features")
+            epinglee = await c.get(f"/features?model={version}", headers={"If-None-Match": active.headers["etag"]})
+            inconnue = await c.get("/features?model=inconnu")
+            return active, epinglee, inconnue
+
+    active, epinglee, inconnue = asyncio.run(scenario())
+    # La version active et la même version épinglée partagent le corps et l'ETag
+    assert epinglee.status_code == 304
+    assert inconnue.status_code == 404
@@ -0,0 +1,138 @@
+# tests/test_stream_scoring.py - Lecture incrémentale NDJSON/CSV et notation de /predict/stream
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from stream_scoring import RecordParser, detect_format
+
+
+def lire(parser, donnees, taille):
+    """Enregistrements de `donnees` fournies par blocs de `taille` octets."""
+    records = []
+    for debut in range(0, len(donnees), taille):
+        records.extend(parser.feed(donnees[debut:debut + taille]))
+    return records + parser.close()
+
+
+NDJSON = ('{"id": 1, "age": 30}\n'
+          '\n'
+          '{"id": 2, "nom": "Ébodé"}\r\n'
+          '{invalide\n'
+          '[1, 2]\n'
+          '{"id": 3}').encode("utf-8")
+
+
+@pytest.mark.parametrize("taille", [1, 2, 3, 7, 64, len(NDJSON)])
+def test_decoupage_independant_des_blocs(taille):
+    records = lire(RecordParser("ndjson"), NDJSON, taille)
+    # Lignes numérotées dans le fichier (ligne vide ignorée), dernière ligne sans saut de ligne lue à la fermeture
+    assert [(ligne, champs) for ligne, champs, _ in records] == [
+        (1, {"id": 1, "age": 30}), (3, {"id": 2, "nom": "Ébodé"}), (4, None), (5, None), (6, {"id": 3})]
+    assert records[2][2].startswith("JSON invalide")
+    assert records[3][2] == "Un objet JSON est attendu sur chaque ligne"
+
+
+def test_caractere_multioctet_coupe_entre_deux_blocs():
+    donnees = '{"quartier": "Nkoléton"}\n'.encode("utf-8")
+    coupure = donnees.index("é".encode("utf-8")) + 1
+    parser = RecordParser("ndjson")
+    assert parser.feed(donnees[:coupure]) == []
+    assert parser.feed(donnees[coupure:]) == [(1, {"quartier": "Nkoléton"}, None)]
+
+
+def test_bom_en_debut_de_flux():
+    for fmt, donnees, attendu in (("ndjson", b'{"id": 1}\n', {"id": 1}),
+                                  ("csv", b"id,age\n7,30\n", {"id": "7", "age": "30"})):
+        bom = "﻿".encode("utf-8")
+        # Le BOM peut lui-même arriver en plusieurs blocs
+        assert [champs for _, champs, _ in lire(RecordParser(fmt), bom + donnees, 1)] == [attendu]
+    # Plus loin dans le flux, ce n'est plus un BOM : la ligne est invalide
+    records = lire(RecordParser("ndjson"), b'{"id": 1}\n' + "﻿".encode("utf-8") + b'{"id": 2}\n', 4)
+    assert records[1][1] is None and records[1][2].startswith("JSON invalide")
+
+
+def test_ligne_trop_longue():
+    longue = b'{"id": "' + b"x" * 100 + b'"}\n'
+    donnees = b'{"id": 1}\n' + longue + b'{"id": 3}\n'
+    for taille in (5, 16, len(donnees)):
+        records = lire(RecordParser("ndjson", max_line_bytes=50), donnees, taille)
+        # Signalée une seule fois avec son numéro, la lecture reprend à la ligne suivante
+        assert [(ligne, champs) for ligne, champs, _ in records] == [(1, {"id": 1}), (2, None), (3, {"id": 3})]
+        assert records[1][2] == "Ligne trop longue (> 50 octets)"
+
+    # Dernière ligne trop longue et sans saut de ligne
+    records = lire(RecordParser("ndjson", max_line_bytes=50), b'{"id": 1}\n' + longue.rstrip(), 8)
+    assert [ligne for ligne, _, _ in records] == [1, 2] and records[1][2].startswith("Ligne trop longue")
+
+
+def test_encodage_invalide():
+    records = lire(RecordParser("ndjson"), b'{"id": 1}\n{"nom": "\xe9"}\n{"id": 3}\n', 3)
+    assert [ligne for ligne, _, _ in records] == [1, 2, 3]
+    assert records[1][2].startswith("Encodage invalide")
+
+
+def test_csv_entete_et_guillemets():
+    donnees = ('id, age ,Genre,commentaire\r\n'
+               '1,30,Homme,simple\r\n'
+               '\r\n'
+               '2,,Femme,"sur\r\ndeux lignes, avec ""guillemets"""\r\n'
+               '3,40,Homme\r\n'
+               '4,50,Femme,fin').encode("utf-8")
+    for taille in (1, 5, len(donnees)):
+        records = lire(RecordParser("csv"), donnees, taille)
+        # En-tête nettoyé ; une cellule vide est un champ absent ; un enregistrement multiligne
+        # porte le numéro de sa première ligne
+        assert records == [
+            (2, {"id": "1", "age": "30", "Genre": "Homme", "commentaire": "simple"}, None),
+            (4, {"id": "2", "Genre": "Femme", "commentaire": 'sur\ndeux lignes, avec "guillemets"'}, None),
+            (6, None, "3 colonnes au lieu de 4"),
+            (7, {"id": "4", "age": "50", "Genre": "Femme", "commentaire": "fin"}, None),
+        ]
+
+
+def test_csv_guillemets_non_refermes():
+    records = lire(RecordParser("csv"), b'id,nom\n1,"ouvert\n2,b\n', 4)
+    assert records == [(2, None, "Guillemets non refermés en fin de fichier")]
+    records = lire(RecordParser("csv", max_line_bytes=20), b'id,nom\n1,"ouvert\n' + b"2,abcdef\n" * 5, 4)
+    assert records[0] == (2, None, "Guillemets non refermés")
+
+
+def test_format():
+    assert detect_format("text/csv; charset=utf-8") == "csv"
+    assert detect_format(filename="registre.CSV") == "csv"
+    assert detect_format("application/x-ndjson") == "ndjson" and detect_format() == "ndjson"
+    with pytest.raises(ValueError):
+        RecordParser("xml")
+
+
+def test_flux_avec_lignes_en_erreur(main_module):
+    from benchmark.payloads import generate_payloads
+    donneurs = generate_payloads(6, profil="modele", seed=31)
+    lignes = [json.dumps({**donneur, "id": f"D{i}"}) for i, donneur in enumerate(donneurs[:3])]
+    lignes += ['{"id": "X1", "age": "vingt"}', "{invalide", json.dumps({**donneurs[3], "id": "D3"})]
+    version = main_module.registry.active_version
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            flux = await client.post(f"/predict/stream?model={version}", content="\n".join(lignes).encode(),
+                                     headers={"content-type": "application/x-ndjson"})
+            lot = await client.post(f"/predict/batch?model={version}", json=donneurs[:4])
+        await main_module.inference_scheduler.stop()
+        return flux, lot
+
+    flux, lot = asyncio.run(scenario())
+    assert flux.status_code == 200
+    sorties = [json.loads(ligne) for ligne in flux.text.splitlines()]
+    # Une sortie par ligne d'entrée, dans l'ordre : les erreurs n'interrompent pas le flux
+    assert [sortie["line"] for sortie in sorties] == [1, 2, 3, 4, 5, 6]
+    assert [sortie.get("id") for sortie in sorties] == ["D0", "D1", "D2", "X1", None, "D3"]
+    assert sorties[3]["error"]["type"] == "validation"
+    assert sorties[3]["error"]["details"][0]["field"] == "age"
+    assert sorties[4]["error"]["type"] == "parse"
+    attendus = lot.json()
+    for sortie, attendu in zip([sorties[0], sorties[1], sorties[2], sorties[5]], attendus):
+        assert "error" not in sortie
+        assert {cle: sortie[cle] for cle in attendu} == attendu
@@ -0,0 +1,89 @@
+# tests/test_tree_engine.py - Moteur compilé contre le GradientBoostingClassifier du pipeline
+import numpy as np
+import pytest
+
+from tree_engine import CompiledModel, _float32_thresholds, compile_pipeline
+
+
+@pytest.fixture(scope="module")
+def matrice(main_module, modele, pipeline, donneurs_modele):
+    donnees = main_module.construire_dataframe([main_module.preparer_donnees_modele(donneur)
+                                                for donneur in donneurs_modele], modele.required_columns)
+    return donnees, pipeline.named_steps["preprocessor"].transform(donnees).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def moteur(pipeline):
+    return compile_pipeline(pipeline)
+
+
+def test_probabilites_du_pipeline(pipeline, moteur, matrice):
+    donnees, X = matrice
+    attendu = pipeline.predict_proba(donnees)
+    assert np.abs(moteur.predict_proba_matrix(X) - attendu).max() <= 1e-9
+    np.testing.assert_array_equal(moteur.predict(X), pipeline.predict(donnees))
+
+
+def test_score_brut_du_classifieur(pipeline, moteur, matrice):
+    _, X = matrice
+    classifieur = pipeline.named_steps["classifier"]
+    np.testing.assert_allclose(moteur.decision_function(X), classifieur.decision_function(X), rtol=0, atol=1e-12)
+
+
+def test_ligne_seule_identique_au_lot(moteur, matrice):
+    _, X = matrice
+    # Plus d'une tranche de CHUNK_ROWS lignes : le découpage ne change rien
+    lot = moteur.decision_function(X)
+    lignes = np.concatenate([moteur.decision_function(X[i:i + 1]) for i in range(X.shape[0])])
+    np.testing.assert_array_equal(lignes, lot)
+
+
+def test_from_arrays(moteur, matrice):
+    _, X = matrice
+    copie = CompiledModel.from_arrays(moteur.arrays(), moteur.n_features, moteur.max_depth,
+                                      moteur.init_raw, moteur.classes_)
+    np.testing.assert_array_equal(copie.predict_proba_matrix(X), moteur.predict_proba_matrix(X))
+
+
+def test_seuils_float32_memes_decisions():
+    aleatoire = np.random.default_rng(0)
+    seuils = aleatoire.normal(size=2000) * 10.0 ** aleatoire.integers(-3, 4, size=2000)
+    seuils32 = _float32_thresholds(seuils)
+    # Entrées float32 autour de chaque seuil : le float32 le plus proche et ses deux voisins
+    proches = seuils.astype(np.float32)
+    for x in (proches, np.nextafter(proches, np.float32(-np.inf)), np.nextafter(proches, np.float32(np.inf))):
+        np.testing.assert_array_equal(x <= seuils32, x.astype(np.float64) <= seuils)
+
+
+def test_multiclasse_refusee():
+    from sklearn.ensemble import GradientBoostingClassifier
+    X = np.arange(30, dtype=float).reshape(-1, 1)
+    classifieur = GradientBoostingClassifier(n_estimators=2).fit(X, np.arange(30) % 3)
+    with pytest.raises(ValueError):
+        CompiledModel(classifieur)
+
+
+def test_compilation_verifiee_sur_les_donneurs(main_module, modele, pipeline, monkeypatch):
+    assert main_module.compiler_modele(pipeline, modele.required_columns) is not None
+
+    # Racine testant une indicatrice nulle pour les trois exemples du schéma mais pas pour tous les
+    # donneurs de vérification : un seuil faux n'y change que les décisions des seconds
+    def matrice_de(donneurs):
+        donnees = main_module.construire_dataframe([main_module.preparer_donnees_modele(donneur)
+                                                    for donneur in donneurs], modele.required_columns)
+        return pipeline.named_steps["preprocessor"].transform(donnees).astype(np.float32)
+
+    exemples = matrice_de(main_module.exemples_donneurs())
+    verification = matrice_de(main_module.donneurs_verification(main_module.categories_pipeline(pipeline)))
+    moteur = compile_pipeline(pipeline)
+    racine = next(racine for racine in moteur.roots
+                  if moteur.threshold[racine] == np.float32(0.5)
+                  and not exemples[:, moteur.feature[racine]].any() and verification[:, moteur.feature[racine]].any())
+
+    def compiler_fausse(p):
+        fausse = compile_pipeline(p)
+        fausse.threshold[racine] = 1.5
+        return fausse
+
+    monkeypatch.setattr(main_module, "compile_pipeline", compiler_fausse)
+    assert main_module.compiler_modele(pipeline, modele.required_columns) is None
@@ -0,0 +1,87 @@
+# tests/test_vocabulary.py - Index de vocabulaire : correspondances exacte, normalisée, approchée et cache borné
+import pytest
+
+from vocabulary import MATCH_MODES, UNKNOWN, VocabularyIndex, normalize, options_from_env
+
+CATEGORIES = ["Douala 3", "Commerçant", "Yaoundé", "Etudiant (e)", "Sans emploi"]
+
+
+def test_normalisation():
+    assert normalize("  DOUALA   3 ") == "douala 3"
+    assert normalize("commerçant") == normalize("COMMERCANT") == "commercant"
+    assert normalize("l’école") == "l'ecole"
+
+
+def test_exact_par_defaut():
+    index = VocabularyIndex(CATEGORIES)
+    assert index.match == "exact"
+    assert [index.lookup(categorie) for categorie in CATEGORIES] == list(range(len(CATEGORIES)))
+    # Comme le OneHotEncoder : une variante d'écriture est inconnue
+    assert index.lookup("douala 3") == UNKNOWN
+    assert index.counts == {"normalized": 0, "fuzzy": 0, "unknown": 1}
+
+
+def test_normalise():
+    index = VocabularyIndex(CATEGORIES, match="normalized")
+    assert index.lookup("Douala 3") == 0
+    assert index.lookup("  douala 3 ") == 0
+    assert index.lookup("COMMERCANT") == 1
+    assert index.lookup("yaounde") == 2
+    # Pas de similarité dans ce mode
+    assert index.lookup("Douala 33") == UNKNOWN
+    assert index.counts == {"normalized": 3, "fuzzy": 0, "unknown": 1}
+
+
+def test_premiere_categorie_de_meme_forme():
+    index = VocabularyIndex(["Yaoundé", "YAOUNDE"], match="normalized")
+    assert index.lookup("yaounde") == 0 and index.lookup("YAOUNDE") == 1
+
+
+def test_vocabulaire_numerique():
+    index = VocabularyIndex(["11.7", "12.0", "13"], match="normalized")
+    assert index.lookup(" 11.70") == 0 and index.lookup(12) == 1 and index.lookup("13,0") == 2
+    assert index.lookup("14") == UNKNOWN
+    assert VocabularyIndex(["11.7"]).lookup(11.7) == UNKNOWN
+
+
+def test_approche():
+    index = VocabularyIndex(CATEGORIES, match="fuzzy", fuzzy_cutoff=0.8)
+    assert index.lookup("Etudiant(e)") == 3
+    assert index.lookup("sans emplois") == 4
+    assert index.lookup("douala 3") == 0
+    assert index.lookup("Bafoussam") == UNKNOWN
+    assert index.counts == {"normalized": 1, "fuzzy": 2, "unknown": 1}
+
+
+def test_inconnues():
+    index = VocabularyIndex(CATEGORIES, match="fuzzy")
+    for valeur in (None, "", "xyz", ["Douala 3"], {"a": 1}):
+        assert index.lookup(valeur) == UNKNOWN
+    assert index.counts["unknown"] == 5
+
+
+def test_cache_borne():
+    index = VocabularyIndex(CATEGORIES, match="normalized", max_cached=3)
+    for i in range(50):
+        index.lookup(f"valeur {i}")
+    assert index.stats()["cached"] == 3
+    # Les plus anciennes sont évincées, le résultat ne change pas
+    assert "valeur 0" not in index._cache and "valeur 49" in index._cache
+    assert index.lookup("valeur 0") == UNKNOWN
+    # Catégories exactes : jamais dans le cache
+    index.lookup("Douala 3")
+    assert "Douala 3" not in index._cache
+    assert VocabularyIndex(CATEGORIES, max_cached=0).lookup("douala 3") == UNKNOWN
+
+
+def test_mode_inconnu(monkeypatch):
+    with pytest.raises(ValueError):
+        VocabularyIndex(CATEGORIES, match="approx")
+    monkeypatch.setenv("VOCABULARY_MATCH", "approx")
+    with pytest.raises(ValueError):
+        options_from_env()
+    for mode in MATCH_MODES:
+        monkeypatch.setenv("VOCABULARY_MATCH", mode.upper())
+        assert VocabularyIndex(CATEGORIES, **options_from_env()).match == mode
+    monkeypatch.delenv("VOCABULARY_MATCH")
+    assert options_from_env()["match"] == "exact"
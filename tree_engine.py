@@ -0,0 +1,272 @@
+# tree_engine.py - Moteur d'évaluation NumPy compilé à partir du pipeline GradientBoosting
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+# Nombre de lignes évaluées à la fois dans le chemin par lot
+CHUNK_ROWS = 256
+
+
+def _float32_thresholds(thresholds: np.ndarray) -> np.ndarray:
+    """Convertit les seuils en float32 sans changer aucune décision.
+
+    Les arbres sklearn comparent des entrées float32 à des seuils float64 ; le plus grand
+    float32 inférieur ou égal au seuil donne exactement les mêmes résultats pour `x <= seuil`.
+    """
+    t32 = thresholds.astype(np.float32)
+    above = t32.astype(np.float64) > thresholds
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    return np.ascontiguousarray(t32)
+
+
+def _node_values(tree: Any) -> np.ndarray:
+    """Valeur de chaque nœud d'un arbre sklearn, dérivée de ses feuilles.
+
+    Les feuilles gardent leur valeur ; un nœud interne reçoit la moyenne de ses deux enfants
+    pondérée par `weighted_n_node_samples`. sklearn numérote les enfants après leur parent :
+    un parcours à rebours traite les enfants d'abord.
+    """
+    values = tree.value[:, 0, 0].astype(np.float64)
+    weights = tree.weighted_n_node_samples
+    left, right = tree.children_left, tree.children_right
+    for node in range(tree.node_count - 1, -1, -1):
+        if left[node] != -1:
+            l, r = left[node], right[node]
+            values[node] = (weights[l] * values[l] + weights[r] * values[r]) / (weights[l] + weights[r])
+    return values
+
+
+class CompiledModel:
+    """Version compilée d'un GradientBoostingClassifier binaire ajusté.
+
+    Les arbres sont extraits une fois pour toutes dans des tableaux NumPy contigus et
+    évalués tous ensemble, sans passer par les objets sklearn. Les entrées sont les
+    matrices produites par le prétraitement (voir FeatureEncoder) ; les probabilités
+    reproduisent `predict_proba` du classifieur.
+    """
+
+    # Tableaux exportés par `arrays()` et rechargés par `from_arrays()` (voir model_export.py)
+    ARRAYS = ("roots", "feature", "threshold", "children", "value")
+
+    def __init__(self, classifier: Any):
+        self.n_features = int(classifier.n_features_in_)
+        self._compile_trees(classifier)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], n_features: int, max_depth: int,
+                    init_raw: float, classes: Any) -> "CompiledModel":
+        """Reconstruit un moteur à partir de tableaux exportés (éventuellement projetés en mémoire)."""
+        model = cls.__new__(cls)
+        model.n_features = int(n_features)
+        # Vues ndarray sans copie : l'indexation d'un np.memmap (sous-classe) coûte plusieurs
+        # fois plus cher, alors que les pages projetées restent partagées de la même façon
+        model.roots = np.asarray(arrays["roots"])
+        model.feature = np.asarray(arrays["feature"])
+        model.threshold = np.asarray(arrays["threshold"])
+        model.children = np.asarray(arrays["children"])
+        model.value = np.asarray(arrays["value"])
+        model.max_depth = int(max_depth)
+        model.init_raw = float(init_raw)
+        model.classes_ = np.asarray(classes)
+        return model
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def used_features(self) -> np.ndarray:
+        """Caractéristiques testées par au moins un nœud interne (triées)."""
+        internal = self.children[0::2] != np.arange(self.feature.shape[0])
+        return np.unique(self.feature[internal])
+
+    def compact(self, keep: Optional[np.ndarray] = None) -> "CompiledModel":
+        """Copie réduite du moteur, aux prédictions identiques.
+
+        Un nœud dont les deux enfants sont des feuilles de même valeur devient lui-même une
+        feuille (jusqu'à stabilité), puis les nœuds devenus inaccessibles sont retirés et les
+        autres renumérotés dans le même ordre. `keep` (positions gardées de la matrice
+        d'entrée, voir FeatureEncoder.select) renumérote les caractéristiques ; il doit
+        contenir toutes celles de `used_features()`.
+        """
+        n = self.feature.shape[0]
+        own = np.arange(n)
+        left = self.children[0::2].copy()
+        right = self.children[1::2].copy()
+        value = self.value.copy()
+        while True:
+            leaf = left == own
+            merge = ~leaf & leaf[left] & leaf[right] & (value[left] == value[right])
+            if not merge.any():
+                break
+            value[merge] = value[left[merge]]
+            left[merge] = own[merge]
+            right[merge] = own[merge]
+        leaf = left == own
+
+        # Nœuds accessibles depuis les racines, niveau par niveau (profondeur effective)
+        reachable = np.zeros(n, dtype=bool)
+        frontier = np.asarray(self.roots)
+        depth = 0
+        while True:
+            reachable[frontier] = True
+            frontier = frontier[~leaf[frontier]]
+            if not frontier.shape[0]:
+                break
+            frontier = np.concatenate([left[frontier], right[frontier]])
+            depth += 1
+        new = np.cumsum(reachable) - 1
+
+        n_features = self.n_features
+        feature = self.feature
+        if keep is not None:
+            keep = np.asarray(keep, dtype=np.intp)
+            remap = np.full(self.n_features, -1, dtype=np.intp)
+            remap[keep] = np.arange(keep.shape[0])
+            feature = np.where(leaf, 0, remap[feature])
+            if (feature < 0).any():
+                raise ValueError("Caractéristique testée absente des positions gardées")
+            n_features = int(keep.shape[0])
+
+        arrays = {
+            "roots": new[self.roots],
+            "feature": np.where(leaf, 0, feature)[reachable],
+            "threshold": np.where(leaf, np.float32(0.0), self.threshold)[reachable],
+            "children": np.stack([new[left], new[right]], axis=1)[reachable].ravel(),
+            "value": value[reachable],
+        }
+        arrays = {name: np.ascontiguousarray(array, dtype=getattr(self, name).dtype) for name, array in arrays.items()}
+        return CompiledModel.from_arrays(arrays, n_features, depth, self.init_raw, self.classes_)
+
+    # ------------------------------------------------------------------
+    # Extraction des arbres
+    # ------------------------------------------------------------------
+    def _compile_trees(self, classifier: Any) -> None:
+        if classifier.estimators_.shape[1] != 1:
+            raise ValueError("Seule la classification binaire est supportée")
+
+        trees = [estimator[0].tree_ for estimator in classifier.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        features, thresholds, lefts, rights, values = [], [], [], [], []
+        for tree, root in zip(trees, roots):
+            is_leaf = tree.children_left == -1
+            own = np.arange(tree.node_count) + root
+            # Les feuilles pointent sur elles-mêmes : le parcours peut faire max_depth pas sans test
+            lefts.append(np.where(is_leaf, own, tree.children_left + root))
+            rights.append(np.where(is_leaf, own, tree.children_right + root))
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            # Valeur de tous les nœuds : le parcours finit toujours sur une feuille (score inchangé),
+            # les nœuds internes servent au calcul des contributions
+            values.append(_node_values(tree) * classifier.learning_rate)
+
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.intp)
+        self.threshold = _float32_thresholds(np.concatenate(thresholds))
+        # Enfants entrelacés [gauche, droite] : l'enfant suivant est children[2 * nœud + (x > seuil)]
+        self.children = np.ascontiguousarray(np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1)
+                                             .ravel(), dtype=np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+        self.max_depth = int(max(tree.max_depth for tree in trees))
+
+        # Score initial (estimateur 'prior') : constant quel que soit X
+        self.init_raw = float(classifier._raw_predict_init(np.zeros((1, self.n_features), dtype=np.float32))[0, 0])
+        self.classes_ = classifier.classes_
+
+    # ------------------------------------------------------------------
+    # Évaluation
+    # ------------------------------------------------------------------
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Score brut (log-odds) pour chaque ligne de X."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        if n_rows == 1:
+            # Chemin ligne unique : vectorisé sur les arbres uniquement
+            x = X[0]
+            node = self.roots
+            for _ in range(self.max_depth):
+                node = self.children[2 * node + (x[self.feature[node]] > self.threshold[node])]
+            return np.array([self.init_raw + self.value[node].sum()])
+
+        # Par tranches de lignes pour que les tableaux de nœuds restent en cache
+        raw = np.empty(n_rows)
+        flat = X.ravel()
+        for start in range(0, n_rows, CHUNK_ROWS):
+            stop = min(n_rows, start + CHUNK_ROWS)
+            offsets = (np.arange(start, stop, dtype=np.intp) * n_features)[:, None]
+            node = np.broadcast_to(self.roots, (stop - start, self.roots.shape[0]))
+            for _ in range(self.max_depth):
+                node = self.children[2 * node + (flat[offsets + self.feature[node]] > self.threshold[node])]
+            raw[start:stop] = self.init_raw + self.value[node].sum(axis=1)
+        return raw
+
+    def contributions(self, X: np.ndarray, groups: Optional[np.ndarray] = None,
+                      n_groups: Optional[int] = None) -> Tuple[float, np.ndarray]:
+        """Contributions de chaque caractéristique au score brut, le long du chemin de chaque arbre.
+
+        À chaque nœud traversé, la variation de valeur entre le nœud et l'enfant choisi est
+        attribuée à la caractéristique testée (attribution par chemin, dite de Saabas).
+        La valeur d'un nœud interne est la moyenne de ses feuilles pondérée par les
+        échantillons d'entraînement (voir `_node_values`) : sklearn y garde la moyenne des
+        résidus, alors que les feuilles ont reçu la mise à jour de Newton du gradient
+        boosting ; attribuer à partir de `tree.value` décalerait les contributions vers les
+        premiers nœuds du chemin.
+        `groups` (une entrée par caractéristique) regroupe directement les caractéristiques,
+        par exemple les indicatrices d'une même colonne catégorielle. Renvoie la valeur de base
+        (score sans aucune information) et une matrice (lignes x groupes) : pour chaque ligne,
+        base + somme des contributions = decision_function.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        if groups is None:
+            groups, n_groups = np.arange(n_features, dtype=np.intp), n_features
+        base = self.init_raw + float(self.value[self.roots].sum())
+        if n_rows == 1:
+            # Chemin ligne unique : vectorisé sur les arbres uniquement
+            x = X[0]
+            node = self.roots
+            positions, deltas = [], []
+            for _ in range(self.max_depth):
+                feature = self.feature[node]
+                child = self.children[2 * node + (x[feature] > self.threshold[node])]
+                positions.append(groups[feature])
+                deltas.append(self.value[child] - self.value[node])
+                node = child
+            return base, np.bincount(np.concatenate(positions), weights=np.concatenate(deltas),
+                                     minlength=n_groups)[None, :]
+
+        contributions = np.empty((n_rows, n_groups))
+        flat = X.ravel()
+        for start in range(0, n_rows, CHUNK_ROWS):
+            stop = min(n_rows, start + CHUNK_ROWS)
+            rows = np.arange(start, stop, dtype=np.intp)[:, None]
+            node = np.broadcast_to(self.roots, (stop - start, self.roots.shape[0]))
+            # Indices à plat (ligne, groupe) dans la tranche, cumulés par un seul bincount
+            positions, deltas = [], []
+            for _ in range(self.max_depth):
+                feature = self.feature[node]
+                child = self.children[2 * node + (flat[rows * n_features + feature] > self.threshold[node])]
+                # Une feuille pointe sur elle-même : variation nulle
+                positions.append((rows - start) * n_groups + groups[feature])
+                deltas.append(self.value[child] - self.value[node])
+                node = child
+            contributions[start:stop] = np.bincount(
+                np.concatenate(positions, axis=None), weights=np.concatenate(deltas, axis=None),
+                minlength=(stop - start) * n_groups).reshape(stop - start, n_groups)
+        return base, contributions
+
+    def predict_proba_matrix(self, X: np.ndarray) -> np.ndarray:
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack((1.0 - positive, positive))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[(self.decision_function(X) > 0).astype(np.intp)]
+
+
+def compile_pipeline(pipeline: Any) -> CompiledModel:
+    """Compile l'étape 'classifier' d'un pipeline scikit-learn ajusté en moteur NumPy."""
+    classifier = dict(pipeline.steps).get("classifier") if hasattr(pipeline, "steps") else pipeline
+    if classifier is None:
+        raise ValueError("Le pipeline doit contenir une étape 'classifier'")
+    return CompiledModel(classifier)
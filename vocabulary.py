@@ -0,0 +1,145 @@
+# vocabulary.py - Index des vocabulaires catégoriels (normalisation, codes entiers, correspondance approchée)
+import difflib
+import os
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+# Code des valeurs absentes du vocabulaire : aucune indicatrice (handle_unknown='ignore')
+UNKNOWN = -1
+
+# Apostrophes et tirets typographiques ramenés à leur forme ASCII avant comparaison
+_TYPOGRAPHIE = str.maketrans({"’": "'", "‘": "'", "`": "'", "´": "'", "–": "-", "—": "-"})
+
+
+def normalize(value: Any) -> str:
+    """Forme de comparaison d'une valeur : sans casse, sans accents, espaces réduits."""
+    text = unicodedata.normalize("NFKD", str(value).translate(_TYPOGRAPHIE).casefold())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def _numeric_key(value: Any) -> Optional[float]:
+    try:
+        number = float(str(value).strip().replace(",", "."))
+    except ValueError:
+        return None
+    return number if number == number else None
+
+
+# Correspondances essayées après l'égalité exacte : aucune (comme le OneHotEncoder du pipeline),
+# forme normalisée, puis forme normalisée et similarité
+MATCH_MODES = ("exact", "normalized", "fuzzy")
+
+
+def options_from_env() -> Dict[str, Any]:
+    """Options des index à partir de VOCABULARY_MATCH (exact par défaut), VOCABULARY_FUZZY_CUTOFF
+    (seuil de similarité du mode fuzzy) et VOCABULARY_CACHE_SIZE."""
+    match = os.environ.get("VOCABULARY_MATCH", "exact").lower()
+    if match not in MATCH_MODES:
+        raise ValueError(f"VOCABULARY_MATCH non supporté: {match} (attendu: {', '.join(MATCH_MODES)})")
+    return {
+        "match": match,
+        "fuzzy_cutoff": float(os.environ.get("VOCABULARY_FUZZY_CUTOFF", 0.85)),
+        "max_cached": int(os.environ.get("VOCABULARY_CACHE_SIZE", 4096)),
+    }
+
+
+class VocabularyIndex:
+    """Associe les valeurs d'une colonne catégorielle au code (rang) de leur catégorie.
+
+    L'égalité exacte est essayée d'abord : une valeur déjà reconnue par le OneHotEncoder
+    garde le même code. Avec `match="exact"` (par défaut) rien d'autre n'est essayé, comme
+    dans le OneHotEncoder : l'encodeur donne alors la même matrice que le prétraitement du
+    pipeline. Avec "normalized", la valeur est ensuite comparée sous forme normalisée
+    (casse, accents, espaces, apostrophes) et par valeur numérique pour un vocabulaire de
+    nombres (" 11.7", "11.70" et 11.7 désignent la même catégorie) ; "fuzzy" y ajoute la
+    similarité (difflib, seuil `fuzzy_cutoff`) avec les catégories normalisées. Ces deux
+    modes changent volontairement l'encodage des variantes d'écriture, que le pipeline
+    ignore. Une valeur sans correspondance reçoit le code UNKNOWN.
+
+    Les résultats des valeurs non exactes sont mémorisés dans un cache borné (`max_cached`
+    entrées) : le nombre de chaînes distinctes gardées en mémoire ne dépend pas du trafic.
+    Lorsque plusieurs catégories ont la même forme normalisée, la première l'emporte.
+    Seules les valeurs non exactes sont comptées (`counts`), le chemin exact restant une
+    simple lecture de dictionnaire.
+    """
+
+    MATCHES = ("normalized", "fuzzy", "unknown")
+
+    def __init__(self, categories: Sequence[Any], match: str = "exact", fuzzy_cutoff: float = 0.85,
+                 max_cached: int = 4096):
+        if match not in MATCH_MODES:
+            raise ValueError(f"Correspondance de vocabulaire non supportée: {match} "
+                             f"(attendu: {', '.join(MATCH_MODES)})")
+        self.categories = list(categories)
+        self.match = match
+        self.fuzzy_cutoff = float(fuzzy_cutoff)
+        self.max_cached = int(max_cached)
+
+        # Codes des catégories exactes : lisibles directement par l'appelant (chemin rapide)
+        self.codes: Dict[Any, int] = {}
+        self._normalized: Dict[str, int] = {}
+        for code, category in enumerate(self.categories):
+            self.codes.setdefault(category, code)
+            self._normalized.setdefault(normalize(category), code)
+
+        # Vocabulaire de nombres écrits en texte (ex. taux d'hémoglobine) : index par valeur
+        numbers = [_numeric_key(category) for category in self.categories]
+        self._numeric: Optional[Dict[float, int]] = None
+        if self.categories and all(number is not None for number in numbers):
+            self._numeric = {}
+            for code, number in enumerate(numbers):
+                self._numeric.setdefault(number, code)
+
+        self._keys: List[str] = list(self._normalized)
+        # Valeur non exacte -> (code, type de correspondance)
+        self._cache: Dict[Any, tuple] = {}
+        self.counts = dict.fromkeys(self.MATCHES, 0)
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def lookup(self, value: Any) -> int:
+        """Code de la catégorie de `value`, ou UNKNOWN."""
+        try:
+            code = self.codes.get(value)
+        except TypeError:
+            # Valeur non hachable : jamais une catégorie
+            self.counts["unknown"] += 1
+            return UNKNOWN
+        if code is not None:
+            return code
+
+        cached = self._cache.get(value)
+        if cached is None:
+            cached = self._resolve(value)
+            if len(self._cache) >= self.max_cached:
+                # Éviction de l'entrée la plus ancienne (ordre d'insertion)
+                try:
+                    del self._cache[next(iter(self._cache))]
+                except (KeyError, RuntimeError, StopIteration):
+                    pass
+            if self.max_cached > 0:
+                self._cache[value] = cached
+        code, match = cached
+        self.counts[match] += 1
+        return code
+
+    def _resolve(self, value: Any) -> tuple:
+        if self.match == "exact":
+            return UNKNOWN, "unknown"
+        if self._numeric is not None:
+            number = _numeric_key(value)
+            if number is not None and number in self._numeric:
+                return self._numeric[number], "normalized"
+        key = normalize(value)
+        code = self._normalized.get(key)
+        if code is not None:
+            return code, "normalized"
+        if self.match == "fuzzy" and key:
+            proches = difflib.get_close_matches(key, self._keys, n=1, cutoff=self.fuzzy_cutoff)
+            if proches:
+                return self._normalized[proches[0]], "fuzzy"
+        return UNKNOWN, "unknown"
+
+    def stats(self) -> Dict[str, Any]:
+        return {"categories": len(self.categories), "cached": len(self._cache), **self.counts}